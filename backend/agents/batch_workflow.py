@@ -0,0 +1,208 @@
+# agents/batch_workflow.py
+import asyncio
+import json
+import re
+from typing import Dict, List, Mapping, Optional, Sequence
+from database.models import VendorList
+from pipeline.governor import get_governor
+from pipeline.history import demand_totals
+from pipeline.snapshot import get_inventory_snapshot
+from tools.inventory_tool import batch_stock_analysis
+
+
+# Products per model call; each one costs a table row in the prompt and an object in the reply
+CHUNK_PRODUCTS = 200
+
+# A model quantity above this multiple of the shortage is treated as a bad reply, not capped
+MAX_OVERORDER = 2
+
+DECISIONS = ("reorder", "hold", "sufficient_stock", "not_found")
+
+ROW_FIELDS = ("product_id", "product_name", "category_name", "demand", "current_stock", "on_order",
+              "required_stock", "vendor_id", "vendor_name")
+
+BATCH_PROMPT = """You are an intelligent inventory management assistant reviewing reorders.
+Stock analysis and vendor lookup are already done. Each line below is one product whose demand
+exceeds stock on hand plus stock on order, as: {fields}
+
+For every line decide "reorder" (order `quantity` units from its vendor) or "hold" (do not order
+now, e.g. no vendor or a shortage that does not justify an order) and give a short reason.
+Reply with only a JSON array, one object per line in the same order:
+[{{"product_id": "...", "decision": "reorder", "quantity": 0, "reason": "..."}}]
+
+{rows}
+"""
+
+
+def _cell(value) -> str:
+    return str(value if value is not None else "").replace("|", "/").replace("\n", " ")
+
+
+def build_prompt(analyses: Sequence[Dict]) -> str:
+    """One pipe-separated row per product instead of one ReAct conversation per product"""
+    rows = "\n".join("|".join(_cell(a.get(field)) for field in ROW_FIELDS) for a in analyses)
+    return BATCH_PROMPT.format(fields="|".join(ROW_FIELDS), rows=rows)
+
+
+def parse_decisions(text: str) -> List[Dict]:
+    """JSON array from a model reply, tolerating code fences and text around it"""
+    match = re.search(r"\[.*\]", text or "", re.DOTALL)
+    if not match:
+        return []
+    try:
+        parsed = json.loads(match.group(0))
+    except ValueError:
+        return []
+    return [d for d in parsed if isinstance(d, dict)] if isinstance(parsed, list) else []
+
+
+def _reply_text(reply) -> str:
+    content = getattr(reply, "content", reply)
+    if isinstance(content, list):
+        # Multi-part chat content
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+
+def _usage(reply) -> Dict[str, int]:
+    usage = getattr(reply, "usage_metadata", None) or {}
+    return {"input_tokens": int(usage.get("input_tokens", 0)), "output_tokens": int(usage.get("output_tokens", 0))}
+
+
+def _rule_decision(analysis: Dict) -> Dict:
+    """Decision without the model: reorder the shortage when the product has a vendor"""
+    status = analysis.get("status")
+    if status in ("not_found", "sufficient_stock"):
+        return {"decision": status, "quantity": 0, "reason": analysis.get("message", "Stock covers demand"),
+                "source": "rules"}
+    if not analysis.get("vendor_name"):
+        return {"decision": "hold", "quantity": 0, "reason": "No vendor on file", "source": "rules"}
+    return {"decision": "reorder", "quantity": analysis["required_stock"], "reason": "Shortage", "source": "rules"}
+
+
+def _model_decision(analysis: Dict, decision: Optional[Dict]) -> Dict:
+    """Validate one model decision against the analysis; fall back to the rules when it is unusable"""
+    if not decision or str(decision.get("product_id", analysis["product_id"])) != str(analysis["product_id"]):
+        return _rule_decision(analysis)
+    choice = str(decision.get("decision", "")).strip().lower()
+    if choice not in ("reorder", "hold"):
+        return _rule_decision(analysis)
+    try:
+        quantity = int(decision.get("quantity") or 0)
+    except (TypeError, ValueError):
+        quantity = analysis["required_stock"]
+    required = analysis["required_stock"]
+    if choice == "reorder" and (quantity <= 0 or quantity > MAX_OVERORDER * required
+                                or not analysis.get("vendor_name")):
+        return _rule_decision(analysis)
+    return {"decision": choice, "quantity": min(quantity, required) if choice == "reorder" else 0,
+            "reason": str(decision.get("reason", ""))[:500], "source": "model"}
+
+
+def analyze_batch(db, items: Optional[Sequence[Mapping]] = None) -> List[Dict]:
+    """batch_stock_analysis plus vendor details, in one pass over the snapshot and vendors.
+
+    Without items every inventory product is analyzed against its recorded demand.
+    """
+    snapshot = get_inventory_snapshot(db)
+    if items is None:
+        frame = snapshot.frame()
+        items = [{"product_name": name, "category": category, "product_id": product_id}
+                 for product_id, name, category in zip(frame["product_id"], frame["product_name"],
+                                                       frame["category_name"])]
+    analyses = batch_stock_analysis(snapshot, items, demand_totals(db))
+    vendor_ids = {a["vendor_id"] for a in analyses if a.get("status") == "reorder_needed"}
+    vendors = {v.vendor_id: v for v in db.query(VendorList).filter(VendorList.vendor_id.in_(vendor_ids))}
+    for analysis in analyses:
+        vendor = vendors.get(analysis.get("vendor_id"))
+        if vendor:
+            analysis.update(vendor_name=vendor.vendor_name, vendor_email=vendor.email)
+    return analyses
+
+
+class BatchWorkflow:
+    """Workflow agent for many products: analysis runs in one pass (analyze_batch), and the
+    model sees only the products that need a decision, CHUNK_PRODUCTS per prompt.
+
+    Where the ReAct agent spends several Gemini round trips per product (stock, vendor,
+    email), this spends one per chunk and returns a structured decision per product.
+    """
+
+    def __init__(self, llm=None, chunk_size: int = CHUNK_PRODUCTS):
+        self.llm = llm
+        self.chunk_size = chunk_size
+
+    def _chunks(self, analyses: Sequence[Dict]) -> List[List[int]]:
+        pending = [i for i, a in enumerate(analyses) if a.get("status") == "reorder_needed"]
+        return [pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+
+    def _finish(self, analyses: List[Dict], replies: Dict[int, Optional[Dict]], stats: Dict) -> Dict:
+        decisions = []
+        for i, analysis in enumerate(analyses):
+            if analysis.get("status") == "reorder_needed" and self.llm is not None:
+                decision = _model_decision(analysis, replies.get(i))
+            else:
+                decision = _rule_decision(analysis)
+            decisions.append({**analysis, **decision})
+        summary = {choice: sum(d["decision"] == choice for d in decisions) for choice in DECISIONS}
+        return {"decisions": decisions, "summary": {"products": len(decisions), **summary}, **stats}
+
+    def _apply(self, analyses: List[Dict], chunk: List[int], reply, replies: Dict, stats: Dict) -> None:
+        parsed = parse_decisions(_reply_text(reply))
+        by_id = {str(d.get("product_id")): d for d in parsed}
+        for position, i in enumerate(chunk):
+            analysis = analyses[i]
+            # Replies are matched by product_id, or by position when the model drops ids
+            replies[i] = by_id.get(str(analysis["product_id"])) or (
+                parsed[position] if position < len(parsed) and "product_id" not in parsed[position] else None
+            )
+        usage = _usage(reply)
+        stats["llm_calls"] += 1
+        stats["input_tokens"] += usage["input_tokens"]
+        stats["output_tokens"] += usage["output_tokens"]
+
+    def _stats(self) -> Dict:
+        return {"llm_calls": 0, "prompt_chars": 0, "input_tokens": 0, "output_tokens": 0}
+
+    def decide(self, analyses: List[Dict]) -> Dict:
+        """Decisions for analyze_batch results, one model call per chunk of reorder candidates"""
+        replies: Dict[int, Optional[Dict]] = {}
+        stats = self._stats()
+        if self.llm is not None:
+            for chunk in self._chunks(analyses):
+                prompt = build_prompt([analyses[i] for i in chunk])
+                stats["prompt_chars"] += len(prompt)
+                reply = get_governor("gemini").call(self.llm.invoke, prompt)
+                self._apply(analyses, chunk, reply, replies, stats)
+        return self._finish(analyses, replies, stats)
+
+    async def adecide(self, analyses: List[Dict]) -> Dict:
+        """decide() with the chunks sent concurrently, within the gemini governor"""
+        replies: Dict[int, Optional[Dict]] = {}
+        stats = self._stats()
+        if self.llm is not None:
+            chunks = self._chunks(analyses)
+            prompts = [build_prompt([analyses[i] for i in chunk]) for chunk in chunks]
+            stats["prompt_chars"] = sum(len(prompt) for prompt in prompts)
+            governor = get_governor("gemini")
+            results = await asyncio.gather(*(governor.acall(self.llm.ainvoke, prompt) for prompt in prompts))
+            for chunk, reply in zip(chunks, results):
+                self._apply(analyses, chunk, reply, replies, stats)
+        return self._finish(analyses, replies, stats)
+
+    def run(self, db, items: Optional[Sequence[Mapping]] = None) -> Dict:
+        return self.decide(analyze_batch(db, items))
+
+    async def arun(self, session, items: Optional[Sequence[Mapping]] = None) -> Dict:
+        """run() for an AsyncSession"""
+        return await self.adecide(await session.run_sync(analyze_batch, items))
+
+
+def reorder_orders(decisions: Sequence[Dict]) -> List[Dict]:
+    """Reorder decisions as orders_to_send rows for group_orders_by_vendor_product"""
+    return [
+        {"store_id": "", "product_id": d["product_id"], "category": d.get("category_name", ""),
+         "product_name": d["product_name"], "current_stock": d["current_stock"], "demand": d["demand"],
+         "shortage": d["quantity"], "vendor_id": d["vendor_id"]}
+        for d in decisions if d["decision"] == "reorder"
+    ]
@@ -8,34 +8,17 @@ from tools.vendor_tool import VendorLookupTool
 from tools.email_tool import SendOrderEmailTool
 import sys
 from pathlib import Path
+from typing import Literal, Union
 
 # Add the parent directory to Python path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.settings import settings
+from pipeline.governor import get_governor
 import google.generativeai as genai
 
 
-def create_workflow_agent():
-	# Configure Gemini API
-	genai.configure(api_key=settings.GEMINI_API_KEY)
-	
-	# Initialize Gemini LLM
-	llm = ChatGoogleGenerativeAI(
-		model=settings.GEMINI_MODEL_NAME,
-		google_api_key=settings.GEMINI_API_KEY,
-		temperature=0.7,
-		convert_system_message_to_human=True
-	)
-	
-	# Tools for our workflow
-	tools = [
-		StockAnalysisTool(),
-		VendorLookupTool(),
-		SendOrderEmailTool()
-	]
-	
-	# Comprehensive prompt template for the entire workflow
-	prompt_template = """You are an intelligent inventory management assistant that handles the complete workflow:
+# Comprehensive prompt template for the entire workflow
+WORKFLOW_PROMPT = """You are an intelligent inventory management assistant that handles the complete workflow:
 	1. Analyze stock levels vs provided demand
 	2. Find vendor information
 	3. Coordinate ordering when needed
@@ -51,8 +34,50 @@ def create_workflow_agent():
 	Question: {input}
 	Thought: {agent_scratchpad}
 	"""
+
+
+class GovernedChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+	"""Gemini chat model whose requests go through the "gemini" governor.
+
+	Agents use it so that only the model round trips are rate limited and retried; a retry
+	never re-runs a tool that already ran, such as sending a PO email.
+	"""
+
+	# Agents consume replies whole; without streaming every request goes through _generate
+	disable_streaming: Union[bool, Literal["tool_calling"]] = True
+
+	def _generate(self, *args, **kwargs):
+		return get_governor("gemini").call(super()._generate, *args, **kwargs)
+
+	async def _agenerate(self, *args, **kwargs):
+		return await get_governor("gemini").acall(super()._agenerate, *args, **kwargs)
+
+
+def create_workflow_llm(temperature=0.7, governed=False):
+	# Configure Gemini API
+	genai.configure(api_key=settings.GEMINI_API_KEY)
+	
+	# Initialize Gemini LLM (governed per request when the caller does not govern its own calls)
+	model = GovernedChatGoogleGenerativeAI if governed else ChatGoogleGenerativeAI
+	return model(
+		model=settings.GEMINI_MODEL_NAME,
+		google_api_key=settings.GEMINI_API_KEY,
+		temperature=temperature,
+		convert_system_message_to_human=True
+	)
+
+
+def create_workflow_agent():
+	llm = create_workflow_llm(governed=True)
+	
+	# Tools for our workflow
+	tools = [
+		StockAnalysisTool(),
+		VendorLookupTool(),
+		SendOrderEmailTool()
+	]
 	
-	prompt = PromptTemplate.from_template(prompt_template)
+	prompt = PromptTemplate.from_template(WORKFLOW_PROMPT)
 	
 	# Create agent
 	agent = create_react_agent(llm, tools, prompt)
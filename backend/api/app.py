@@ -0,0 +1,29 @@
+# api/app.py
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from fastapi import FastAPI
+
+# Add the parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import settings
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    yield
+    # aiosqlite runs each pooled connection on its own thread; close them on shutdown
+    from database.async_connection import async_engine
+    await async_engine.dispose()
+
+def create_app(use_async: bool = settings.ASYNC_API) -> FastAPI:
+    """Build the API app with either the async (aiosqlite) or the threadpool router"""
+    if use_async:
+        from api.async_routes import router
+    else:
+        from api.routes import router
+    app = FastAPI(title=settings.APP_NAME, lifespan=_lifespan)
+    app.include_router(router)
+    return app
+
+# Run from backend/: uvicorn api.app:app --host 127.0.0.1 --port 8000
+app = create_app()
@@ -0,0 +1,160 @@
+# api/async_routes.py
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from database.async_connection import get_async_db
+from database.models import STOCK_GENERATION, SessionLocal
+from agents.workflow_agent import create_workflow_agent, create_workflow_llm
+from agents.batch_workflow import BatchWorkflow
+from pipeline.fuzzy_match import get_trigram_index
+from pipeline.governor import CircuitOpenError
+from api.cache import cached_json_async
+from api import routes as sync_routes
+from api.routes import (
+    BatchWorkflowRequest, OrderRequest, ProductIDRequest, ProductRequest, ProductSuggestionRequest,
+    analyze_product, batch_workflow_items, circuit_open, send_reorders, dashboard_data, inventory_listing,
+    order_after_transfers, order_query, products_page, transfers_only, vendor_for_product
+)
+
+# Drop-in replacement for api.routes.router: database work goes through aiosqlite and the
+# agent endpoints await the LLM, so slow Gemini calls do not hold threadpool slots.
+router = APIRouter(prefix="/api", tags=["inventory"])
+
+@router.post("/analyze-inventory")
+async def analyze_inventory(request: ProductIDRequest, db: AsyncSession = Depends(get_async_db)):
+    """Analyze inventory for a specific product"""
+    try:
+        return await db.run_sync(analyze_product, request.product_id)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/find-vendor")
+async def find_vendor(request: ProductIDRequest, http_request: Request,
+                      db: AsyncSession = Depends(get_async_db)):
+    """Find vendor for a specific product"""
+    try:
+        return await cached_json_async(
+            http_request, db, ("find-vendor", request.product_id),
+            lambda session: vendor_for_product(session, request.product_id), extra=(STOCK_GENERATION,)
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/suggest-products")
+async def suggest_products(request: ProductSuggestionRequest, db: AsyncSession = Depends(get_async_db)):
+    """Suggest close inventory matches for product names that were not found"""
+    try:
+        index = await db.run_sync(get_trigram_index)
+        matches = index.suggest(request.product_names, top_k=request.top_k, min_score=request.min_score)
+        return {
+            "status": "success",
+            "data": [
+                {"product_name": name, "suggestions": suggestions}
+                for name, suggestions in zip(request.product_names, matches)
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/send-order")
+async def send_order(request: OrderRequest, db: AsyncSession = Depends(get_async_db)):
+    """Send order to vendor using email agent, for what nearby warehouses cannot transfer"""
+    try:
+        quantity, transfers = await db.run_sync(order_after_transfers, request)
+        if quantity <= 0:
+            return transfers_only(request, transfers)
+
+        agent = create_workflow_agent()
+        result = await agent.ainvoke({"input": order_query(request, quantity)})
+
+        return {
+            "message": f"Order request sent to {request.vendor_name}",
+            "details": result,
+            "transfers": transfers
+        }
+
+    except CircuitOpenError as e:
+        raise circuit_open(e)
+    except Exception as e:
+        return {"message": f"Failed to send order: {str(e)}"}
+
+@router.get("/dashboard-data")
+async def get_dashboard_data(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get dashboard data including products needing reorder"""
+    try:
+        return await cached_json_async(request, db, ("dashboard-data",), dashboard_data, extra=(STOCK_GENERATION,))
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/products")
+async def get_all_products(request: Request, after_id: Optional[int] = None,
+                           limit: int = Query(100, ge=1, le=1000), db: AsyncSession = Depends(get_async_db)):
+    """Get products from inventory, one keyset page at a time (pass next_cursor as after_id)"""
+    try:
+        return await cached_json_async(
+            request, db, ("products", after_id, limit),
+            lambda session: products_page(session, after_id, limit)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/inventory")
+async def get_inventory(request: Request, after_id: Optional[int] = None,
+                        limit: int = Query(100, ge=1, le=1000), db: AsyncSession = Depends(get_async_db)):
+    """Get inventory rows one keyset page at a time (pass next_cursor as after_id)"""
+    try:
+        return await cached_json_async(
+            request, db, ("inventory", after_id, limit),
+            lambda session: inventory_listing(session, after_id, limit)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/agent-workflow")
+async def run_agent_workflow(request: ProductRequest):
+    """Run the complete agent workflow for inventory management"""
+    try:
+        agent = create_workflow_agent()
+
+        query = f"Analyze inventory and check if reordering is needed for product: {request.product_identifier}"
+        result = await agent.ainvoke({"input": query})
+
+        return {
+            "status": "success",
+            "result": result
+        }
+
+    except CircuitOpenError as e:
+        raise circuit_open(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _send_reorders(decisions):
+    db = SessionLocal()
+    try:
+        return send_reorders(db, decisions)
+    finally:
+        db.close()
+
+@router.post("/agent-workflow/batch")
+async def run_batch_agent_workflow(request: BatchWorkflowRequest, db: AsyncSession = Depends(get_async_db)):
+    """Analyze many products in one batched workflow and return a decision per product"""
+    try:
+        workflow = BatchWorkflow(create_workflow_llm(temperature=0) if request.use_model else None)
+        result = await workflow.arun(db, batch_workflow_items(request))
+        if request.send_orders:
+            # SMTP is blocking; send from a worker thread with its own session
+            result.update(await asyncio.to_thread(_send_reorders, result["decisions"]))
+        return {"status": "success", **result}
+
+    except CircuitOpenError as e:
+        raise circuit_open(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Remaining endpoints (jobs, export streaming, cache stats) are shared with the sync router
+router.include_router(sync_routes.shared_router)
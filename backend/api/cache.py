@@ -0,0 +1,135 @@
+# api/cache.py
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Sequence, Tuple
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from database.models import get_generations
+from config.settings import settings
+
+
+class ResponseCache:
+    """LRU of serialized JSON bodies keyed by route + parameters for the current data generation.
+
+    All entries belong to one generation; seeing a different generation drops them.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._generation: Optional[Tuple] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _sync(self, generation: Tuple) -> None:
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key: Hashable, generation: Tuple) -> Optional[bytes]:
+        with self._lock:
+            self._sync(generation)
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: Hashable, generation: Tuple, body: bytes) -> None:
+        with self._lock:
+            self._sync(generation)
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+            }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE)
+
+
+def make_etag(key: Hashable, generation: Tuple) -> str:
+    """Responses are a pure function of (route, parameters, generation), so that is the validator"""
+    return '"%s"' % hashlib.sha1(repr((key, generation)).encode()).hexdigest()[:24]
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+
+def _json_response(body: bytes, etag: str) -> Response:
+    return Response(content=body, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def _serialize(data: Any) -> bytes:
+    return json.dumps(jsonable_encoder(data)).encode()
+
+
+def cached_json(request: Request, db, key: Tuple, compute: Callable[[], Any], extra: Sequence[str] = ()) -> Response:
+    """Serve `compute()` as JSON from the cache, or a 304 when the client already has it.
+
+    `extra` names counters outside GENERATION_NAMES the response also depends on (e.g. stock);
+    they go into the key, so bumping them retires only these entries.
+    """
+    generation = get_generations(db)
+    if extra:
+        key = key + (get_generations(db, extra),)
+    etag = make_etag(key, generation)
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+
+    body = response_cache.get(key, generation)
+    if body is None:
+        body = _serialize(compute())
+        response_cache.put(key, generation, body)
+    return _json_response(body, etag)
+
+
+async def cached_json_async(request: Request, db, key: Tuple, compute: Callable[[Any], Any],
+                            extra: Sequence[str] = ()) -> Response:
+    """Async counterpart of cached_json; `compute(session)` runs through AsyncSession.run_sync"""
+    generation = await db.run_sync(get_generations)
+    if extra:
+        key = key + (await db.run_sync(get_generations, extra),)
+    etag = make_etag(key, generation)
+    not_modified = _not_modified(request, etag)
+    if not_modified:
+        return not_modified
+
+    body = response_cache.get(key, generation)
+    if body is None:
+        body = _serialize(await db.run_sync(compute))
+        response_cache.put(key, generation, body)
+    return _json_response(body, etag)
@@ -1,14 +1,36 @@
 # api/routes.py
-from fastapi import APIRouter, Depends, HTTPException
+import io
+import json
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from database.connection import get_db
-from database.models import ProductCatalogue, VendorList, InputData
+from database.models import STOCK_GENERATION, SessionLocal
+from database.models import VendorList
 from pydantic import BaseModel
-from typing import Dict, Any
-from agents.workflow_agent import create_workflow_agent
+from typing import Dict, Any, List, Optional, Tuple
+from agents.workflow_agent import create_workflow_agent, create_workflow_llm
+from agents.batch_workflow import BatchWorkflow, reorder_orders
+from pipeline.fuzzy_match import get_trigram_index
+from pipeline import jobs
+from pipeline.export import EXPORT_FORMATS, inventory_page, parquet_available, stream_inventory_export
+from api.cache import cached_json, response_cache
+from pipeline.ledger import MOVEMENT_KINDS, movement_history, record_movements, stock_level
+from pipeline.demand import UnsupportedFileError, read_demand_file
+from pipeline.history import ROLLUP_GRAINS, demand_rollups, demand_totals, product_demand, record_demand_history
+from pipeline.snapshot import get_inventory_snapshot
+from pipeline.forecast import FORECAST_METHODS, FREQUENCIES, reorder_suggestions
+from pipeline.governor import CircuitOpenError, governor_metrics
+from pipeline.orders import group_orders_by_vendor_product, send_bulk_orders_grouped
+from pipeline.ranking import RANKINGS
+from pipeline.readers import WAREHOUSE_SCHEMA, WAREHOUSE_STOCK_SCHEMA, read_table
+from pipeline.warehouses import load_warehouses, plan_transfers, warehouse_summary
 
 router = APIRouter(prefix="/api", tags=["inventory"])
+# Endpoints the async router serves unchanged (jobs, export streaming, ledger, warehouses, ...)
+shared_router = APIRouter()
 
 class ProductRequest(BaseModel):
     product_identifier: str  # Can be product_id or product_name
@@ -16,6 +38,20 @@ class ProductRequest(BaseModel):
 class ProductIDRequest(BaseModel):
     product_id: str
 
+class ProductSuggestionRequest(BaseModel):
+    product_names: List[str]
+    top_k: int = 5
+    min_score: float = 0.3
+
+class StockMovementRequest(BaseModel):
+    product_id: str
+    kind: str  # receipt, reservation or adjustment
+    quantity: int
+    reference: Optional[str] = None
+
+class StockMovementsRequest(BaseModel):
+    movements: List[StockMovementRequest]
+
 class OrderRequest(BaseModel):
     vendor_email: str
     vendor_name: str
@@ -23,156 +59,316 @@ class OrderRequest(BaseModel):
     quantity: int
     product_id: str
 
+class BatchWorkflowItem(BaseModel):
+    product_name: Optional[str] = None
+    category: Optional[str] = None
+    product_id: Optional[str] = None
+    demand: Optional[int] = None  # recorded demand of the matched product when omitted
+
+class BatchWorkflowRequest(BaseModel):
+    items: Optional[List[BatchWorkflowItem]] = None  # every inventory product when omitted
+    use_model: bool = True  # False: rule-based decisions only, no Gemini calls
+    send_orders: bool = False
+
+def analyze_product(db: Session, product_id: str) -> Dict[str, Any]:
+    # Get product from the shared inventory snapshot
+    product = get_inventory_snapshot(db).find_by_id(product_id)
+    
+    if not product:
+        raise HTTPException(status_code=404, detail=f"Product '{product_id}' not found")
+    
+    # Calculate total demand
+    total_demand = product_demand(db, product.product_id)
+    
+    # Current stock
+    current_stock = product.stock
+    
+    # Calculate required stock
+    required_stock = max(0, total_demand - current_stock)
+    
+    return {
+        "product_id": product.product_id,
+        "product_name": product.product_name,
+        "category_name": product.category_name,
+        "current_stock": current_stock,
+        "total_demand": total_demand,
+        "required_stock": required_stock,
+        "status": "reorder_needed" if required_stock > 0 else "sufficient_stock"
+    }
+
 @router.post("/analyze-inventory")
 def analyze_inventory(request: ProductIDRequest, db: Session = Depends(get_db)):
     """Analyze inventory for a specific product"""
     try:
-        # Get product from catalogue
-        product = db.query(ProductCatalogue).filter(
-            ProductCatalogue.product_id == request.product_id
-        ).first()
-        
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product '{request.product_id}' not found")
-        
-        # Calculate total demand
-        total_demand = db.query(func.sum(InputData.demand)).filter(
-            InputData.product_id == product.product_id
-        ).scalar() or 0
-        
-        # Current stock
-        current_stock = product.stock
-        
-        # Calculate required stock
-        required_stock = max(0, total_demand - current_stock)
-        
-        return {
-            "product_id": product.product_id,
-            "product_name": product.product_name,
-            "category_name": product.category_name,
-            "current_stock": current_stock,
-            "total_demand": total_demand,
-            "required_stock": required_stock,
-            "status": "reorder_needed" if required_stock > 0 else "sufficient_stock"
-        }
+        return analyze_product(db, request.product_id)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def vendor_for_product(db: Session, product_id: str) -> Dict[str, Any]:
+    # Get product from the shared inventory snapshot
+    product = get_inventory_snapshot(db).find_by_id(product_id)
+    
+    if not product:
+        raise HTTPException(status_code=404, detail=f"Product '{product_id}' not found")
+    
+    # Get vendor details
+    vendor = db.query(VendorList).filter(
+        VendorList.vendor_id == product.vendor_id
+    ).first()
+    
+    if not vendor:
+        raise HTTPException(status_code=404, detail=f"Vendor {product.vendor_id} not found")
+    
+    # Calculate required stock for additional context
+    total_demand = product_demand(db, product.product_id)
+    required_stock = max(0, total_demand - product.stock)
+    
+    return {
+        "vendor_id": vendor.vendor_id,
+        "vendor_name": vendor.vendor_name,
+        "location": vendor.location,
+        "email": vendor.email,
+        "contact": vendor.contact,
+        "product_id": product.product_id,
+        "product_name": product.product_name,
+        "required_stock": required_stock
+    }
+
 @router.post("/find-vendor")
-def find_vendor(request: ProductIDRequest, db: Session = Depends(get_db)):
+def find_vendor(request: ProductIDRequest, http_request: Request, db: Session = Depends(get_db)):
     """Find vendor for a specific product"""
     try:
-        # Get product from catalogue
-        product = db.query(ProductCatalogue).filter(
-            ProductCatalogue.product_id == request.product_id
-        ).first()
-        
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product '{request.product_id}' not found")
-        
-        # Get vendor details
-        vendor = db.query(VendorList).filter(
-            VendorList.vendor_id == product.vendor_id
-        ).first()
-        
-        if not vendor:
-            raise HTTPException(status_code=404, detail=f"Vendor {product.vendor_id} not found")
-        
-        # Calculate required stock for additional context
-        total_demand = db.query(func.sum(InputData.demand)).filter(
-            InputData.product_id == product.product_id
-        ).scalar() or 0
-        required_stock = max(0, total_demand - product.stock)
+        return cached_json(
+            http_request, db, ("find-vendor", request.product_id),
+            lambda: vendor_for_product(db, request.product_id), extra=(STOCK_GENERATION,)
+        )
         
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/suggest-products")
+def suggest_products(request: ProductSuggestionRequest, db: Session = Depends(get_db)):
+    """Suggest close inventory matches for product names that were not found"""
+    try:
+        index = get_trigram_index(db)
+        matches = index.suggest(request.product_names, top_k=request.top_k, min_score=request.min_score)
         return {
-            "vendor_id": vendor.vendor_id,
-            "vendor_name": vendor.vendor_name,
-            "location": vendor.location,
-            "email": vendor.email,
-            "contact": vendor.contact,
-            "product_id": product.product_id,
-            "product_name": product.product_name,
-            "required_stock": required_stock
+            "status": "success",
+            "data": [
+                {"product_name": name, "suggestions": suggestions}
+                for name, suggestions in zip(request.product_names, matches)
+            ]
         }
-        
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def order_after_transfers(db: Session, request: OrderRequest) -> Tuple[int, List[Dict[str, Any]]]:
+    """Units still to order from the vendor once nearby warehouses cover what they can"""
+    remaining, transfers = plan_transfers(db, [{
+        "product_id": request.product_id, "product_name": request.product_name, "shortage": request.quantity
+    }])
+    return (remaining[0]["shortage"] if remaining else 0), transfers
+
+def transfers_only(request: OrderRequest, transfers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"message": f"Order covered by warehouse transfers; nothing sent to {request.vendor_name}",
+            "transfers": transfers}
+
+def order_query(request: OrderRequest, quantity: int) -> str:
+    return f"Send order email to {request.vendor_name} at {request.vendor_email} for {quantity} units of {request.product_name} (ID: {request.product_id})"
+
 @router.post("/send-order")
-def send_order(request: OrderRequest):
-    """Send order to vendor using email agent"""
+def send_order(request: OrderRequest, db: Session = Depends(get_db)):
+    """Send order to vendor using email agent, for what nearby warehouses cannot transfer"""
     try:
+        quantity, transfers = order_after_transfers(db, request)
+        if quantity <= 0:
+            return transfers_only(request, transfers)
+
         # Create workflow agent
         agent = create_workflow_agent()
         
         # Use agent to send email
-        query = f"Send order email to {request.vendor_name} at {request.vendor_email} for {request.quantity} units of {request.product_name} (ID: {request.product_id})"
-        result = agent.invoke({"input": query})
+        result = agent.invoke({"input": order_query(request, quantity)})
         
         return {
             "message": f"Order request sent to {request.vendor_name}",
-            "details": result
+            "details": result,
+            "transfers": transfers
         }
         
+    except CircuitOpenError as e:
+        raise circuit_open(e)
     except Exception as e:
         return {"message": f"Failed to send order: {str(e)}"}
 
+def dashboard_data(db: Session) -> Dict[str, Any]:
+    # Every product from the shared inventory snapshot, as arrays
+    snapshot = get_inventory_snapshot(db)
+    product_ids = snapshot.product_ids.to_numpy()
+    stock = np.asarray(snapshot.stock, dtype=np.int64)
+    
+    # Total demand per product from the precomputed monthly rollup
+    total_demand = pd.Series(demand_totals(db), dtype=np.int64).reindex(product_ids, fill_value=0).to_numpy()
+    required_stock = np.maximum(0, total_demand - stock)
+    rows = np.flatnonzero(required_stock > 0)
+    
+    reorder_products = [
+        {
+            "product_id": product_id,
+            "product_name": product_name,
+            "current_stock": current_stock,
+            "total_demand": demand,
+            "required_stock": required
+        }
+        for product_id, product_name, current_stock, demand, required in zip(
+            product_ids[rows].tolist(), snapshot.product_names.take(rows).tolist(), stock[rows].tolist(),
+            total_demand[rows].tolist(), required_stock[rows].tolist()
+        )
+    ]
+    
+    return {
+        "total_products": len(snapshot),
+        "reorder_count": len(reorder_products),
+        "reorder_products": reorder_products
+    }
+
 @router.get("/dashboard-data")
-def get_dashboard_data(db: Session = Depends(get_db)):
+def get_dashboard_data(request: Request, db: Session = Depends(get_db)):
     """Get dashboard data including products needing reorder"""
     try:
-        # Get all products
-        products = db.query(ProductCatalogue).all()
-        total_products = len(products)
-        
-        reorder_products = []
-        
-        for product in products:
-            # Calculate total demand for this product
-            total_demand = db.query(func.sum(InputData.demand)).filter(
-                InputData.product_id == product.product_id
-            ).scalar() or 0
-            
-            required_stock = max(0, total_demand - product.stock)
-            
-            if required_stock > 0:
-                reorder_products.append({
-                    "product_id": product.product_id,
-                    "product_name": product.product_name,
-                    "current_stock": product.stock,
-                    "total_demand": total_demand,
-                    "required_stock": required_stock
-                })
-        
-        return {
-            "total_products": total_products,
-            "reorder_count": len(reorder_products),
-            "reorder_products": reorder_products
-        }
+        return cached_json(request, db, ("dashboard-data",), lambda: dashboard_data(db), extra=(STOCK_GENERATION,))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def products_page(db: Session, after_id: Optional[int], limit: int) -> Dict[str, Any]:
+    # The catalogue is the inventory table; page it like /inventory, without stock and vendor
+    rows, next_cursor = inventory_page(db, after_id, limit)
+    return {
+        "status": "success",
+        "data": [
+            {"product_id": r["product_id"], "product_name": r["product_name"], "category_name": r["category_name"]}
+            for r in rows
+        ],
+        "next_cursor": next_cursor
+    }
+
 @router.get("/products")
-def get_all_products(db: Session = Depends(get_db)):
-    """Get all products from catalogue"""
+def get_all_products(request: Request, after_id: Optional[int] = None,
+                     limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_db)):
+    """Get products from inventory, one keyset page at a time (pass next_cursor as after_id)"""
+    try:
+        return cached_json(
+            request, db, ("products", after_id, limit), lambda: products_page(db, after_id, limit)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def inventory_listing(db: Session, after_id: Optional[int], limit: int) -> Dict[str, Any]:
+    rows, next_cursor = inventory_page(db, after_id, limit)
+    return {"status": "success", "data": rows, "next_cursor": next_cursor}
+
+@router.get("/inventory")
+def get_inventory(request: Request, after_id: Optional[int] = None,
+                  limit: int = Query(100, ge=1, le=1000), db: Session = Depends(get_db)):
+    """Get inventory rows one keyset page at a time (pass next_cursor as after_id)"""
+    try:
+        return cached_json(
+            request, db, ("inventory", after_id, limit), lambda: inventory_listing(db, after_id, limit)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@shared_router.post("/stock/movements")
+def post_stock_movements(request: StockMovementsRequest, db: Session = Depends(get_db)):
+    """Record receipts, reservations and adjustments in one transaction"""
+    invalid = sorted({m.kind for m in request.movements} - set(MOVEMENT_KINDS))
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Unknown movement kind(s): {', '.join(invalid)}")
+    try:
+        recorded = record_movements(db, (m.model_dump() for m in request.movements))
+        return {"status": "success", "recorded": recorded}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@shared_router.get("/stock/{product_id}")
+def get_stock_level(product_id: str, history: int = Query(20, ge=0, le=1000), db: Session = Depends(get_db)):
+    """On-hand and on-order quantities for a product plus its latest ledger entries"""
     try:
-        products = db.query(ProductCatalogue).all()
+        item = get_inventory_snapshot(db).find_by_id(product_id)
+        on_hand, on_order = stock_level(db, product_id, item.stock if item else 0)
         return {
-            "status": "success",
-            "data": [
-                {
-                    "product_id": p.product_id,
-                    "product_name": p.product_name,
-                    "category_name": p.category_name
-                }
-                for p in products
-            ]
+            "product_id": product_id,
+            "on_hand": on_hand,
+            "on_order": on_order,
+            "movements": movement_history(db, product_id, history) if history else []
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@shared_router.get("/cache-stats")
+def get_cache_stats():
+    """Hit/miss counters of the API response cache"""
+    return response_cache.stats()
+
+@shared_router.get("/inventory/export")
+def export_inventory(format: str = "csv", chunk_size: int = Query(5000, ge=100, le=100000)):
+    """Stream the inventory (joined with vendors) as CSV, NDJSON or Parquet"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}'")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow")
+
+    # The session must outlive the request handler, so the generator owns it
+    def body():
+        db = SessionLocal()
+        try:
+            yield from stream_inventory_export(db, format, chunk_size)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="inventory_export.{format}"'}
+    )
+
+def batch_workflow_items(request: BatchWorkflowRequest) -> Optional[List[Dict[str, Any]]]:
+    return None if request.items is None else [item.model_dump() for item in request.items]
+
+def send_reorders(db: Session, decisions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Cover reorder decisions from nearby warehouses, then send one purchase order per
+    vendor/product for the rest; returns order_results and transfers"""
+    orders, transfers = plan_transfers(db, reorder_orders(decisions))
+    return {
+        "order_results": send_bulk_orders_grouped(db, group_orders_by_vendor_product(db, orders)),
+        "transfers": transfers
+    }
+
+@router.post("/agent-workflow/batch")
+def run_batch_agent_workflow(request: BatchWorkflowRequest, db: Session = Depends(get_db)):
+    """Analyze many products in one batched workflow and return a decision per product"""
+    try:
+        workflow = BatchWorkflow(create_workflow_llm(temperature=0) if request.use_model else None)
+        result = workflow.run(db, batch_workflow_items(request))
+        if request.send_orders:
+            result.update(send_reorders(db, result["decisions"]))
+        return {"status": "success", **result}
+        
+    except CircuitOpenError as e:
+        raise circuit_open(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def circuit_open(e: CircuitOpenError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_in) + 1)})
+
+@shared_router.get("/metrics/outbound")
+def outbound_metrics():
+    """Per-provider throughput, throttling and circuit state of outbound calls in this process"""
+    return governor_metrics()
+
 @router.post("/agent-workflow")
 def run_agent_workflow(request: ProductRequest):
     """Run the complete agent workflow for inventory management"""
@@ -189,5 +385,140 @@ def run_agent_workflow(request: ProductRequest):
             "result": result
         }
         
+    except CircuitOpenError as e:
+        raise circuit_open(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@shared_router.post("/jobs")
+def submit_demand_job(file: UploadFile = File(...), store_mode: Optional[str] = Form(None),
+                      store_priority: Optional[str] = Form(None), record_history: bool = Form(False)):
+    """Queue a demand file for background processing"""
+    try:
+        priority = [s.strip() for s in (store_priority or "").split(",") if s.strip()]
+        job_id = jobs.submit_job(file.filename, file.file.read(), store_mode or None, priority, record_history)
+        return {"status": "success", "job_id": job_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@shared_router.get("/jobs/{job_id}")
+def get_demand_job(job_id: str, include_result: bool = False):
+    """Get status, progress and optionally the result of a background job"""
+    job = jobs.get_job(job_id, include_result=include_result)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+@shared_router.get("/jobs/{job_id}/shortages")
+def get_job_shortages(job_id: str, rank_by: str = "shortage", limit: int = Query(100, ge=1, le=10000),
+                      offset: int = Query(0, ge=0)):
+    """A finished job's shortages in priority order, one page at a time (pass next_offset as offset)"""
+    if rank_by not in RANKINGS:
+        raise HTTPException(status_code=400, detail=f"Unknown ranking '{rank_by}'")
+    job = jobs.get_job(job_id, include_result=False)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is {job['status']}")
+    try:
+        ranking = jobs.job_shortage_ranking(job_id)
+        data = ranking.page(rank_by, limit, offset)
+        next_offset = offset + len(data)
+        return {
+            "status": "success",
+            "rank_by": rank_by,
+            "total": len(ranking),
+            "data": data,
+            "next_offset": next_offset if next_offset < len(ranking) else None,
+        }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@shared_router.get("/jobs/{job_id}/events")
+def stream_demand_job(job_id: str):
+    """Stream job progress as server-sent events until the job finishes"""
+    def events():
+        for snapshot in jobs.iter_job_progress(job_id):
+            yield f"data: {json.dumps(snapshot)}\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@shared_router.post("/demand-history")
+def upload_demand_history(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """Append a demand file to the per-store, per-product history used for forecasting"""
+    payload = file.file.read()
+    try:
+        df_demand = read_demand_file(io.BytesIO(payload), file.filename)
+    except UnsupportedFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        rows = record_demand_history(db, df_demand, file.filename, jobs.payload_fingerprint(payload))
+        return {"status": "success", "rows": rows, "duplicate": rows == 0 and len(df_demand) > 0}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@shared_router.get("/forecast")
+def get_reorder_forecast(request: Request, method: str = "ses", freq: str = "D",
+                         alpha: float = Query(0.3, gt=0, le=1), window: int = Query(28, ge=1),
+                         lead_time: float = Query(7, gt=0), horizon: float = Query(14, gt=0),
+                         service_level: float = Query(0.95, gt=0, lt=1), db: Session = Depends(get_db)):
+    """Purchase suggestions from forecast demand, safety stock and reorder points"""
+    if method not in FORECAST_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown method '{method}'")
+    if freq not in FREQUENCIES:
+        raise HTTPException(status_code=400, detail=f"Unknown frequency '{freq}'")
+    try:
+        key = ("forecast", method, freq, alpha, window, lead_time, horizon, service_level)
+        return cached_json(request, db, key, lambda: {
+            "status": "success",
+            "data": reorder_suggestions(db, method, freq, alpha, window, lead_time, service_level, horizon),
+        }, extra=(STOCK_GENERATION,))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@shared_router.get("/demand-rollups")
+def get_demand_rollups(request: Request, grain: str = "M", by: str = "product", product_id: Optional[str] = None,
+                       category: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                       db: Session = Depends(get_db)):
+    """Daily, weekly or monthly demand per product or category, maintained at ingestion"""
+    if grain not in ROLLUP_GRAINS:
+        raise HTTPException(status_code=400, detail=f"Unknown grain '{grain}'")
+    if by not in ("product", "category"):
+        raise HTTPException(status_code=400, detail=f"Unknown grouping '{by}'")
+    try:
+        key = ("demand-rollups", grain, by, product_id, category, since, until)
+        return cached_json(request, db, key, lambda: {
+            "status": "success",
+            "data": demand_rollups(db, grain, by, product_id, category, since, until),
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@shared_router.get("/warehouses")
+def get_warehouses(request: Request, db: Session = Depends(get_db)):
+    """Warehouses nearest first, with distance from the local one and the stock each holds"""
+    try:
+        return cached_json(request, db, ("warehouses",), lambda: {"status": "success", "data": warehouse_summary(db)},
+                           extra=(STOCK_GENERATION,))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@shared_router.post("/warehouses")
+def upload_warehouses(warehouses: Optional[UploadFile] = File(None), stock: Optional[UploadFile] = File(None)):
+    """Register warehouses and/or replace the stock of every warehouse listed in the uploaded files"""
+    if warehouses is None and stock is None:
+        raise HTTPException(status_code=400, detail="Upload a warehouses file, a stock file or both")
+    try:
+        frames = [
+            read_table(io.BytesIO(upload.file.read()), upload.filename, schema) if upload is not None else None
+            for upload, schema in ((warehouses, WAREHOUSE_SCHEMA), (stock, WAREHOUSE_STOCK_SCHEMA))
+        ]
+    except UnsupportedFileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return {"status": "success", **load_warehouses(*frames)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+router.include_router(shared_router)
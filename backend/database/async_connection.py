@@ -0,0 +1,18 @@
+# database/async_connection.py
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from database.models import DATABASE_URL
+
+# Same SQLite file as the sync engine, driven by aiosqlite so queries never block the event loop
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+# No pooling: each aiosqlite connection owns a non-daemon thread bound to the event loop that
+# opened it, so pooled connections would outlive asyncio.run() and block interpreter exit.
+# Opening a SQLite file per session is cheap.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+async def get_async_db():
+    """Dependency to get an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
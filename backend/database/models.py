@@ -1,9 +1,14 @@
 # database/models.py
-from sqlalchemy import Column, Integer, String, Float, create_engine, func
+from sqlalchemy import (
+    Column, Integer, String, Float, Text, DateTime, MetaData, Table, UniqueConstraint,
+    create_engine, event, func, inspect, literal, select, text
+)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import sessionmaker
-import pandas as pd
+import re
 import sys
+from datetime import datetime
 from pathlib import Path
 
 # Add the parent directory to Python path
@@ -32,55 +37,340 @@ class VendorList(Base):
     email = Column(String)
     contact = Column(String)
 
+class ProductCatalogue(Base):
+    __tablename__ = "product_catalogue"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(String, index=True)
+    category_name = Column(String)
+    product_name = Column(String)
+    vendor_id = Column(String)
+    stock = Column(Integer)
+
+class InputData(Base):
+    __tablename__ = "input_data"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    store_id = Column(String)
+    product_id = Column(String)
+    category_name = Column(String)
+    product_name = Column(String)
+    month = Column(String)
+    sales = Column(Integer)
+    demand = Column(Integer)
+
+class DemandUpload(Base):
+    __tablename__ = "demand_uploads"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    fingerprint = Column(String, unique=True)
+    file_name = Column(String)
+    rows = Column(Integer)
+    created_at = Column(DateTime)
+
+class DemandPartition(Base):
+    __tablename__ = "demand_partitions"
+    
+    table_name = Column(String, primary_key=True)
+    period = Column(String, unique=True)  # YYYY-MM
+    created_at = Column(DateTime)
+
+class DemandRollup(Base):
+    __tablename__ = "demand_rollups"
+    __table_args__ = (
+        UniqueConstraint("grain", "period", "product_key", "category_name", name="uq_demand_rollups_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    grain = Column(String)  # D, W or M
+    period = Column(String)  # first day of the period, YYYY-MM-DD
+    product_key = Column(String, index=True)  # product_id, or product_name when the id is blank
+    category_name = Column(String)
+    product_name = Column(String)
+    sales = Column(Integer, default=0)
+    demand = Column(Integer, default=0)
+
+# Monthly demand history tables live outside Base so create_all does not touch them
+partition_metadata = MetaData()
+
+def demand_partition_table(period):
+    """Table holding one month (YYYY-MM) of per-store, per-product, per-day demand"""
+    name = f"demand_history_{period.replace('-', '_')}"
+    table = partition_metadata.tables.get(name)
+    if table is None:
+        table = Table(
+            name, partition_metadata,
+            Column("id", Integer, primary_key=True),
+            Column("upload_id", Integer, index=True),
+            Column("store_id", String),
+            Column("product_id", String),
+            Column("product_key", String, index=True),
+            Column("category_name", String),
+            Column("product_name", String),
+            Column("day", String),  # YYYY-MM-DD
+            Column("sales", Integer),
+            Column("demand", Integer),
+        )
+    return table
+
+class Warehouse(Base):
+    __tablename__ = "warehouses"
+    
+    warehouse_id = Column(String, primary_key=True)
+    warehouse_name = Column(String)
+    location = Column(String)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    table_name = Column(String, unique=True)  # stock shard, see warehouse_stock_table
+    updated_at = Column(DateTime)
+
+# One stock table per warehouse; like the demand partitions they live outside Base
+warehouse_metadata = MetaData()
+
+def warehouse_stock_table(warehouse_id):
+    """Table holding one warehouse's on-hand stock per product"""
+    slug = re.sub(r"[^0-9a-z]+", "_", str(warehouse_id).strip().lower()).strip("_")
+    name = f"warehouse_stock_{slug}"
+    table = warehouse_metadata.tables.get(name)
+    if table is None:
+        table = Table(
+            name, warehouse_metadata,
+            Column("id", Integer, primary_key=True),
+            Column("product_id", String, index=True),
+            Column("stock", Integer),
+        )
+    return table
+
+class DemandJob(Base):
+    __tablename__ = "demand_jobs"
+    
+    id = Column(String, primary_key=True)
+    status = Column(String, index=True)
+    file_name = Column(String)
+    fingerprint = Column(String, index=True)
+    store_mode = Column(String)
+    rows_total = Column(Integer, default=0)
+    rows_parsed = Column(Integer, default=0)
+    keys_aggregated = Column(Integer, default=0)
+    total_keys = Column(Integer, default=0)
+    matches_done = Column(Integer, default=0)
+    result = Column(Text)
+    error = Column(Text)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+class IngestedFile(Base):
+    __tablename__ = "ingested_files"
+    
+    fingerprint = Column(String, primary_key=True)
+    file_name = Column(String)
+    status = Column(String)  # succeeded or failed; only succeeded files are skipped when dropped again
+    rows = Column(Integer, default=0)
+    shortages = Column(Integer, default=0)
+    missing = Column(Integer, default=0)
+    result = Column(Text)  # JSON summary with the written output paths
+    error = Column(Text)
+    created_at = Column(DateTime)
+
+class StockMovement(Base):
+    __tablename__ = "stock_movements"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(String, index=True)
+    kind = Column(String)  # receipt, reservation or adjustment
+    quantity = Column(Integer)
+    reference = Column(String)
+    created_at = Column(DateTime)
+
+class StockLevel(Base):
+    __tablename__ = "stock_levels"
+    
+    product_id = Column(String, primary_key=True)
+    on_hand = Column(Integer, default=0)
+    on_order = Column(Integer, default=0)
+    updated_at = Column(DateTime)
+
+class SentOrder(Base):
+    __tablename__ = "sent_orders"
+    __table_args__ = (
+        UniqueConstraint("vendor_id", "product_id", "fingerprint", "window", name="uq_sent_orders_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    vendor_id = Column(String)
+    product_id = Column(String)
+    fingerprint = Column(String)
+    window = Column(Integer)
+    quantity = Column(Integer)
+    status = Column(String)  # pending while the email is in flight, then sent
+    sent_at = Column(DateTime)  # claim time while pending
+
+class DataGeneration(Base):
+    __tablename__ = "data_generations"
+    
+    name = Column(String, primary_key=True)
+    generation = Column(Integer, default=0)
+
+# Counters bumped whenever the underlying tables are rewritten; caches key on them
+GENERATION_NAMES = ("inventory", "demand", "warehouses")
+# Bumped by every stock level change (ledger writes and reloads); only stock readers key on it
+STOCK_GENERATION = "stock"
+
 # Database setup
-DATABASE_URL = f"sqlite:///{settings.BASE_DIR}/inventory.db"
+DATABASE_URL = settings.DATABASE_URL
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _use_wal(dbapi_connection, connection_record):
+    """WAL lets readers keep reading the last committed data while a writer (e.g. a reload) works"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+if settings.SQLITE_WAL and engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _use_wal)
+
+# Rows inserted per transaction while a reload fills its shadow tables
+RELOAD_CHUNK_ROWS = 50_000
+
+_generation_table_ready = False
+
+def ensure_generation_table():
+    global _generation_table_ready
+    if not _generation_table_ready:
+        DataGeneration.__table__.create(bind=engine, checkfirst=True)
+        _generation_table_ready = True
+
+def get_generations(db, names=GENERATION_NAMES):
+    """Current generation of each named dataset (0 if it was never bumped)"""
+    ensure_generation_table()
+    rows = dict(db.query(DataGeneration.name, DataGeneration.generation).filter(
+        DataGeneration.name.in_(names)
+    ).all())
+    return tuple(rows.get(name, 0) for name in names)
+
+def bump_generation(db, *names):
+    """Advance generation counters inside the caller's transaction (committed with the data)"""
+    ensure_generation_table()
+    for name in names:
+        db.execute(
+            insert(DataGeneration).values(name=name, generation=1).on_conflict_do_update(
+                index_elements=["name"], set_={"generation": DataGeneration.generation + 1}
+            )
+        )
+
+def reset_stock_levels(db):
+    """Take freshly loaded stock as the new on-hand count; outstanding on-order quantities stay"""
+    now = datetime.utcnow()
+    product_id = func.trim(InventoryData.product_id)
+    stmt = insert(StockLevel).from_select(
+        ["product_id", "on_hand", "on_order", "updated_at"],
+        select(product_id, func.coalesce(func.max(InventoryData.stock), 0), literal(0), literal(now))
+        .where(InventoryData.product_id.isnot(None)).group_by(product_id)
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["product_id"],
+        set_={"on_hand": stmt.excluded.on_hand, "updated_at": stmt.excluded.updated_at}
+    ))
+
+def _reload_leftovers(conn, names):
+    """Shadow or retired tables left behind by a reload that was interrupted"""
+    pattern = re.compile(rf"^(?:{'|'.join(map(re.escape, names))})_(?:retired_)?g\d+$")
+    return [name for name in inspect(conn).get_table_names() if pattern.match(name)]
+
+def load_shadow_table(table, records, generation):
+    """Create `<table>_g<generation>` (indexes are suffixed the same way) and fill it in chunks"""
+    shadow = table.to_metadata(MetaData(), name=f"{table.name}_g{generation}")
+    shadow.create(bind=engine)
+    for start in range(0, len(records), RELOAD_CHUNK_ROWS):
+        # One short write transaction per chunk, so other writers get their turn during a long load
+        with engine.begin() as conn:
+            conn.execute(insert(shadow), records[start:start + RELOAD_CHUNK_ROWS])
+    return shadow
+
+def reload_tables(loads, generation_names=("inventory",), after_swap=None):
+    """Replace whole tables without readers ever seeing them empty or waiting for the load.
+
+    `loads` pairs each table with its new rows (dicts). The rows go into shadow tables named
+    after the next generation while readers keep using the live ones; then one short
+    transaction renames live -> retired and shadow -> live, runs after_swap(db) and bumps the
+    generations, so readers see either the old or the new data. Returns the new generation.
+    """
+    names = [table.name for table, _ in loads]
+    with engine.begin() as conn:
+        for name in _reload_leftovers(conn, names):
+            conn.exec_driver_sql(f'DROP TABLE "{name}"')
+    with SessionLocal() as db:
+        generation = get_generations(db, generation_names)[0] + 1
+    shadows = [load_shadow_table(table, records, generation) for table, records in loads]
+
+    with SessionLocal() as db:
+        # Explicit: the sqlite3 driver only opens a transaction before DML, which would leave
+        # the renames below running on their own. IMMEDIATE also waits for other writers once, up front.
+        db.execute(text("BEGIN IMMEDIATE"))
+        for name, shadow in zip(names, shadows):
+            db.execute(text(f'ALTER TABLE "{name}" RENAME TO "{name}_retired_g{generation}"'))
+            db.execute(text(f'ALTER TABLE "{shadow.name}" RENAME TO "{name}"'))
+        if after_swap:
+            after_swap(db)
+        bump_generation(db, *generation_names)
+        db.commit()
+
+    # Readers still inside a transaction from before the swap keep their own view in WAL mode
+    with engine.begin() as conn:
+        for name in names:
+            conn.exec_driver_sql(f'DROP TABLE "{name}_retired_g{generation}"')
+    return generation
+
+def _records(frame, columns):
+    """DataFrame rows as dicts keyed by table column, with missing values as None"""
+    frame = frame.rename(columns=columns)[list(columns.values())]
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
 def init_db():
-    """Initialize database and load data from Excel files"""
+    """Initialize database and load data from Excel files.
+
+    The sheets are loaded into shadow tables and swapped in atomically, so the UI, tools and
+    API keep serving the previous data during the load.
+    """
     Base.metadata.create_all(bind=engine)
     
-    db = SessionLocal()
-    
-    # Clear existing data
-    db.query(InventoryData).delete()
-    db.query(VendorList).delete()
-    
     # Load data from Excel files
     try:
+        from pipeline.readers import STOCK_SCHEMA, VENDOR_SCHEMA, read_table
+
         # Load Stock Data (Inventory Dataset)
-        df_stock = pd.read_excel(settings.BASE_DIR / "backend" / "data" / "stock data.xlsx")
-        for _, row in df_stock.iterrows():
-            inventory = InventoryData(
-                product_id=row['product_id'],
-                category_name=row['Category_name'],
-                product_name=row['product_name'],
-                vendor_id=row['vendor_id'],
-                stock=row['stock']
-            )
-            db.add(inventory)
-        
+        df_stock = read_table(settings.BASE_DIR / "backend" / "data" / "stock data.xlsx", "stock data.xlsx", STOCK_SCHEMA)
         # Load Vendor Data
-        df_vendor = pd.read_excel(settings.BASE_DIR / "backend" / "data" / "vendor data.xlsx")
-        for _, row in df_vendor.iterrows():
-            vendor = VendorList(
-                vendor_id=row['vendor_id'],
-                vendor_name=row['vendor_name'],
-                location=row['Location'],
-                email=row['email'],
-                contact=row['contact']
-            )
-            db.add(vendor)
+        df_vendor = read_table(settings.BASE_DIR / "backend" / "data" / "vendor data.xlsx", "vendor data.xlsx", VENDOR_SCHEMA)
         
-        db.commit()
+        reload_tables([
+            (InventoryData.__table__, _records(df_stock, {
+                'product_id': 'product_id', 'Category_name': 'category_name', 'product_name': 'product_name',
+                'vendor_id': 'vendor_id', 'stock': 'stock'
+            })),
+            (VendorList.__table__, _records(df_vendor, {
+                'vendor_id': 'vendor_id', 'vendor_name': 'vendor_name', 'Location': 'location',
+                'email': 'email', 'contact': 'contact'
+            })),
+        ], generation_names=("inventory", STOCK_GENERATION), after_swap=reset_stock_levels)
+        
+        # Other warehouses (optional): where they are and what each holds, one table per warehouse
+        warehouse_file = settings.BASE_DIR / "backend" / "data" / "warehouse data.xlsx"
+        warehouse_stock_file = settings.BASE_DIR / "backend" / "data" / "warehouse stock.xlsx"
+        if warehouse_file.exists() or warehouse_stock_file.exists():
+            from pipeline.readers import WAREHOUSE_SCHEMA, WAREHOUSE_STOCK_SCHEMA
+            from pipeline.warehouses import load_warehouses
+            load_warehouses(
+                read_table(warehouse_file, warehouse_file.name, WAREHOUSE_SCHEMA) if warehouse_file.exists() else None,
+                read_table(warehouse_stock_file, warehouse_stock_file.name, WAREHOUSE_STOCK_SCHEMA)
+                if warehouse_stock_file.exists() else None
+            )
         print("Database initialized successfully with inventory and vendor data!")
         
     except Exception as e:
         print(f"Error initializing database: {e}")
-        db.rollback()
-    finally:
-        db.close()
 
 if __name__ == "__main__":
     init_db()
\ No newline at end of file
@@ -0,0 +1,202 @@
+# pipeline/allocation.py
+from typing import Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from pipeline.inventory import INVENTORY_COLUMNS, normalize_series, strip_series
+
+
+ALLOCATION_MODES = ("proportional", "priority")
+
+ORDER_COLUMNS = ["store_id", "product_id", "category", "product_name",
+                 "current_stock", "on_order", "demand", "shortage", "vendor_id"]
+
+
+def _text_column(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df.columns:
+        return df[name].fillna("").astype(str)
+    return pd.Series("", index=df.index, dtype=object)
+
+
+def _first_non_empty(values: pd.Series) -> pd.Series:
+    return values.mask(values == "")
+
+
+STORE_KEYS = ["store_id", "name_norm", "cat_norm"]
+
+
+def demand_frame(df_demand: pd.DataFrame) -> pd.DataFrame:
+    """Coerce raw demand rows into typed columns plus normalized match keys"""
+    if "demand" in df_demand.columns:
+        demand = pd.to_numeric(df_demand["demand"]).fillna(0).astype("int64")
+    else:
+        demand = pd.Series(0, index=df_demand.index, dtype="int64")
+
+    frame = pd.DataFrame({
+        "store_id": strip_series(_text_column(df_demand, "store_id")),
+        "product_name": _text_column(df_demand, "product_name"),
+        "category": _text_column(df_demand, "Category"),
+        "product_id": _first_non_empty(strip_series(_text_column(df_demand, "product_id"))),
+        "demand": demand,
+    })
+    frame["name_norm"] = normalize_series(frame["product_name"])
+    frame["cat_norm"] = normalize_series(frame["category"])
+    return frame
+
+
+def group_demand(frame: pd.DataFrame, keys) -> pd.DataFrame:
+    """Sum demand per key in first-seen order, keeping the first display values.
+
+    Empty product_ids stay NaN so results can be grouped again (e.g. when merging
+    partial aggregates of shards) without losing the first non-empty id.
+    """
+    return frame.groupby(keys, sort=False).agg(
+        product_name=("product_name", "first"),
+        category=("category", "first"),
+        product_id=("product_id", "first"),
+        demand=("demand", "sum"),
+    ).reset_index()
+
+
+def aggregate_store_demand(df_demand: pd.DataFrame) -> pd.DataFrame:
+    """Sum demand per (store_id, product_name, Category), keeping first-seen display values"""
+    store_rows = group_demand(demand_frame(df_demand), STORE_KEYS)
+    store_rows["product_id"] = store_rows["product_id"].fillna("")
+    return store_rows
+
+
+def match_inventory(products: pd.DataFrame, inventory: pd.DataFrame) -> pd.DataFrame:
+    """Look up inventory by normalized (name, category), falling back to product_id"""
+    # Later rows win, mirroring the dict-based indexes used elsewhere
+    by_key = inventory.drop_duplicates(["name_norm", "cat_norm"], keep="last")
+    by_id = inventory[inventory["product_id"] != ""].drop_duplicates("product_id", keep="last")
+
+    key_hit = products[["name_norm", "cat_norm"]].merge(
+        by_key[["name_norm", "cat_norm"] + INVENTORY_COLUMNS].assign(_hit=True),
+        how="left", on=["name_norm", "cat_norm"]
+    )
+    id_hit = products[["product_id"]].merge(
+        by_id[INVENTORY_COLUMNS].assign(_hit=True),
+        how="left", on="product_id"
+    )
+
+    use_key = key_hit["_hit"].notna().to_numpy()
+    use_id = ~use_key & id_hit["_hit"].notna().to_numpy()
+
+    matched = pd.DataFrame(index=products.index)
+    for col in INVENTORY_COLUMNS:
+        matched["inv_" + col] = np.where(use_key, key_hit[col].to_numpy(), id_hit[col].to_numpy())
+    for col in ("inv_stock", "inv_on_order"):
+        matched[col] = pd.to_numeric(matched[col]).fillna(0).astype("int64")
+    matched["matched"] = use_key | use_id
+    return matched
+
+
+def allocate_stock(codes: np.ndarray, demand: np.ndarray, stock: np.ndarray,
+                   mode: str = "proportional", priority: Optional[np.ndarray] = None) -> np.ndarray:
+    """Split each product's stock across its store rows and return allocated units per row.
+
+    `codes` groups rows by product, `stock` is the product's stock repeated per row and
+    `priority` ranks stores (lower first) for priority mode.
+    """
+    if mode not in ALLOCATION_MODES:
+        raise ValueError(f"Unknown allocation mode '{mode}'")
+
+    n = len(codes)
+    rows = np.arange(n)
+    demand = demand.astype(np.int64)
+    totals = np.bincount(codes, weights=demand).astype(np.int64)
+    available = np.minimum(stock.astype(np.int64), totals[codes])
+    allocated = np.zeros(n, dtype=np.int64)
+
+    if mode == "proportional":
+        # Integer largest-remainder split: floor shares first, then hand leftover
+        # units to the rows with the largest remainders within each product
+        total_row = np.maximum(totals[codes], 1)
+        numerator = demand * available
+        base = numerator // total_row
+        remainder = numerator % total_row
+        leftover = np.zeros(len(totals), dtype=np.int64)
+        leftover[codes] = available
+        leftover -= np.bincount(codes, weights=base, minlength=len(totals)).astype(np.int64)
+
+        order = np.lexsort((rows, -remainder, codes))
+        sorted_codes = codes[order]
+        rank = rows - np.searchsorted(sorted_codes, sorted_codes, side="left")
+        allocated[order] = base[order] + (rank < leftover[sorted_codes])
+    else:
+        if priority is None:
+            priority = rows
+        order = np.lexsort((rows, priority, codes))
+        sorted_codes = codes[order]
+        sorted_demand = demand[order]
+        group_start = np.searchsorted(sorted_codes, sorted_codes, side="left")
+        cumulative = np.cumsum(sorted_demand)
+        served_before = cumulative - sorted_demand - (cumulative[group_start] - sorted_demand[group_start])
+        allocated[order] = np.clip(available[order] - served_before, 0, sorted_demand)
+
+    return allocated
+
+
+def _store_priority(store_ids: pd.Series, store_priority: Optional[Sequence[str]]) -> np.ndarray:
+    """Rank stores by the given priority list; unlisted stores follow in file order"""
+    first_seen, uniques = pd.factorize(store_ids)
+    ranks = np.arange(len(uniques)) + len(store_priority or [])
+    for position, store in enumerate(store_priority or []):
+        hits = np.flatnonzero(uniques == str(store).strip())
+        ranks[hits] = position
+    return ranks[first_seen]
+
+
+def compute_store_shortages(df_demand: pd.DataFrame, inventory: pd.DataFrame, mode: str = "proportional",
+                            store_priority: Optional[Sequence[str]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Allocate stock across stores and return (per-store rows, per-product totals)"""
+    return allocate_store_demand(aggregate_store_demand(df_demand), inventory, mode, store_priority)
+
+
+def allocate_store_demand(store_rows: pd.DataFrame, inventory: pd.DataFrame, mode: str = "proportional",
+                          store_priority: Optional[Sequence[str]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Allocate stock across already aggregated (store, product) rows"""
+    store_rows = store_rows.reset_index(drop=True)
+    product_keys = ["name_norm", "cat_norm"]
+    codes = store_rows.groupby(product_keys, sort=False).ngroup().to_numpy()
+    products = store_rows.assign(product_id=_first_non_empty(store_rows["product_id"])).groupby(
+        product_keys, sort=False
+    ).agg(
+        product_name=("product_name", "first"),
+        category=("category", "first"),
+        product_id=("product_id", "first"),
+        demand=("demand", "sum"),
+        stores=("store_id", "nunique"),
+    ).reset_index()
+    products["product_id"] = products["product_id"].fillna("")
+
+    matched = match_inventory(products, inventory)
+    products["product_id"] = products["product_id"].where(products["product_id"] != "", matched["inv_product_id"].fillna(""))
+    products["category"] = products["category"].where(products["category"] != "", matched["inv_category_name"].fillna(""))
+    products["product_name"] = products["product_name"].where(products["product_name"] != "", matched["inv_product_name"].fillna(""))
+    products["vendor_id"] = matched["inv_vendor_id"].where(matched["matched"], "").fillna("")
+    products["current_stock"] = matched["inv_stock"]
+    products["on_order"] = matched["inv_on_order"]
+    products["matched"] = matched["matched"]
+
+    # Units already on order count as supply, so outstanding POs are not placed twice
+    supply = (products["current_stock"] + products["on_order"]).to_numpy()
+    demand = store_rows["demand"].to_numpy()
+    allocated = allocate_stock(
+        codes, demand, supply[codes], mode,
+        _store_priority(store_rows["store_id"], store_priority) if mode == "priority" else None
+    )
+
+    display = products[["product_id", "category", "product_name", "vendor_id", "current_stock", "on_order", "matched"]]
+    per_store = pd.concat([store_rows[["store_id"]], display.iloc[codes].reset_index(drop=True)], axis=1)
+    per_store["demand"] = demand
+    per_store["allocated"] = allocated
+    per_store["shortage"] = demand - allocated
+    per_store["status"] = np.where(per_store["matched"], "Found in inventory", "Not found in inventory")
+    per_store = per_store.drop(columns="matched")
+
+    products["allocated"] = np.bincount(codes, weights=allocated, minlength=len(products)).astype(np.int64)
+    products["shortage"] = products["demand"] - products["allocated"]
+    per_product = products[["product_id", "category", "product_name", "vendor_id", "stores",
+                            "current_stock", "on_order", "demand", "allocated", "shortage"]]
+    return per_store, per_product
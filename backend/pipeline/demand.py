@@ -0,0 +1,220 @@
+# pipeline/demand.py
+from typing import Callable, Dict, Optional, Sequence
+import pandas as pd
+from pipeline.inventory import load_inventory_frame
+from pipeline.allocation import (
+    allocate_store_demand, demand_frame, group_demand, ORDER_COLUMNS, STORE_KEYS
+)
+from pipeline.fuzzy_match import suggest_for_missing
+from pipeline.readers import DEMAND_SCHEMA, UnsupportedFileError, read_table
+from pipeline.snapshot import get_inventory_snapshot
+from pipeline.validation import validate_demand
+from pipeline.warehouses import plan_transfers
+
+
+# Report progress every N keys so callers can show it without slowing the loops
+PROGRESS_EVERY = 5000
+
+PRODUCT_KEYS = ["name_norm", "cat_norm"]
+
+
+def read_demand_file(source, file_name: str, schema: Optional[Dict] = DEMAND_SCHEMA) -> pd.DataFrame:
+    """Read an uploaded demand file (path, buffer or Streamlit UploadedFile).
+
+    Only the demand columns are read, with explicit types; pass schema=None to keep every column.
+    Raises UnsupportedFileError for anything but CSV and Excel.
+    """
+    return read_table(source, file_name, schema)
+
+
+def _no_progress(**counters) -> None:
+    pass
+
+
+def aggregate_demand(df_demand: pd.DataFrame) -> pd.DataFrame:
+    """Vectorized sum of demand per normalized (product_name, Category) in first-seen order"""
+    return group_demand(demand_frame(df_demand), PRODUCT_KEYS)
+
+
+def merge_aggregates(partials: Sequence[pd.DataFrame], keys: Sequence[str] = PRODUCT_KEYS) -> pd.DataFrame:
+    """Combine partial aggregates, in input order, into the result of one pass over all rows"""
+    return group_demand(pd.concat(partials, ignore_index=True), list(keys))
+
+
+def process_demand(df_demand: pd.DataFrame, db, store_mode: Optional[str] = None,
+                   store_priority: Optional[Sequence[str]] = None,
+                   progress: Callable[..., None] = _no_progress) -> Dict:
+    """Compare demand rows against inventory and build orders, missing products and summaries.
+
+    `progress` receives keyword counters (rows_parsed, keys_aggregated, total_keys,
+    matches_done) as the stages advance. Rows failing validation are left out and
+    reported under rows_rejected, rejected_by_reason and rejected_rows.
+    """
+    clean, report = validate_demand(df_demand)
+    frame = demand_frame(clean)
+    store_rows = group_demand(frame, STORE_KEYS) if store_mode else None
+    result = evaluate_demand(
+        group_demand(frame, PRODUCT_KEYS), db, len(df_demand),
+        store_mode, store_priority, store_rows, progress
+    )
+    result.update(report.to_dict())
+    return result
+
+
+def evaluate_demand(aggregated: pd.DataFrame, db, total_processed: int, store_mode: Optional[str] = None,
+                    store_priority: Optional[Sequence[str]] = None, store_rows: Optional[pd.DataFrame] = None,
+                    progress: Callable[..., None] = _no_progress) -> Dict:
+    """Evaluate demand already aggregated per product (and per store for store_mode)"""
+    # Inventory (YOUR STOCK DATA.XLSX) with on-hand/on-order from the ledger, as a shared snapshot
+    snapshot = get_inventory_snapshot(db)
+    
+    def _norm(text: str) -> str:
+        return str(text or '').strip().lower()
+    
+    # Aggregated demand across all stores by product (product_name + category)
+    agg_rows = {
+        (name_norm, cat_norm): {
+            'product_name': product_name,
+            'category': category,
+            'product_id': product_id,  # first non-empty id as representative
+            'total_demand': int(total_demand)
+        }
+        for name_norm, cat_norm, product_name, category, product_id, total_demand in zip(
+            aggregated['name_norm'], aggregated['cat_norm'], aggregated['product_name'],
+            aggregated['category'], aggregated['product_id'].fillna(''), aggregated['demand']
+        )
+    }
+    
+    progress(rows_parsed=total_processed, keys_aggregated=len(agg_rows), total_keys=len(agg_rows))
+    
+    # Resolve every aggregated key against the snapshot in one vectorized pass
+    matched_rows = snapshot.match_rows(
+        [key[0] for key in agg_rows], [key[1] for key in agg_rows], [info['product_id'] for info in agg_rows.values()]
+    ).tolist()
+    
+    # Evaluate aggregated demand against inventory
+    orders_to_send = []
+    missing_products = []
+    found_products = []  # kept for completeness, not displayed
+    
+    for matches_done, (key, info) in enumerate(agg_rows.items(), start=1):
+        if matches_done % PROGRESS_EVERY == 0:
+            progress(matches_done=matches_done)
+        prod_name_norm, cat_norm = key
+        product_name = info['product_name']
+        category = info['category']
+        product_id = info['product_id']
+        total_demand = int(info['total_demand'])
+        
+        row = matched_rows[matches_done - 1]
+        inventory_item = snapshot.item(row) if row >= 0 else None
+        
+        if inventory_item:
+            current_stock, on_order = inventory_item.stock, inventory_item.on_order
+            # Stock already on order covers part of the demand; only reorder the rest
+            shortage = max(0, total_demand - current_stock - on_order)
+            
+            found_products.append({
+                'product_id': product_id or inventory_item.product_id,
+                'category': category or inventory_item.category_name,
+                'product_name': product_name or inventory_item.product_name,
+                'demand': total_demand,
+                'current_stock': current_stock,
+                'on_order': on_order,
+                'shortage': shortage,
+                'status': 'Found in inventory',
+                'vendor_id': inventory_item.vendor_id
+            })
+            
+            if shortage > 0:
+                orders_to_send.append({
+                    'store_id': '',  # aggregated across stores
+                    'product_id': product_id or inventory_item.product_id,
+                    'category': category or inventory_item.category_name,
+                    'product_name': product_name or inventory_item.product_name,
+                    'current_stock': current_stock,
+                    'on_order': on_order,
+                    'demand': total_demand,
+                    'shortage': shortage,
+                    'vendor_id': inventory_item.vendor_id
+                })
+        else:
+            missing_products.append({
+                'product_id': product_id,
+                'category': category,
+                'product_name': product_name,
+                'demand': total_demand,
+                'current_stock': 0,
+                'on_order': 0,
+                'shortage': total_demand,
+                'status': 'Not found in inventory',
+                'vendor_id': 'N/A'
+            })
+            # Consider not-found items as needed, but vendor unknown
+            orders_to_send.append({
+                'store_id': '',
+                'product_id': product_id,
+                'category': category,
+                'product_name': product_name,
+                'current_stock': 0,
+                'on_order': 0,
+                'demand': total_demand,
+                'shortage': total_demand,
+                'vendor_id': ''
+            })
+    
+    # Category-level aggregation (optional): total demand vs stock per category
+    demand_by_cat = {}
+    stock_by_cat = {}
+    cat_display_name = {}
+    for key, info in agg_rows.items():
+        cat_raw = info['category']
+        k = _norm(cat_raw)
+        demand_by_cat[k] = demand_by_cat.get(k, 0) + int(info['total_demand'])
+        if k not in cat_display_name and cat_raw:
+            cat_display_name[k] = cat_raw
+    for k, (display_name, total_stock) in snapshot.stock_by_category().items():
+        stock_by_cat[k] = total_stock
+        if k not in cat_display_name and display_name:
+            cat_display_name[k] = display_name
+    category_summary = []
+    for k in sorted(set(list(demand_by_cat.keys()) + list(stock_by_cat.keys()))):
+        td = int(demand_by_cat.get(k, 0))
+        ts = int(stock_by_cat.get(k, 0))
+        category_summary.append({
+            'Category': cat_display_name.get(k, k),
+            'Total Demand': td,
+            'Total Stock': ts,
+            'Shortage': max(0, td - ts)
+        })
+    
+    # Store-aware mode: allocate stock across stores and order per store
+    store_allocation = []
+    store_summary = []
+    if store_mode:
+        per_store, per_product = allocate_store_demand(
+            store_rows, load_inventory_frame(db), store_mode, store_priority
+        )
+        store_allocation = per_store.to_dict('records')
+        store_summary = per_product.to_dict('records')
+        orders_to_send = per_store.loc[per_store['shortage'] > 0, ORDER_COLUMNS].to_dict('records')
+    
+    # What local stock cannot cover is asked of nearby warehouses before anything is ordered from vendors
+    orders_to_send, transfers = plan_transfers(db, orders_to_send)
+    
+    progress(matches_done=len(agg_rows))
+    
+    # Close inventory matches for products that were not found (typos, variants)
+    missing_suggestions = suggest_for_missing(db, missing_products)
+    
+    return {
+        'orders_to_send': orders_to_send,
+        'transfers': transfers,
+        'missing_products': missing_products,
+        'missing_suggestions': missing_suggestions,
+        'found_products': found_products,
+        'category_summary': category_summary,
+        'store_allocation': store_allocation,
+        'store_summary': store_summary,
+        'total_processed': total_processed
+    }
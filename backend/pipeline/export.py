@@ -0,0 +1,117 @@
+# pipeline/export.py
+import csv
+import io
+import json
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import select
+from database.models import InventoryData, VendorList
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_COLUMNS = ["product_id", "category_name", "product_name", "vendor_id",
+                  "vendor_name", "vendor_email", "stock"]
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def inventory_page(db, after_id: Optional[int] = None, limit: int = 100) -> Tuple[List[dict], Optional[int]]:
+    """One keyset page of inventory ordered by id; returns (rows, next cursor or None)"""
+    stmt = select(
+        InventoryData.id, InventoryData.product_id, InventoryData.category_name,
+        InventoryData.product_name, InventoryData.vendor_id, InventoryData.stock
+    ).order_by(InventoryData.id).limit(limit + 1)
+    if after_id is not None:
+        stmt = stmt.where(InventoryData.id > after_id)
+    rows = [dict(row._mapping) for row in db.execute(stmt)]
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def iter_inventory_chunks(db, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[tuple]]:
+    """Yield inventory rows joined with vendors in chunks straight from the DB cursor"""
+    stmt = select(
+        InventoryData.product_id, InventoryData.category_name, InventoryData.product_name,
+        InventoryData.vendor_id, VendorList.vendor_name, VendorList.email, InventoryData.stock
+    ).outerjoin(VendorList, VendorList.vendor_id == InventoryData.vendor_id).order_by(InventoryData.id)
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    try:
+        for partition in result.partitions(chunk_size):
+            yield [tuple(row) for row in partition]
+    finally:
+        result.close()
+
+
+def _csv_chunks(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for rows in chunks:
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows).encode()
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only sink whose buffered bytes are handed out (and dropped) after each row group"""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _parquet_chunks(chunks: Iterator[List[tuple]]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.string()) for name in EXPORT_COLUMNS[:-1]] + [("stock", pa.int64())])
+    sink = _DrainableSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows)) if rows else [[] for _ in EXPORT_COLUMNS]
+            writer.write_table(pa.Table.from_arrays([pa.array(col, type=field.type)
+                                                     for col, field in zip(columns, schema)], schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_inventory_export(db, file_format: str = "csv", chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Encode the inventory export chunk by chunk so memory stays flat regardless of table size"""
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{file_format}'")
+    chunks = iter_inventory_chunks(db, chunk_size)
+    if file_format == "csv":
+        return _csv_chunks(chunks)
+    if file_format == "ndjson":
+        return _ndjson_chunks(chunks)
+    return _parquet_chunks(chunks)
@@ -0,0 +1,300 @@
+# pipeline/forecast.py
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from statistics import NormalDist
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from pipeline.allocation import ORDER_COLUMNS
+from pipeline.history import load_history_rows
+from pipeline.inventory import load_inventory_frame, normalize_series, strip_series
+from config.settings import settings
+
+
+FORECAST_METHODS = ("ses", "moving_average")
+FREQUENCIES = ("D", "W", "M")
+
+# Defaults; lead time and horizon are counted in periods of the chosen frequency
+DEFAULT_ALPHA = 0.3
+DEFAULT_WINDOW = 28
+DEFAULT_LEAD_TIME = 7
+DEFAULT_HORIZON = 14
+DEFAULT_SERVICE_LEVEL = 0.95
+
+# Series processed per block, bounding temporaries for very large matrices
+BLOCK_ROWS = 65536
+
+REORDER_COLUMNS = ORDER_COLUMNS + ["forecast_per_period", "safety_stock", "reorder_point"]
+
+KEY_COLUMNS = ["store_id", "product_key", "product_id", "product_name", "category_name"]
+
+POINT_FIELDS = ("forecast", "sigma", "safety_stock", "reorder_point", "horizon_demand")
+
+
+class DemandMatrix:
+    """Demand history as a dense (store, product) series x period array"""
+
+    def __init__(self, keys: pd.DataFrame, periods: pd.PeriodIndex, values: np.ndarray):
+        self.keys = keys          # one row per series: store_id, product_key, product_id, product_name, category_name
+        self.periods = periods    # one entry per column
+        self.values = values      # float32, shape (len(keys), len(periods))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def build_demand_matrix(history: pd.DataFrame, freq: str = "D", max_periods: Optional[int] = None,
+                        path: Optional[str] = None) -> DemandMatrix:
+    """Scatter history rows (store_id, product_key, day, demand, ...) into a dense matrix.
+
+    Periods without rows are zero demand. With max_periods only the latest periods are kept.
+    With `path` the matrix is written to a .npy file and returned memory-mapped, so worker
+    processes can share it without pickling.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unknown frequency '{freq}'")
+    if history.empty:
+        keys = pd.DataFrame(columns=KEY_COLUMNS)
+        return DemandMatrix(keys, pd.PeriodIndex([], freq=freq), np.zeros((0, 0), dtype=np.float32))
+
+    periods = pd.PeriodIndex(pd.to_datetime(history["day"], errors="coerce"), freq=freq)
+    valid = ~periods.isna()
+    history, periods = history[valid], periods[valid]
+    ordinals = periods.asi8
+    first = ordinals.min()
+    if max_periods:
+        first = max(first, ordinals.max() - max_periods + 1)
+        recent = ordinals >= first
+        history, ordinals = history[recent], ordinals[recent]
+    columns = ordinals - first
+    n_periods = int(columns.max()) + 1
+
+    codes, _ = pd.MultiIndex.from_arrays([history["store_id"], history["product_key"]]).factorize()
+    _, first_rows = np.unique(codes, return_index=True)
+    keys = history.iloc[first_rows][KEY_COLUMNS]
+    # Sum duplicate (series, period) cells first so temporaries scale with rows, not cells
+    cells, inverse = np.unique(codes.astype(np.int64) * n_periods + columns, return_inverse=True)
+    sums = np.bincount(inverse, weights=history["demand"].to_numpy(dtype=np.float64))
+    shape = (len(keys), n_periods)
+    if path:
+        values = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=shape)
+    else:
+        values = np.zeros(shape, dtype=np.float32)
+    values.reshape(-1)[cells] = sums
+    period_index = pd.period_range(pd.Period(ordinal=first, freq=freq), periods=n_periods, freq=freq)
+    return DemandMatrix(keys.reset_index(drop=True), period_index, values)
+
+
+def load_history_frame(db, since: Optional[str] = None) -> pd.DataFrame:
+    """Recorded demand history (from `since`, YYYY-MM-DD, on) with cleaned keys"""
+    history = load_history_rows(db, since)
+    for column in ("store_id", "product_id", "product_key"):
+        history[column] = strip_series(history[column])
+    history["demand"] = pd.to_numeric(history["demand"], errors="coerce").fillna(0)
+    return history
+
+
+def history_start(freq: str, max_periods: Optional[int]) -> Optional[str]:
+    """First day worth reading for the latest `max_periods` periods, so older partitions are skipped"""
+    if not max_periods:
+        return None
+    current = pd.Period(pd.Timestamp.today(), freq=freq)
+    return (current - (max_periods - 1)).start_time.strftime("%Y-%m-%d")
+
+
+def load_demand_matrix(db, freq: str = "D", max_periods: Optional[int] = None,
+                       path: Optional[str] = None) -> DemandMatrix:
+    history = load_history_frame(db, history_start(freq, max_periods))
+    return build_demand_matrix(history, freq, max_periods, path)
+
+
+def ses_weights(n_periods: int, alpha: float) -> np.ndarray:
+    """Weights w such that values @ w is the simple exponential smoothing level after the last period.
+
+    With level_0 = x_0 and level_t = alpha * x_t + (1 - alpha) * level_{t-1}, the final
+    level is a fixed linear combination of the history, so all series share one dot product.
+    """
+    if not 0 < alpha <= 1:
+        raise ValueError("alpha must be in (0, 1]")
+    age = np.arange(n_periods - 1, -1, -1, dtype=np.float64)
+    weights = alpha * (1 - alpha) ** age
+    if n_periods:
+        weights[0] = (1 - alpha) ** (n_periods - 1)
+    return weights
+
+
+def forecast_block(values: np.ndarray, method: str = "ses", alpha: float = DEFAULT_ALPHA,
+                   window: int = DEFAULT_WINDOW) -> np.ndarray:
+    """Next-period forecast for each row of a series x period block"""
+    if method not in FORECAST_METHODS:
+        raise ValueError(f"Unknown forecast method '{method}'")
+    if values.shape[1] == 0:
+        return np.zeros(len(values))
+    if method == "moving_average":
+        return values[:, -window:].mean(axis=1, dtype=np.float64)
+    return values @ ses_weights(values.shape[1], alpha).astype(values.dtype)
+
+
+def compute_reorder_points(values: np.ndarray, method: str = "ses", alpha: float = DEFAULT_ALPHA,
+                           window: int = DEFAULT_WINDOW, lead_time: float = DEFAULT_LEAD_TIME,
+                           service_level: float = DEFAULT_SERVICE_LEVEL,
+                           horizon: float = DEFAULT_HORIZON) -> Dict[str, np.ndarray]:
+    """Forecast, demand variability, safety stock and reorder point for every series at once.
+
+    safety_stock = z(service_level) * sigma * sqrt(lead_time), where sigma is the per-period
+    standard deviation over the last `window` periods, and
+    reorder_point = forecast * lead_time + safety_stock.
+    """
+    n = len(values)
+    forecast = np.empty(n)
+    sigma = np.empty(n)
+    for start in range(0, n, BLOCK_ROWS):
+        block = values[start:start + BLOCK_ROWS]
+        forecast[start:start + len(block)] = forecast_block(block, method, alpha, window)
+        recent = block[:, -window:]
+        sigma[start:start + len(block)] = recent.std(axis=1, ddof=1 if recent.shape[1] > 1 else 0, dtype=np.float64) \
+            if recent.shape[1] else 0.0
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * sigma * np.sqrt(lead_time)
+    return {
+        "forecast": forecast,
+        "sigma": sigma,
+        "safety_stock": safety_stock,
+        "reorder_point": forecast * lead_time + safety_stock,
+        "horizon_demand": forecast * horizon,
+    }
+
+
+def shard_rows(keys: pd.Series, shards: int) -> List[np.ndarray]:
+    """Row indices per shard, assigned by a stable hash of the key.
+
+    All store series of one product land in the same shard.
+    """
+    buckets = pd.util.hash_array(keys.astype(str).to_numpy(dtype=object)) % np.uint64(shards)
+    order = np.argsort(buckets, kind="stable")
+    bounds = np.searchsorted(buckets[order], np.arange(shards + 1, dtype=np.uint64))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(shards)]
+
+
+def _forecast_shard(values_path: str, points_path: str, rows: np.ndarray, params: Dict) -> int:
+    """Worker: compute reorder points for some rows of the memory-mapped matrix, in place"""
+    values = np.load(values_path, mmap_mode="r")
+    points = np.load(points_path, mmap_mode="r+")
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block_rows = rows[start:start + BLOCK_ROWS]
+        block = compute_reorder_points(np.asarray(values[block_rows]), **params)
+        for i, field in enumerate(POINT_FIELDS):
+            points[i, block_rows] = block[field]
+    points.flush()
+    return len(rows)
+
+
+def compute_reorder_points_parallel(values: np.ndarray, keys: pd.Series, max_workers: Optional[int] = None,
+                                    **params) -> Dict[str, np.ndarray]:
+    """compute_reorder_points over a process pool, sharding series by a hash of `keys`.
+
+    The matrix and the outputs are shared through memory-mapped .npy files. A matrix
+    built with build_demand_matrix(path=...) is used in place. Every row is computed
+    independently, so the result matches compute_reorder_points for any number of workers.
+    """
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(values) or 1))
+    if workers == 1:
+        return compute_reorder_points(values, **params)
+
+    # /dev/shm keeps the shared files in memory where available
+    tmp_root = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    with tempfile.TemporaryDirectory(dir=tmp_root, prefix="forecast_") as tmp:
+        values_path = getattr(values, "filename", None)
+        if not (isinstance(values, np.memmap) and str(values_path).endswith(".npy")):
+            values_path = str(Path(tmp) / "values.npy")
+            shared = np.lib.format.open_memmap(values_path, mode="w+", dtype=np.float32, shape=values.shape)
+            shared[:] = values
+            shared.flush()
+            del shared
+        else:
+            values.flush()
+        points_path = str(Path(tmp) / "points.npy")
+        np.lib.format.open_memmap(points_path, mode="w+", dtype=np.float64,
+                                  shape=(len(POINT_FIELDS), len(values))).flush()
+
+        shards = [rows for rows in shard_rows(keys, workers) if len(rows)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(_forecast_shard, [str(values_path)] * len(shards), [points_path] * len(shards),
+                          shards, [params] * len(shards)))
+        points = np.load(points_path)
+    return {field: points[i] for i, field in enumerate(POINT_FIELDS)}
+
+
+def _match_products(products: pd.DataFrame, inventory: pd.DataFrame) -> pd.DataFrame:
+    """Inventory row for each product key: by product_id, then by normalized product name"""
+    columns = ["product_id", "category_name", "product_name", "vendor_id", "stock", "on_order"]
+    by_id = inventory[inventory["product_id"] != ""].drop_duplicates("product_id", keep="last")
+    by_name = inventory.drop_duplicates("name_norm", keep="last")
+    matched = by_id.set_index("product_id", drop=False)[columns].reindex(
+        products["product_key"].to_numpy()).reset_index(drop=True)
+    fallback = by_name.set_index("name_norm")[columns].reindex(
+        normalize_series(products["product_name"]).to_numpy()).reset_index(drop=True)
+    missing = matched["product_id"].isna()
+    matched.loc[missing] = fallback.loc[missing]
+    matched["product_id"] = matched["product_id"].fillna(products["product_id"])
+    return matched
+
+
+def reorder_suggestions(db, method: str = "ses", freq: str = "D", alpha: float = DEFAULT_ALPHA,
+                        window: int = DEFAULT_WINDOW, lead_time: float = DEFAULT_LEAD_TIME,
+                        service_level: float = DEFAULT_SERVICE_LEVEL, horizon: float = DEFAULT_HORIZON,
+                        points: Optional[Dict[str, np.ndarray]] = None,
+                        matrix: Optional[DemandMatrix] = None, max_workers: Optional[int] = None) -> List[Dict]:
+    """Per-product purchase suggestions from forecast demand, shaped like orders_to_send.
+
+    Store series are summed per product; their variances add, so sigma is combined as
+    sqrt(sum of sigma^2). A product is reordered when on_hand + on_order is at or below its
+    reorder point, for enough units to cover the horizon plus safety stock.
+    Series are split across `max_workers` processes (default settings.FORECAST_WORKERS).
+    """
+    matrix = matrix if matrix is not None else load_demand_matrix(db, freq)
+    if not len(matrix):
+        return []
+    if points is None:
+        points = compute_reorder_points_parallel(
+            matrix.values, matrix.keys["product_key"], max_workers or settings.FORECAST_WORKERS,
+            method=method, alpha=alpha, window=window, lead_time=lead_time,
+            service_level=service_level, horizon=horizon
+        )
+
+    codes, product_keys = pd.factorize(matrix.keys["product_key"])
+    _, first_rows = np.unique(codes, return_index=True)
+    products = matrix.keys.iloc[first_rows].reset_index(drop=True)
+    n = len(product_keys)
+    forecast = np.bincount(codes, weights=points["forecast"], minlength=n)
+    sigma = np.sqrt(np.bincount(codes, weights=points["sigma"] ** 2, minlength=n))
+    safety_stock = NormalDist().inv_cdf(service_level) * sigma * np.sqrt(lead_time)
+    reorder_point = forecast * lead_time + safety_stock
+
+    matched = _match_products(products, load_inventory_frame(db))
+    current_stock = matched["stock"].fillna(0).to_numpy(dtype=np.int64)
+    on_order = matched["on_order"].fillna(0).to_numpy(dtype=np.int64)
+    position = current_stock + on_order
+    quantity = np.where(
+        position <= reorder_point,
+        np.maximum(0, np.ceil(forecast * horizon + safety_stock - position)), 0
+    ).astype(np.int64)
+
+    table = pd.DataFrame({
+        "store_id": "",
+        "product_id": matched["product_id"].fillna("").to_numpy(),
+        "category": matched["category_name"].fillna(products["category_name"]).to_numpy(),
+        "product_name": matched["product_name"].fillna(products["product_name"]).to_numpy(),
+        "current_stock": current_stock,
+        "on_order": on_order,
+        "demand": np.ceil(forecast * horizon).astype(np.int64),
+        "shortage": quantity,
+        "vendor_id": matched["vendor_id"].fillna("").to_numpy(),
+        "forecast_per_period": forecast.round(3),
+        "safety_stock": safety_stock.round(3),
+        "reorder_point": reorder_point.round(3),
+    })
+    return table.loc[table["shortage"] > 0, REORDER_COLUMNS].to_dict("records")
@@ -0,0 +1,182 @@
+# pipeline/fuzzy_match.py
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from database.models import get_generations
+from pipeline.inventory import load_inventory_frame
+
+
+# Trigrams in more names than this are stop-grams: they never generate candidates (they still
+# count towards the score), so a query's work does not grow with the catalogue
+MAX_POSTINGS = 1000
+
+# Candidates scored exactly per query, best by shared rare trigrams first
+MAX_CANDIDATES = 64
+
+# Queries scored together; bounds the size of the intermediate pair arrays
+QUERY_CHUNK = 256
+
+
+def _trigram_pairs(names: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """(owner, trigram key) for every distinct padded trigram of every name (pg_trgm style).
+
+    Names are lowercased, trimmed and whitespace-collapsed, then padded with two spaces in
+    front and one behind. A trigram key packs its three code points into one int64.
+    """
+    text = pd.Series(list(names), dtype=object).fillna("").astype(str)
+    text = "  " + text.str.strip().str.lower().str.replace(r"\s+", " ", regex=True) + " "
+    lengths = text.str.len().to_numpy(dtype=np.int64)
+    codes = np.frombuffer("".join(text.tolist()).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    counts = lengths - 2
+    owner = np.repeat(np.arange(len(lengths)), counts)
+    starts = np.cumsum(lengths) - lengths
+    positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+    keys = (codes[positions] << 42) | (codes[positions + 1] << 21) | codes[positions + 2]
+    order = np.lexsort((keys, owner))
+    owner, keys = owner[order], keys[order]
+    distinct = np.ones(len(keys), dtype=bool)
+    distinct[1:] = (owner[1:] != owner[:-1]) | (keys[1:] != keys[:-1])
+    return owner[distinct], keys[distinct]
+
+
+def _csr_rows(offsets: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of the entries of `rows` in a CSR layout, and the index into `rows` of each"""
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    which = np.repeat(np.arange(len(rows)), lengths)
+    return np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum()), which
+
+
+class TrigramIndex:
+    """Inverted trigram index over inventory product names, built once per inventory load.
+
+    Postings (trigram -> names) and the forward lists (name -> trigrams) are stored CSR-style
+    in NumPy arrays. A batch of queries is scored in chunks: candidates come only from each
+    query's rarer trigrams (prefix filtering, minus stop-grams) and pass a size filter, then the
+    best MAX_CANDIDATES per query get their exact Dice score from the forward lists.
+    """
+
+    def __init__(self, inventory: pd.DataFrame):
+        self.items = inventory[["product_id", "product_name", "category_name", "vendor_id"]].reset_index(drop=True)
+        items, keys = _trigram_pairs(self.items["product_name"].tolist())
+        self.vocabulary, grams = np.unique(keys, return_inverse=True)
+        n_grams = len(self.vocabulary)
+
+        # Forward lists: pairs are already sorted by item, and by gram within an item
+        self.grams = grams.astype(np.int32)
+        self.item_offsets = np.zeros(len(self.items) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(items, minlength=len(self.items)), out=self.item_offsets[1:])
+        self.sizes = np.diff(self.item_offsets)
+
+        order = np.argsort(grams, kind="stable")
+        self.postings = items[order].astype(np.int32)
+        self.offsets = np.zeros(n_grams + 1, dtype=np.int64)
+        np.cumsum(np.bincount(grams, minlength=n_grams), out=self.offsets[1:])
+        self.frequency = np.diff(self.offsets)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def suggest(self, names: Sequence[str], top_k: int = 5, min_score: float = 0.3) -> List[List[Dict]]:
+        """Return the top_k inventory candidates (Dice score on trigrams) for each name"""
+        results: List[List[Dict]] = [[] for _ in names]
+        if not len(self.items) or not len(names) or top_k <= 0:
+            return results
+        columns = [self.items[col].to_numpy() for col in self.items.columns]
+        for first in range(0, len(names), QUERY_CHUNK):
+            chunk = names[first:first + QUERY_CHUNK]
+            for query, item, score in zip(*self._score(chunk, top_k, max(min_score, 1e-9))):
+                match = dict(zip(self.items.columns, (values[item] for values in columns)))
+                match["score"] = round(score, 3)
+                results[first + query].append(match)
+        return results
+
+    def _score(self, names: Sequence[str], top_k: int, min_score: float) -> Tuple[List, List, List]:
+        """(query, item, score) of the top_k matches per query of one chunk, best first"""
+        queries, keys = _trigram_pairs(names)
+        query_sizes = np.bincount(queries, minlength=len(names))
+        slot = np.minimum(np.searchsorted(self.vocabulary, keys), len(self.vocabulary) - 1)
+        known = self.vocabulary[slot] == keys
+        frequency = np.where(known, self.frequency[slot], 0)
+
+        # Prefix filter: a match needs at least `overlap` shared trigrams, so it shares one of
+        # the query's size - overlap + 1 rarest trigrams (unknown trigrams count as rarest)
+        overlap = np.ceil(min_score * query_sizes / (2 - min_score)).astype(np.int64)
+        order = np.lexsort((slot, frequency, queries))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - np.searchsorted(queries[order], queries[order], side="left")
+        probe = known & (rank < query_sizes[queries] - overlap[queries] + 1)
+        # Stop-grams are skipped, except a query's rarest known trigram when all its probes are common
+        rare = probe & (self.frequency[slot] <= MAX_POSTINGS)
+        rarest = np.full(len(names), len(rank))
+        np.minimum.at(rarest, queries[known], rank[known])
+        fallback = ~np.bincount(queries[rare], minlength=len(names)).astype(bool)
+        probe = rare | (probe & (rank == rarest[queries]) & fallback[queries])
+        if not probe.any():
+            return [], [], []
+
+        # Candidates from the probe postings, limited to names whose size allows min_score
+        positions, which = _csr_rows(self.offsets, slot[probe])
+        cand_query = queries[probe][which]
+        cand_item = self.postings[positions].astype(np.int64)
+        a, b = query_sizes[cand_query], self.sizes[cand_item]
+        sized = (b * (2 - min_score) >= a * min_score) & (b * min_score <= a * (2 - min_score))
+        pair_keys, hits = np.unique(cand_query[sized] * len(self.items) + cand_item[sized], return_counts=True)
+        cand_query, cand_item = pair_keys // len(self.items), pair_keys % len(self.items)
+        order = np.lexsort((cand_item, -hits, cand_query))
+        rank = np.arange(len(order)) - np.searchsorted(cand_query[order], cand_query[order], side="left")
+        keep = np.sort(order[rank < MAX_CANDIDATES])
+        cand_query, cand_item = cand_query[keep], cand_item[keep]
+
+        # Exact shared counts: look every trigram of each candidate up in its query's trigrams
+        n_grams = len(self.vocabulary)
+        query_grams = np.sort(queries[known] * n_grams + slot[known])
+        positions, which = _csr_rows(self.item_offsets, cand_item)
+        lookup = cand_query[which] * n_grams + self.grams[positions]
+        found = np.minimum(np.searchsorted(query_grams, lookup), len(query_grams) - 1)
+        shared = np.bincount(which, weights=query_grams[found] == lookup, minlength=len(cand_item))
+        scores = 2.0 * shared / (query_sizes[cand_query] + self.sizes[cand_item])
+
+        # Top-k per query: one lexsort by (query, -score), then keep the first k of each run
+        keep = scores >= min_score
+        cand_query, cand_item, scores = cand_query[keep], cand_item[keep], scores[keep]
+        order = np.lexsort((cand_item, -scores, cand_query))
+        cand_query, cand_item, scores = cand_query[order], cand_item[order], scores[order]
+        best = np.arange(len(cand_query)) - np.searchsorted(cand_query, cand_query, side="left") < top_k
+        return cand_query[best].tolist(), cand_item[best].tolist(), scores[best].tolist()
+
+
+_index_cache: Dict[str, object] = {"generation": None, "index": None}
+
+
+def get_trigram_index(db) -> TrigramIndex:
+    """Return the cached index, rebuilding it only when the inventory generation changes"""
+    generation = get_generations(db, ("inventory",))
+    if _index_cache["generation"] != generation:
+        _index_cache["index"] = TrigramIndex(load_inventory_frame(db))
+        _index_cache["generation"] = generation
+    return _index_cache["index"]
+
+
+def suggest_for_missing(db, missing_products: List[Dict], top_k: int = 3,
+                        min_score: float = 0.3, index: Optional[TrigramIndex] = None) -> List[Dict]:
+    """Flatten suggestions for missing products into rows for display"""
+    if not missing_products:
+        return []
+    if index is None:
+        index = get_trigram_index(db)
+    names = [str(m.get("product_name", "") or "") for m in missing_products]
+    rows = []
+    for missing, matches in zip(missing_products, index.suggest(names, top_k, min_score)):
+        for rank, match in enumerate(matches, start=1):
+            rows.append({
+                "missing_product": missing.get("product_name", ""),
+                "missing_category": missing.get("category", ""),
+                "rank": rank,
+                "suggested_product_id": match["product_id"],
+                "suggested_product_name": match["product_name"],
+                "suggested_category": match["category_name"],
+                "vendor_id": match["vendor_id"],
+                "score": match["score"],
+            })
+    return rows
@@ -0,0 +1,343 @@
+# pipeline/governor.py
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+from config.settings import settings
+
+
+# Outcome of one outbound call: "throttled" feeds AIMD back-off, "failed" feeds the circuit breaker
+OK, THROTTLED, FAILED = "ok", "throttled", "failed"
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Seconds of history behind the throughput figure in metrics()
+THROUGHPUT_WINDOW = 60.0
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+def _status_code(e: BaseException) -> Optional[int]:
+    for attr in ("status_code", "code"):
+        code = getattr(e, attr, None)
+        code = getattr(code, "value", code)  # HTTPStatus / grpc-style enums
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def classify_error(e: BaseException) -> str:
+    """Map an exception from SMTP or an HTTP API to an outcome.
+
+    SMTP 4xx replies (421 "try later", 450/451/452 ...) and HTTP 429 are throttling; other
+    4xx/5xx SMTP replies and HTTP 4xx are answers about the request, not the provider, so
+    they count as OK for the provider's health. Timeouts, connection errors and HTTP 5xx fail.
+    """
+    seen = set()
+    while e is not None and id(e) not in seen:
+        seen.add(id(e))
+        smtp_code = getattr(e, "smtp_code", None)
+        if isinstance(smtp_code, int) and smtp_code > 0:
+            return THROTTLED if 400 <= smtp_code < 500 else OK
+        recipients = getattr(e, "recipients", None)
+        if isinstance(recipients, dict) and recipients:
+            # SMTPRecipientsRefused carries one (code, message) reply per recipient
+            codes = [reply[0] for reply in recipients.values()]
+            return THROTTLED if any(400 <= code < 500 for code in codes) else OK
+        code = _status_code(e)
+        if code is not None:
+            if code in (408, 429):
+                return THROTTLED
+            if 400 <= code < 500:
+                return OK
+            if code >= 500:
+                return FAILED
+        text = str(e).lower()
+        if "resource exhausted" in text or "rate limit" in text or "quota" in text:
+            return THROTTLED
+        e = e.__cause__ or e.__context__
+    return FAILED
+
+
+class TokenBucket:
+    """Calls per second with bursts of up to `burst`; rate <= 0 means unlimited.
+
+    reserve() takes a token and returns how long the caller must wait for it, so sync
+    and async callers share one bucket and only sleep in their own way.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._stamp = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def try_take(self) -> bool:
+        """Take a token only if one is available now"""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def adapt(self, outcome: str) -> None:
+        """AIMD on the rate: halve on throttling (down to 1/16 of the limit), recover linearly"""
+        if self.max_rate <= 0:
+            return
+        with self._lock:
+            if outcome == THROTTLED:
+                self.rate = max(self.max_rate / 16, self.rate / 2)
+            elif outcome == OK:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class AIMDLimit:
+    """Concurrency limit that grows by one per limit's worth of successes and halves on throttling"""
+
+    def __init__(self, maximum: int, minimum: int = 1, decrease: float = 0.5):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.decrease = decrease
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, outcome: str) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == THROTTLED:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            elif outcome == OK:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and fails fast for `reset_after` seconds.
+
+    Then one trial call is let through (half-open); it closes the circuit on success and
+    re-opens it on failure.
+    """
+
+    def __init__(self, name: str, threshold: int = 5, reset_after: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self.failures = 0
+        self._clock = clock
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            retry_in = self._opened_at + self.reset_after - self._clock()
+            if self.state == OPEN and retry_in <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+            raise CircuitOpenError(self.name, max(retry_in, 0.0))
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self._trial = False
+            if outcome == FAILED:
+                self.failures += 1
+                if self.state == HALF_OPEN or self.failures >= self.threshold:
+                    self.state = OPEN
+                    self._opened_at = self._clock()
+            else:
+                # A throttled reply still proves the provider is up
+                self.failures = 0
+                self.state = CLOSED
+
+
+class Governor:
+    """Rate, concurrency and failure control for calls to one outbound provider.
+
+    Every call waits for a concurrency slot and a token, then its outcome adapts the
+    limits: throttling halves the concurrency limit and the rate (AIMD) and is retried up
+    to `retries` times with back-off; failures count towards the circuit breaker, which
+    makes calls fail fast with CircuitOpenError while the provider is down.
+    """
+
+    def __init__(self, name: str, rate: float = 0.0, burst: int = 1, max_concurrency: int = 8,
+                 failure_threshold: int = 5, reset_after: float = 30.0, retries: int = 2,
+                 backoff: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.limit = AIMDLimit(max_concurrency)
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_after, clock)
+        self.retries = retries
+        self.backoff = backoff
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, OK: 0, THROTTLED: 0, FAILED: 0, "rejected": 0, "retries": 0}
+        self._done = deque()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+            if key == OK:
+                self._done.append(self._clock())
+
+    def _admit(self) -> None:
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count("rejected")
+            raise
+        self._count("calls")
+
+    def _finish(self, outcome: str) -> None:
+        self.limit.release(outcome)
+        self.bucket.adapt(outcome)
+        self.breaker.record(outcome)
+        self._count(outcome)
+
+    def _retry_delay(self, outcome: str, attempt: int) -> Optional[float]:
+        """Back-off before the next attempt, or None to give up"""
+        if outcome != THROTTLED or attempt >= self.retries:
+            return None
+        self._count("retries")
+        return self.backoff * 2 ** attempt
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) under the governor; re-raises its exception once retries run out"""
+        attempt = 0
+        while True:
+            self._admit()
+            self.limit.acquire()
+            outcome = OK
+            try:
+                time.sleep(self.bucket.reserve())
+                return fn(*args, **kwargs)
+            except Exception as e:
+                outcome = classify_error(e)
+                delay = self._retry_delay(outcome, attempt)
+                if delay is None:
+                    raise
+            finally:
+                self._finish(outcome)
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, fn: Callable, *args, **kwargs):
+        """call() for coroutine functions; waits without blocking the event loop"""
+        attempt = 0
+        while True:
+            self._admit()
+            while not self.limit.try_acquire():
+                await asyncio.sleep(0.01)
+            outcome = OK
+            try:
+                await asyncio.sleep(self.bucket.reserve())
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                outcome = classify_error(e)
+                delay = self._retry_delay(outcome, attempt)
+                if delay is None:
+                    raise
+            finally:
+                self._finish(outcome)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def metrics(self) -> Dict:
+        """Counters since start, current limits and successful calls/sec over the last minute"""
+        with self._lock:
+            now = self._clock()
+            while self._done and self._done[0] < now - THROUGHPUT_WINDOW:
+                self._done.popleft()
+            counts = dict(self._counts)
+            recent = len(self._done)
+        attempts = counts[OK] + counts[THROTTLED] + counts[FAILED]
+        return {
+            **counts,
+            "throughput_per_s": round(recent / THROUGHPUT_WINDOW, 3),
+            "rejection_rate": round((counts[THROTTLED] + counts["rejected"]) / max(attempts + counts["rejected"], 1), 4),
+            "concurrency_limit": round(self.limit.limit, 2),
+            "in_flight": self.limit.in_flight,
+            "rate_limit": round(self.bucket.rate, 3) if self.bucket.rate > 0 else None,
+            "circuit": self.breaker.state,
+        }
+
+
+# Providers reported by governor_metrics() even before their first call
+PROVIDERS = ("smtp", "gemini")
+
+_governors: Dict[str, Governor] = {}
+_governors_lock = threading.Lock()
+
+
+def _configured(name: str) -> Governor:
+    prefix = name.upper()
+    return Governor(
+        name,
+        rate=getattr(settings, f"{prefix}_RATE_LIMIT", 0.0),
+        burst=getattr(settings, f"{prefix}_BURST", 1),
+        max_concurrency=getattr(settings, f"{prefix}_MAX_CONCURRENCY", 8),
+        failure_threshold=settings.BREAKER_FAILURES,
+        reset_after=settings.BREAKER_RESET_SECONDS,
+    )
+
+
+def get_governor(name: str) -> Governor:
+    """Process-wide governor for a provider ("smtp", "gemini"), configured from settings"""
+    governor = _governors.get(name)
+    if governor is None:
+        with _governors_lock:
+            governor = _governors.get(name) or _configured(name)
+            _governors[name] = governor
+    return governor
+
+
+def governor_metrics() -> Dict[str, Dict]:
+    """metrics() of every provider's governor in this process"""
+    names = sorted(set(PROVIDERS) | set(_governors))
+    return {name: get_governor(name).metrics() for name in names}
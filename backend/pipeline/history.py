@@ -0,0 +1,263 @@
+# pipeline/history.py
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+from sqlalchemy import bindparam, delete, func, insert, inspect, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database.models import (
+    DemandPartition, DemandRollup, DemandUpload, InputData, SessionLocal, bump_generation,
+    demand_partition_table, engine, ensure_generation_table
+)
+from pipeline.allocation import demand_frame
+from pipeline.validation import validate_demand
+
+
+# Upload columns that date each row; without one the whole upload is dated `period`
+DATE_COLUMNS = ("date", "Date", "month", "Month", "period")
+
+HISTORY_COLUMNS = ["store_id", "product_id", "product_key", "category_name", "product_name", "day", "sales", "demand"]
+
+# Rollup grains: D(aily), W(eekly, starting Monday) and M(onthly); periods are keyed by their first day
+ROLLUP_GRAINS = ("D", "W", "M")
+
+INSERT_BATCH = 5000
+
+_tables_ready = False
+
+
+def ensure_history_tables() -> None:
+    """Create history tables on first use and fold any legacy input_data rows into them"""
+    global _tables_ready
+    if not _tables_ready:
+        ensure_generation_table()
+        for model in (InputData, DemandUpload, DemandPartition, DemandRollup):
+            model.__table__.create(bind=engine, checkfirst=True)
+        _tables_ready = True
+        _migrate_input_data()
+
+
+def ensure_partitions(periods: Iterable[str]) -> None:
+    """Create monthly partition tables; DDL runs on its own connection, so call before writing"""
+    existing = set(inspect(engine).get_table_names())
+    for period in sorted(set(periods)):
+        table = demand_partition_table(period)
+        if table.name not in existing:
+            table.create(bind=engine, checkfirst=True)
+
+
+def history_frame(df_demand: pd.DataFrame, period: Optional[date] = None) -> pd.DataFrame:
+    """Sum an upload per (store, product, day) in the partition layout.
+
+    Rows are dated by the first DATE_COLUMNS column present, otherwise by `period` (today).
+    Products are keyed by product_id, or by name when the id is blank. Rows rejected by
+    validation are not recorded.
+    """
+    df_demand, _ = validate_demand(df_demand)
+    frame = demand_frame(df_demand)
+    date_column = next((c for c in DATE_COLUMNS if c in df_demand.columns), None)
+    default = pd.Timestamp(period or date.today())
+    if date_column:
+        days = pd.to_datetime(df_demand[date_column], errors="coerce").fillna(default).dt.normalize()
+    else:
+        days = pd.Series(default, index=frame.index)
+    frame["day"] = days.dt.strftime("%Y-%m-%d")
+    frame["sales"] = 0
+    if "sales" in df_demand.columns:
+        frame["sales"] = pd.to_numeric(df_demand["sales"], errors="coerce").fillna(0).astype("int64")
+    frame["product_key"] = frame["product_id"].fillna(frame["product_name"].str.strip())
+
+    history = frame.groupby(["store_id", "product_key", "day"], sort=False).agg(
+        product_id=("product_id", "first"),
+        category_name=("category", "first"),
+        product_name=("product_name", "first"),
+        sales=("sales", "sum"),
+        demand=("demand", "sum"),
+    ).reset_index()
+    history["product_id"] = history["product_id"].fillna("")
+    return history[HISTORY_COLUMNS]
+
+
+def period_start(days: pd.Series, grain: str) -> pd.Series:
+    """First day (YYYY-MM-DD) of the period containing each day"""
+    stamps = pd.to_datetime(days)
+    if grain == "W":
+        stamps = stamps - pd.to_timedelta(stamps.dt.weekday, unit="D")
+    elif grain == "M":
+        stamps = stamps.dt.to_period("M").dt.start_time
+    elif grain != "D":
+        raise ValueError(f"Unknown rollup grain '{grain}'")
+    return stamps.dt.strftime("%Y-%m-%d")
+
+
+def rollup_frame(history: pd.DataFrame, grain: str) -> pd.DataFrame:
+    """Demand and sales per (period, product, category) at one grain"""
+    frame = history.assign(period=period_start(history["day"], grain), category_name=history["category_name"].fillna(""))
+    rollup = frame.groupby(["period", "product_key", "category_name"], sort=False).agg(
+        product_name=("product_name", "first"), sales=("sales", "sum"), demand=("demand", "sum")
+    ).reset_index()
+    rollup["grain"] = grain
+    return rollup
+
+
+def _executemany(conn, stmt, frame: pd.DataFrame) -> None:
+    """Run a Core statement once per frame row through the DBAPI executemany.
+
+    The statement is compiled once and rows are bound as plain tuples, skipping the
+    per-row parameter processing that otherwise costs more than SQLite itself.
+    """
+    compiled = stmt.compile(dialect=conn.dialect)
+    rows = list(zip(*(frame[name].tolist() for name in compiled.positiontup)))
+    for start in range(0, len(rows), INSERT_BATCH):
+        conn.exec_driver_sql(str(compiled), rows[start:start + INSERT_BATCH])
+
+
+def _write_history(db, history: pd.DataFrame, upload_id: int, now: datetime) -> None:
+    """Insert rows into their monthly partitions and fold them into every rollup grain"""
+    conn = db.connection()
+    columns = HISTORY_COLUMNS + ["upload_id"]
+    months = history["day"].str[:7]
+    for month, rows in history.groupby(months, sort=True):
+        table = demand_partition_table(month)
+        stmt = insert(table).values({name: bindparam(name) for name in columns})
+        _executemany(conn, stmt, rows.assign(upload_id=upload_id))
+        conn.execute(
+            sqlite_insert(DemandPartition).values(table_name=table.name, period=month, created_at=now)
+            .on_conflict_do_nothing(index_elements=["table_name"])
+        )
+
+    rollup = DemandRollup.__table__
+    columns = ["grain", "period", "product_key", "category_name", "product_name", "sales", "demand"]
+    stmt = sqlite_insert(rollup).values({name: bindparam(name) for name in columns})
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["grain", "period", "product_key", "category_name"],
+        set_={"sales": rollup.c.sales + stmt.excluded.sales, "demand": rollup.c.demand + stmt.excluded.demand}
+    )
+    for grain in ROLLUP_GRAINS:
+        _executemany(conn, stmt, rollup_frame(history, grain))
+
+
+def _ingest(db, history: pd.DataFrame, file_name: str, fingerprint: str) -> int:
+    ensure_partitions(history["day"].str[:7].unique())
+    now = datetime.utcnow()
+    try:
+        upload = DemandUpload(fingerprint=fingerprint, file_name=file_name, rows=len(history), created_at=now)
+        db.add(upload)
+        db.flush()
+        _write_history(db, history, upload.id, now)
+        bump_generation(db, "demand")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(history)
+
+
+def record_demand_history(db, df_demand: pd.DataFrame, file_name: str, fingerprint: str,
+                          period: Optional[date] = None) -> int:
+    """Append an upload to the demand history once per file content; returns rows written"""
+    ensure_history_tables()
+    if db.execute(select(DemandUpload.id).where(DemandUpload.fingerprint == fingerprint)).first():
+        return 0
+    return _ingest(db, history_frame(df_demand, period), file_name, fingerprint)
+
+
+def _migrate_input_data() -> None:
+    """Move rows recorded in the flat input_data table into partitions and rollups"""
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(
+            InputData.store_id, InputData.product_id, InputData.category_name, InputData.product_name,
+            InputData.month, InputData.sales, InputData.demand
+        )).all()
+        if not rows:
+            return
+        legacy = pd.DataFrame(rows, columns=["store_id", "product_id", "category_name", "product_name",
+                                             "month", "sales", "demand"])
+        days = pd.to_datetime(legacy["month"], errors="coerce").fillna(pd.Timestamp(date.today()))
+        legacy["day"] = days.dt.strftime("%Y-%m-%d")
+        legacy["product_id"] = legacy["product_id"].fillna("").astype(str).str.strip()
+        legacy["product_key"] = legacy["product_id"].where(
+            legacy["product_id"] != "", legacy["product_name"].fillna("").astype(str).str.strip()
+        )
+        for column in ("sales", "demand"):
+            legacy[column] = pd.to_numeric(legacy[column], errors="coerce").fillna(0).astype("int64")
+        ensure_partitions(legacy["day"].str[:7].unique())
+        db.execute(delete(InputData))
+        _ingest(db, legacy[HISTORY_COLUMNS], "input_data", f"input_data:{datetime.utcnow().isoformat()}")
+    finally:
+        db.close()
+
+
+def partition_periods(db, since: Optional[str] = None) -> List[str]:
+    """Registered partition months, oldest first, optionally from `since` (YYYY-MM or a date) on"""
+    ensure_history_tables()
+    query = select(DemandPartition.period).order_by(DemandPartition.period)
+    if since:
+        query = query.where(DemandPartition.period >= since[:7])
+    return list(db.execute(query).scalars())
+
+
+def load_history_rows(db, since: Optional[str] = None) -> pd.DataFrame:
+    """Raw history rows (HISTORY_COLUMNS) read partition by partition, skipping older months"""
+    frames = []
+    for month in partition_periods(db, since):
+        table = demand_partition_table(month)
+        query = select(*[table.c[column] for column in HISTORY_COLUMNS])
+        if since:
+            query = query.where(table.c.day >= since)
+        frames.append(pd.DataFrame(db.execute(query).all(), columns=HISTORY_COLUMNS))
+    if not frames:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def product_demand(db, product_key: str) -> int:
+    """All-time demand for one product from the monthly rollup"""
+    ensure_history_tables()
+    return int(db.execute(
+        select(func.coalesce(func.sum(DemandRollup.demand), 0))
+        .where(DemandRollup.grain == "M", DemandRollup.product_key == product_key)
+    ).scalar() or 0)
+
+
+def demand_totals(db) -> Dict[str, int]:
+    """All-time demand per product from the monthly rollup"""
+    ensure_history_tables()
+    rows = db.execute(
+        select(DemandRollup.product_key, func.sum(DemandRollup.demand))
+        .where(DemandRollup.grain == "M").group_by(DemandRollup.product_key)
+    )
+    return {key: int(total or 0) for key, total in rows}
+
+
+def demand_rollups(db, grain: str = "M", by: str = "product", product_key: Optional[str] = None,
+                   category: Optional[str] = None, since: Optional[str] = None,
+                   until: Optional[str] = None) -> List[Dict]:
+    """Rollup rows at one grain, per product or summed per category, oldest period first"""
+    if grain not in ROLLUP_GRAINS:
+        raise ValueError(f"Unknown rollup grain '{grain}'")
+    if by not in ("product", "category"):
+        raise ValueError(f"Unknown rollup grouping '{by}'")
+    ensure_history_tables()
+    filters = [DemandRollup.grain == grain]
+    if product_key:
+        filters.append(DemandRollup.product_key == product_key)
+    if category:
+        filters.append(DemandRollup.category_name == category)
+    if since:
+        filters.append(DemandRollup.period >= since)
+    if until:
+        filters.append(DemandRollup.period <= until)
+
+    if by == "category":
+        query = select(
+            DemandRollup.period, DemandRollup.category_name,
+            func.sum(DemandRollup.sales).label("sales"), func.sum(DemandRollup.demand).label("demand")
+        ).where(*filters).group_by(DemandRollup.period, DemandRollup.category_name)
+        query = query.order_by(DemandRollup.period, DemandRollup.category_name)
+    else:
+        query = select(
+            DemandRollup.period, DemandRollup.product_key, DemandRollup.category_name,
+            DemandRollup.product_name, DemandRollup.sales, DemandRollup.demand
+        ).where(*filters).order_by(DemandRollup.period, DemandRollup.product_key)
+    return [dict(row._mapping) for row in db.execute(query)]
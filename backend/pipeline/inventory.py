@@ -0,0 +1,48 @@
+# pipeline/inventory.py
+import pandas as pd
+from sqlalchemy import func, select
+from database.models import InventoryData, StockLevel
+from pipeline.ledger import ensure_ledger_tables
+
+
+# stock is the on-hand quantity from the ledger snapshot (or the loaded stock if the product
+# has no ledger activity yet); on_order is stock already reserved by sent purchase orders
+INVENTORY_COLUMNS = ["product_id", "category_name", "product_name", "vendor_id", "stock", "on_order"]
+
+
+def _map_unique(values: pd.Series, transform) -> pd.Series:
+    """Apply a string transform once per distinct value instead of once per row"""
+    codes, uniques = pd.factorize(values.fillna("").astype(str))
+    mapped = transform(pd.Series(uniques, dtype=object).str).to_numpy(dtype=object)
+    if len(mapped) == 0:
+        return pd.Series("", index=values.index, dtype=object)
+    return pd.Series(mapped[codes], index=values.index, dtype=object)
+
+
+def strip_series(values: pd.Series) -> pd.Series:
+    """Vectorized equivalent of str(text or '').strip()"""
+    return _map_unique(values, lambda s: s.strip())
+
+
+def normalize_series(values: pd.Series) -> pd.Series:
+    """Vectorized equivalent of str(text or '').strip().lower()"""
+    return _map_unique(values, lambda s: s.strip().str.lower())
+
+
+def load_inventory_frame(db) -> pd.DataFrame:
+    """Load inventory joined with the stock snapshot in a single Core query and add normalized match keys"""
+    ensure_ledger_tables()
+    table = InventoryData.__table__
+    rows = db.execute(
+        select(
+            table.c.product_id, table.c.category_name, table.c.product_name, table.c.vendor_id,
+            func.coalesce(StockLevel.on_hand, table.c.stock), func.coalesce(StockLevel.on_order, 0)
+        ).outerjoin(StockLevel, StockLevel.product_id == func.trim(table.c.product_id))
+    ).all()
+    frame = pd.DataFrame(rows, columns=INVENTORY_COLUMNS)
+    for column in ("stock", "on_order"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").fillna(0).astype("int64")
+    frame["name_norm"] = normalize_series(frame["product_name"])
+    frame["cat_norm"] = normalize_series(frame["category_name"])
+    frame["product_id"] = strip_series(frame["product_id"])
+    return frame
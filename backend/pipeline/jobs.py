@@ -0,0 +1,248 @@
+# pipeline/jobs.py
+import hashlib
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence
+from database.models import DemandJob, SessionLocal, engine
+from config.settings import settings
+from pipeline.demand import read_demand_file, process_demand
+from pipeline.history import record_demand_history
+from pipeline.ranking import ShortageRanking
+
+
+ACTIVE_STATUSES = ("queued", "running")
+PROGRESS_FIELDS = ("rows_total", "rows_parsed", "keys_aggregated", "total_keys", "matches_done")
+
+# Minimum seconds between progress writes from a worker
+PROGRESS_INTERVAL = 0.5
+
+# Shortage rankings of finished jobs kept for paging (a finished result never changes)
+RANKING_CACHE_SIZE = 8
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_table_ready = False
+_rankings: "OrderedDict[str, ShortageRanking]" = OrderedDict()
+_rankings_lock = threading.Lock()
+
+
+def _ensure_table() -> None:
+    global _table_ready
+    if not _table_ready:
+        DemandJob.__table__.create(bind=engine, checkfirst=True)
+        _table_ready = True
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Shared process pool; spawn keeps workers independent of Streamlit/uvicorn threads"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.JOB_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _discard_executor(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next submit starts a fresh one"""
+    global _executor
+    with _executor_lock:
+        if _executor is pool:
+            _executor = None
+    pool.shutdown(wait=False)
+
+
+def payload_fingerprint(payload: bytes) -> str:
+    """Content hash used to recognise re-submissions of the same file"""
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _update_job(db, job_id: str, **fields) -> None:
+    fields["updated_at"] = datetime.utcnow()
+    db.query(DemandJob).filter(DemandJob.id == job_id).update(fields)
+    db.commit()
+
+
+def _fail_job(job_id: str, error: str) -> None:
+    """Mark a job failed unless it already finished"""
+    db = SessionLocal()
+    try:
+        db.query(DemandJob).filter(DemandJob.id == job_id, DemandJob.status.in_(ACTIVE_STATUSES)).update(
+            {"status": "failed", "error": error, "updated_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _job_done(job_id: str, path: str, pool: ProcessPoolExecutor, future: Future) -> None:
+    """Pool callback: run_job records its own errors, this catches a worker that died mid-job"""
+    if future.cancelled():
+        error = "Job was cancelled"
+    elif future.exception() is None:
+        return
+    else:
+        error = f"Error processing file: {future.exception()}"
+        if isinstance(future.exception(), BrokenProcessPool):
+            _discard_executor(pool)
+    _fail_job(job_id, error)
+    Path(path).unlink(missing_ok=True)
+
+
+class _ProgressReporter:
+    """Progress callback for process_demand that batches counter updates into the job row"""
+
+    def __init__(self, db, job_id: str):
+        self.db = db
+        self.job_id = job_id
+        self.pending: Dict[str, int] = {}
+        self.last_write = 0.0
+
+    def __call__(self, **counters) -> None:
+        self.pending.update(counters)
+        if time.monotonic() - self.last_write >= PROGRESS_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.pending:
+            _update_job(self.db, self.job_id, **self.pending)
+            self.pending = {}
+        self.last_write = time.monotonic()
+
+
+def submit_job(file_name: str, payload: bytes, store_mode: Optional[str] = None,
+               store_priority: Optional[Sequence[str]] = None, record_history: bool = False) -> str:
+    """Persist a queued job for an uploaded file and hand it to the process pool"""
+    _ensure_table()
+    job_id = uuid.uuid4().hex
+    jobs_dir = Path(settings.JOBS_DIR)
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    path = jobs_dir / f"{job_id}{Path(file_name).suffix}"
+    path.write_bytes(payload)
+
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.add(DemandJob(
+            id=job_id,
+            status="queued",
+            file_name=file_name,
+            fingerprint=payload_fingerprint(payload),
+            store_mode=store_mode or "",
+            created_at=now,
+            updated_at=now
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+    args = (run_job, job_id, str(path), file_name, store_mode, list(store_priority or []), record_history)
+    try:
+        pool = _get_executor()
+        try:
+            future = pool.submit(*args)
+        except BrokenProcessPool:
+            # A worker died since the last submit; retry once on a fresh pool
+            _discard_executor(pool)
+            pool = _get_executor()
+            future = pool.submit(*args)
+    except Exception as e:
+        _fail_job(job_id, f"Error starting job: {e}")
+        path.unlink(missing_ok=True)
+        raise
+    future.add_done_callback(lambda f: _job_done(job_id, str(path), pool, f))
+    return job_id
+
+
+def run_job(job_id: str, path: str, file_name: str, store_mode: Optional[str] = None,
+            store_priority: Optional[Sequence[str]] = None, record_history: bool = False) -> None:
+    """Worker entry point: process a saved demand file, recording progress and the result"""
+    db = SessionLocal()
+    try:
+        _update_job(db, job_id, status="running")
+        df_demand = read_demand_file(path, file_name)
+        _update_job(db, job_id, rows_total=len(df_demand))
+
+        reporter = _ProgressReporter(db, job_id)
+        result = process_demand(df_demand, db, store_mode, store_priority, progress=reporter)
+        reporter.flush()
+        if record_history:
+            job = db.get(DemandJob, job_id)
+            result["history_rows"] = record_demand_history(db, df_demand, file_name, job.fingerprint)
+        _update_job(db, job_id, status="succeeded", result=json.dumps(result, default=str))
+    except Exception as e:
+        db.rollback()
+        _update_job(db, job_id, status="failed", error=f"Error processing file: {e}")
+    finally:
+        db.close()
+        Path(path).unlink(missing_ok=True)
+
+
+def get_job(job_id: str, include_result: bool = True) -> Optional[Dict]:
+    """Current status, progress counters and (optionally) result of a job"""
+    _ensure_table()
+    db = SessionLocal()
+    try:
+        job = db.query(DemandJob).filter(DemandJob.id == job_id).first()
+        if not job:
+            return None
+        data = {
+            "job_id": job.id,
+            "status": job.status,
+            "file_name": job.file_name,
+            "store_mode": job.store_mode,
+            "progress": {field: getattr(job, field) or 0 for field in PROGRESS_FIELDS},
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        }
+        if include_result and job.result:
+            data["result"] = json.loads(job.result)
+        return data
+    finally:
+        db.close()
+
+
+def job_shortage_ranking(job_id: str) -> Optional[ShortageRanking]:
+    """Ranking over a succeeded job's orders_to_send, parsed once and kept for the next pages"""
+    with _rankings_lock:
+        ranking = _rankings.get(job_id)
+        if ranking is not None:
+            _rankings.move_to_end(job_id)
+            return ranking
+    job = get_job(job_id)
+    if not job or job["status"] != "succeeded":
+        return None
+    ranking = ShortageRanking(job["result"]["orders_to_send"])
+    with _rankings_lock:
+        # Another request may have built it meanwhile; keep the first so pages stay consistent
+        ranking = _rankings.setdefault(job_id, ranking)
+        _rankings.move_to_end(job_id)
+        while len(_rankings) > RANKING_CACHE_SIZE:
+            _rankings.popitem(last=False)
+    return ranking
+
+
+def iter_job_progress(job_id: str, interval: float = PROGRESS_INTERVAL) -> Iterator[Dict]:
+    """Yield job snapshots whenever they change, until the job finishes"""
+    last = None
+    while True:
+        job = get_job(job_id, include_result=False)
+        if job is None:
+            yield {"job_id": job_id, "status": "not_found"}
+            return
+        if job != last:
+            yield job
+            last = job
+        if job["status"] not in ACTIVE_STATUSES:
+            return
+        time.sleep(interval)
@@ -0,0 +1,164 @@
+# pipeline/ledger.py
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database.models import (
+    STOCK_GENERATION, InventoryData, StockLevel, StockMovement, bump_generation, engine, ensure_generation_table
+)
+
+
+MOVEMENT_KINDS = ("receipt", "reservation", "adjustment")
+
+# Rows per INSERT / upsert statement; keeps SQLite well under its variable limit
+BATCH_SIZE = 500
+
+_tables_ready = False
+
+
+def ensure_ledger_tables() -> None:
+    """Create ledger tables on first use; DDL runs on its own connection, so call before writing"""
+    global _tables_ready
+    if not _tables_ready:
+        ensure_generation_table()
+        StockMovement.__table__.create(bind=engine, checkfirst=True)
+        StockLevel.__table__.create(bind=engine, checkfirst=True)
+        _tables_ready = True
+
+
+def _deltas(kind: str, quantity: int) -> Tuple[int, int]:
+    """(on_hand, on_order) change for one movement"""
+    if kind == "receipt":
+        return quantity, -quantity
+    if kind == "reservation":
+        return 0, quantity
+    if kind == "adjustment":
+        return quantity, 0
+    raise ValueError(f"Unknown movement kind '{kind}'")
+
+
+def _batches(items: Sequence, size: int = BATCH_SIZE) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _seed_levels(db, product_ids: Sequence[str], now: datetime) -> None:
+    """Create snapshot rows for products seen for the first time, starting from the loaded stock.
+
+    Products that are not in inventory_data start from zero, so every change afterwards
+    goes through the same increment-in-place upsert.
+    """
+    for batch in _batches(list(product_ids)):
+        db.execute(
+            sqlite_insert(StockLevel).from_select(
+                ["product_id", "on_hand", "on_order", "updated_at"],
+                select(
+                    func.trim(InventoryData.product_id), func.coalesce(func.max(InventoryData.stock), 0), literal(0), literal(now)
+                ).where(func.trim(InventoryData.product_id).in_(batch)).group_by(func.trim(InventoryData.product_id))
+            ).on_conflict_do_nothing(index_elements=["product_id"])
+        )
+        db.execute(
+            sqlite_insert(StockLevel).on_conflict_do_nothing(index_elements=["product_id"]),
+            [{"product_id": pid, "on_hand": 0, "on_order": 0, "updated_at": now} for pid in batch]
+        )
+
+
+def record_movements(db, movements: Iterable[Dict]) -> int:
+    """Append movements to the ledger and fold them into the on-hand/on-order snapshot.
+
+    Each movement is a dict with product_id, kind, quantity and an optional reference.
+    Everything is written in one transaction: the ledger rows go in with batched INSERTs,
+    and each product's net change is applied with one upsert. This keeps concurrent
+    writers from losing updates. Receipts also draw down on_order, never below zero.
+    Returns the number of movements recorded.
+    """
+    ensure_ledger_tables()
+    now = datetime.utcnow()
+    rows: List[Dict] = []
+    net: Dict[str, List[int]] = {}
+    for movement in movements:
+        product_id = str(movement["product_id"]).strip()
+        quantity = int(movement["quantity"])
+        on_hand, on_order = _deltas(movement["kind"], quantity)
+        totals = net.setdefault(product_id, [0, 0])
+        totals[0] += on_hand
+        totals[1] += on_order
+        rows.append({
+            "product_id": product_id,
+            "kind": movement["kind"],
+            "quantity": quantity,
+            "reference": movement.get("reference") or "",
+            "created_at": now,
+        })
+    if not rows:
+        return 0
+
+    try:
+        for batch in _batches(rows):
+            db.execute(insert(StockMovement), list(batch))
+
+        _seed_levels(db, list(net), now)
+        changes = [
+            {"product_id": pid, "on_hand": d_hand, "on_order": d_order, "updated_at": now}
+            for pid, (d_hand, d_order) in net.items()
+        ]
+        for batch in _batches(changes):
+            stmt = sqlite_insert(StockLevel)
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["product_id"],
+                    set_={
+                        "on_hand": StockLevel.on_hand + stmt.excluded.on_hand,
+                        "on_order": func.max(0, StockLevel.on_order + stmt.excluded.on_order),
+                        "updated_at": stmt.excluded.updated_at,
+                    }
+                ),
+                list(batch)
+            )
+        bump_generation(db, STOCK_GENERATION)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(rows)
+
+
+def reserve_sent_orders(db, results: Iterable[Dict], reference: str = "") -> int:
+    """Book the shortage of every successfully sent PO as on-order stock"""
+    return record_movements(db, (
+        {"product_id": r["product_id"], "kind": "reservation", "quantity": int(r["shortage"]),
+         "reference": reference or f"PO:{r.get('vendor', '')}"}
+        for r in results
+        if r.get("result") == "Sent" and r.get("product_id") and int(r.get("shortage") or 0) > 0
+    ))
+
+
+def stock_levels(db, product_ids: Optional[Sequence[str]] = None) -> Dict[str, Tuple[int, int]]:
+    """Snapshot as {product_id: (on_hand, on_order)}, optionally limited to some products"""
+    ensure_ledger_tables()
+    query = select(StockLevel.product_id, StockLevel.on_hand, StockLevel.on_order)
+    if product_ids is not None:
+        levels = {}
+        for batch in _batches([str(p).strip() for p in product_ids]):
+            levels.update(
+                (pid, (int(on_hand or 0), int(on_order or 0)))
+                for pid, on_hand, on_order in db.execute(query.where(StockLevel.product_id.in_(batch)))
+            )
+        return levels
+    return {pid: (int(on_hand or 0), int(on_order or 0)) for pid, on_hand, on_order in db.execute(query)}
+
+
+def stock_level(db, product_id: str, default_on_hand: int = 0) -> Tuple[int, int]:
+    """(on_hand, on_order) for one product; falls back to the loaded stock with nothing on order"""
+    return stock_levels(db, [product_id]).get(str(product_id).strip(), (int(default_on_hand or 0), 0))
+
+
+def movement_history(db, product_id: str, limit: int = 100) -> List[Dict]:
+    """Most recent ledger entries for a product, newest first"""
+    ensure_ledger_tables()
+    rows = db.execute(
+        select(StockMovement.kind, StockMovement.quantity, StockMovement.reference, StockMovement.created_at)
+        .where(StockMovement.product_id == str(product_id).strip())
+        .order_by(StockMovement.id.desc()).limit(limit)
+    )
+    return [dict(row._mapping) for row in rows]
@@ -0,0 +1,240 @@
+# pipeline/mailer.py
+import io
+import multiprocessing
+import queue
+import smtplib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from email.generator import BytesGenerator
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.policy import Policy, compat32
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+from config.settings import settings
+from pipeline.governor import THROTTLED, CircuitOpenError, Governor, classify_error, get_governor
+
+
+# Messages rendered per task; rendered batches waiting for the sender are capped at QUEUE_BATCHES
+MAIL_BATCH = 50
+QUEUE_BATCHES = 4
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class OrderMail(NamedTuple):
+    """One message to send: recipient plus the fields its template is filled with"""
+    to: str
+    fields: Dict
+
+
+@lru_cache(maxsize=None)
+def _policy(linesep: str) -> Policy:
+    """Serialization policy per line ending, created once"""
+    return compat32.clone(linesep=linesep)
+
+
+class MailTemplate:
+    """Subject and body format strings, parsed once and filled per message"""
+
+    def __init__(self, sender: str, subject: str, body: str):
+        self.sender = sender
+        self.subject = subject
+        self.body = body
+        self._subject_parts = self._compile(subject)
+        self._body_parts = self._compile(body)
+
+    @staticmethod
+    def _compile(text: str) -> List:
+        """Literal text and field names in order, so filling is a join instead of a parse"""
+        parts = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None and (spec or conversion or not field.isidentifier()):
+                raise ValueError(f"Unsupported template field '{{{field}}}'")
+            parts.append((literal, field))
+        return parts
+
+    @staticmethod
+    def _fill(parts: List, fields: Dict) -> str:
+        return "".join(literal + ("" if field is None else str(fields[field])) for literal, field in parts)
+
+    def message(self, to: str, fields: Dict) -> MIMEMultipart:
+        """The message as the email package builds it"""
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = to
+        msg['Subject'] = self._fill(self._subject_parts, fields)
+        msg.attach(MIMEText(self._fill(self._body_parts, fields), 'plain'))
+        return msg
+
+    def render(self, to: str, fields: Dict, linesep: str = "\r\n") -> bytes:
+        """Serialized message, with CRLF line endings for SMTP by default"""
+        out = io.BytesIO()
+        BytesGenerator(out, mangle_from_=False, policy=_policy(linesep)).flatten(self.message(to, fields))
+        return out.getvalue()
+
+
+def render_batch(template: MailTemplate, mails: Sequence[OrderMail]) -> List:
+    """Rendered bytes per message, or the exception for a message that could not be rendered"""
+    rendered = []
+    for mail in mails:
+        try:
+            rendered.append(template.render(mail.to, mail.fields))
+        except Exception as e:
+            rendered.append(e)
+    return rendered
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Render pool shared by every pipeline in the process (spawn, like the job pool)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.MAIL_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def smtp_error(e: Exception) -> str:
+    """Result text for a failed send"""
+    if isinstance(e, smtplib.SMTPAuthenticationError):
+        return f"Error: SMTP auth failed ({e.smtp_code}) {e.smtp_error}"
+    if isinstance(e, smtplib.SMTPException):
+        return f"Error: SMTP error {str(e)}"
+    return f"Error: {str(e)}"
+
+
+class MailPipeline:
+    """Render messages in batches and send them over one SMTP connection as they become ready.
+
+    Rendering runs in a background thread, or in a process pool when MAIL_RENDER_WORKERS > 1,
+    and hands rendered bytes to the sender through a bounded queue, so rendering the next
+    batch overlaps with the network round trips of the current one. Every send goes through
+    the process-wide "smtp" governor (rate limit, AIMD back-off on 4xx, circuit breaker).
+
+    `config` holds smtp_server, smtp_port, sender_email, sender_password, sender_from and
+    optionally smtp_security ("ssl", "starttls" or "none"; default "ssl").
+    """
+
+    def __init__(self, config: Dict, template: MailTemplate, workers: Optional[int] = None,
+                 batch_size: int = MAIL_BATCH, governor: Optional[Governor] = None):
+        self.config = config
+        self.template = template
+        self.workers = workers if workers is not None else settings.MAIL_RENDER_WORKERS
+        self.batch_size = batch_size
+        self.governor = governor or get_governor("smtp")
+        self._server: Optional[smtplib.SMTP] = None
+
+    def _rendered(self, mails: Sequence[OrderMail]) -> Iterator[List]:
+        batches = [mails[i:i + self.batch_size] for i in range(0, len(mails), self.batch_size)]
+        if self.workers > 1 and len(batches) > 1:
+            yield from _get_executor().map(render_batch, [self.template] * len(batches), batches)
+        else:
+            for batch in batches:
+                yield render_batch(self.template, batch)
+
+    def _render_into(self, mails: Sequence[OrderMail], ready: "queue.Queue") -> None:
+        try:
+            for rendered in self._rendered(mails):
+                ready.put(rendered)
+        except Exception as e:
+            ready.put(e)
+        ready.put(None)
+
+    def _connect(self) -> smtplib.SMTP:
+        config = self.config
+        security = config.get("smtp_security", "ssl")
+        if security == "ssl":
+            server = smtplib.SMTP_SSL(config["smtp_server"], config["smtp_port"], timeout=20)
+        else:
+            server = smtplib.SMTP(config["smtp_server"], config["smtp_port"], timeout=20)
+        try:
+            server.ehlo()
+            if security == "starttls":
+                server.starttls()
+                server.ehlo()
+            if config.get("sender_password"):
+                server.login(config["sender_email"], config["sender_password"])
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _deliver(self, to: str, payload: bytes) -> None:
+        """Send one message, reconnecting once if the server dropped the connection"""
+        if self._server is None:
+            self._server = self._connect()
+        try:
+            self._server.sendmail(self.config["sender_from"], [to], payload)
+        except smtplib.SMTPServerDisconnected:
+            self._server.close()
+            self._server = None
+            self._server = self._connect()
+            self._server.sendmail(self.config["sender_from"], [to], payload)
+
+    def _drop_connection(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def _close(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                self._server.close()
+            self._server = None
+
+    def send(self, mails: Sequence[OrderMail]) -> List[str]:
+        """Send every message; returns "Sent" or an error text per message, in order"""
+        results: List[str] = []
+        if not mails:
+            return results
+        ready: "queue.Queue" = queue.Queue(maxsize=QUEUE_BATCHES)
+        renderer = threading.Thread(target=self._render_into, args=(mails, ready), daemon=True)
+        renderer.start()
+
+        connect_error = None
+        try:
+            while True:
+                rendered = ready.get()
+                if rendered is None:
+                    break
+                if isinstance(rendered, Exception):
+                    results.extend([smtp_error(rendered)] * (len(mails) - len(results)))
+                    break
+                for payload in rendered:
+                    mail = mails[len(results)]
+                    if connect_error:
+                        results.append(connect_error)
+                        continue
+                    if isinstance(payload, Exception):
+                        results.append(smtp_error(payload))
+                        continue
+                    try:
+                        self.governor.call(self._deliver, mail.to, payload)
+                        results.append("Sent")
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                            smtplib.SMTPDataError, CircuitOpenError) as e:
+                        results.append(smtp_error(e))
+                    except OSError as e:  # smtplib errors included
+                        results.append(smtp_error(e))
+                        if classify_error(e) != THROTTLED:
+                            # Connection or login failures would repeat for every message
+                            connect_error = results[-1]
+                        self._drop_connection()
+                    except Exception as e:
+                        # Anything else concerns this message only; start the next one on a clean connection
+                        results.append(smtp_error(e))
+                        self._drop_connection()
+        finally:
+            # Let the renderer finish if the sender stopped early, then close the connection
+            while renderer.is_alive():
+                try:
+                    ready.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._close()
+        return results
@@ -0,0 +1,303 @@
+# pipeline/orders.py
+import logging
+from pathlib import Path
+from config.settings import settings
+from database.models import VendorList
+from pipeline.ledger import reserve_sent_orders
+from pipeline.mailer import MailPipeline, MailTemplate, OrderMail, smtp_error
+from pipeline.sent_orders import claim_orders, complete_claims, duplicate_message
+
+logger = logging.getLogger(__name__)
+
+
+def find_vendor_by_id(db, vendor_id):
+    """Find vendor by vendor_id"""
+    try:
+        vendor = db.query(VendorList).filter(
+            VendorList.vendor_id == vendor_id
+        ).first()
+        
+        if vendor:
+            return {
+                "vendor_id": vendor.vendor_id,
+                "vendor_name": vendor.vendor_name,
+                "email": vendor.email,
+                "contact": vendor.contact,
+                "location": vendor.location
+            }
+        return None
+    except Exception:
+        logger.exception("Error finding vendor %s", vendor_id)
+        return None
+
+
+def sender_address():
+    """EMAIL_FROM, or EMAIL_USERNAME when it is unset"""
+    sender = settings.EMAIL_FROM or settings.EMAIL_USERNAME
+    if not sender:
+        raise ValueError("Email sender is not configured: set EMAIL_FROM or EMAIL_USERNAME")
+    return sender
+
+
+def smtp_config():
+    """Email configuration from settings; raises ValueError when the account is not configured"""
+    missing = [name for name in ("EMAIL_USERNAME", "EMAIL_PASSWORD") if not getattr(settings, name)]
+    if missing and settings.EMAIL_SECURITY != "none":
+        raise ValueError(f"Email is not configured: set {', '.join(missing)}")
+    return {
+        "smtp_server": settings.EMAIL_HOST,
+        "smtp_port": settings.EMAIL_PORT,
+        "sender_email": settings.EMAIL_USERNAME,
+        "sender_password": settings.EMAIL_PASSWORD,
+        "sender_from": sender_address(),
+        "smtp_security": settings.EMAIL_SECURITY,
+    }
+
+
+ORDER_SUBJECT = "Purchase Order - {product_name} ({product_id})"
+ORDER_BODY = """
+Dear {vendor_name},
+
+We would like to place an order for the following:
+
+Product: {product_name}
+Product ID: {product_id}
+Quantity Needed: {shortage} units
+Inventory Location: {location}
+
+Please confirm availability and provide delivery timeline.
+
+Best regards,
+Inventory Management System
+    """
+
+_templates = {}
+
+
+def order_template(sender_from):
+    """Purchase order template for a sender, compiled on first use"""
+    template = _templates.get(sender_from)
+    if template is None:
+        template = MailTemplate(f"Inventory Agent <{sender_from}>", ORDER_SUBJECT, ORDER_BODY)
+        _templates[sender_from] = template
+    return template
+
+
+def order_mail(vendor_data, order_details):
+    """Recipient and template fields of the purchase order for one vendor/product"""
+    return OrderMail(vendor_data['email'], {
+        'vendor_name': vendor_data['vendor_name'],
+        'product_name': order_details['product_name'],
+        'product_id': order_details['product_id'],
+        'shortage': order_details['shortage'],
+        'location': settings.INVENTORY_LOCATION,
+    })
+
+
+def build_order_message(vendor_data, order_details, sender_from):
+    """Create the purchase order message for one vendor/product"""
+    mail = order_mail(vendor_data, order_details)
+    return order_template(sender_from).message(mail.to, mail.fields)
+
+
+def send_order_emails(orders):
+    """Send purchase orders for (vendor_data, order_details) pairs through the mail pipeline.
+
+    Returns "Sent" or an error text per order, in order.
+    """
+    if not orders:
+        return []
+    try:
+        config = smtp_config()
+    except ValueError as e:
+        return [smtp_error(e)] * len(orders)
+    mails = [order_mail(vendor_data, order_details) for vendor_data, order_details in orders]
+    return MailPipeline(config, order_template(config['sender_from'])).send(mails)
+
+
+def send_order_email(vendor_data, order_details):
+    """Send order email to vendor"""
+    return send_order_emails([(vendor_data, order_details)])[0]
+
+
+def reserve_sent(db, results):
+    """Record sent POs as on-order stock so later uploads don't reorder the same shortage"""
+    try:
+        reserve_sent_orders(db, results)
+    except Exception:
+        logger.exception("Error reserving sent orders")
+
+
+def send_bulk_orders(db, orders_to_send):
+    """Send bulk orders for multiple items"""
+    results = []
+    pending = []
+    
+    for order in orders_to_send:
+        vendor_data = find_vendor_by_id(db, order['vendor_id'])
+        if vendor_data:
+            pending.append((len(results), vendor_data, order))
+            results.append({
+                'store_id': order.get('store_id', ''),
+                'product_id': order['product_id'],
+                'product_name': order['product_name'],
+                'shortage': order['shortage'],
+                'vendor': vendor_data['vendor_name'],
+                'vendor_email': vendor_data['email'],
+                'result': None
+            })
+        else:
+            results.append({
+                'store_id': order.get('store_id', ''),
+                'product_id': order['product_id'],
+                'product_name': order['product_name'],
+                'shortage': order['shortage'],
+                'vendor': 'No vendor found',
+                'vendor_email': 'N/A',
+                'result': f"Error: No vendor found for vendor_id {order.get('vendor_id', '')}"
+            })
+    
+    # All emails go through one pipeline run: rendered in batches, sent over one connection
+    sent = send_order_emails([(vendor_data, order) for _, vendor_data, order in pending])
+    for (i, _, _), result in zip(pending, sent):
+        results[i]['result'] = result
+    
+    reserve_sent(db, results)
+    return results
+
+
+def group_orders_by_vendor_product(db, orders_to_send):
+    """Group orders to avoid duplicate emails to the same vendor/product. Sum shortages."""
+    grouped = {}
+    for o in orders_to_send:
+        key = (o.get('vendor_id', ''), o.get('product_id', ''))
+        if key not in grouped:
+            grouped[key] = {
+                'vendor_id': o.get('vendor_id', ''),
+                'product_id': o.get('product_id', ''),
+                'product_name': o.get('product_name', ''),
+                'category': o.get('category', ''),
+                'current_stock': int(o.get('current_stock', 0) or 0),
+                'demand': int(o.get('demand', 0) or 0),
+                'shortage': int(o.get('shortage', 0) or 0),
+            }
+        else:
+            grouped[key]['demand'] += int(o.get('demand', 0) or 0)
+            grouped[key]['shortage'] += int(o.get('shortage', 0) or 0)
+            # keep minimal stock for info
+            grouped[key]['current_stock'] = min(grouped[key]['current_stock'], int(o.get('current_stock', 0) or 0))
+    
+    # Enrich with vendor name/email
+    consolidated = []
+    for (_, _), g in grouped.items():
+        vendor = find_vendor_by_id(db, g['vendor_id']) if g['vendor_id'] else None
+        consolidated.append({
+            **g,
+            'vendor': vendor['vendor_name'] if vendor else 'No vendor found',
+            'vendor_email': vendor['email'] if vendor else 'N/A',
+        })
+    return consolidated
+
+
+def send_bulk_orders_grouped(db, grouped_orders, fingerprint=None, on_duplicate="skip"):
+    """Send one email per (vendor_id, product_id) with consolidated shortage.
+
+    Orders already sent for the same demand `fingerprint` within the dedup window are
+    skipped (or, with on_duplicate="top_up", only the extra quantity is sent).
+    """
+    sendable = [go for go in grouped_orders if go.get('vendor_id')]
+    claims, duplicates = claim_orders(db, sendable, fingerprint, on_duplicate)
+    claim_for = {id(go): claims.get(i) for i, go in enumerate(sendable)}
+    duplicate_for = {id(go): duplicates.get(i) for i, go in enumerate(sendable)}
+    
+    results = []
+    attempted = []
+    pending = []  # (result index, attempted index, vendor, order) sent together below
+    for go in grouped_orders:
+        if not go.get('vendor_id'):
+            results.append({
+                'product_id': go['product_id'],
+                'product_name': go['product_name'],
+                'shortage': go['shortage'],
+                'vendor': 'No vendor found',
+                'vendor_email': 'N/A',
+                'result': 'Error: Missing vendor_id'
+            })
+            continue
+        if duplicate_for[id(go)] is not None:
+            results.append({
+                'product_id': go['product_id'],
+                'product_name': go['product_name'],
+                'shortage': go['shortage'],
+                'vendor': go.get('vendor', ''),
+                'vendor_email': go.get('vendor_email', ''),
+                'result': duplicate_message(duplicate_for[id(go)])
+            })
+            continue
+        claim = claim_for[id(go)]
+        vendor = find_vendor_by_id(db, go['vendor_id'])
+        if not vendor:
+            attempted.append((claim, False))
+            results.append({
+                'product_id': go['product_id'],
+                'product_name': go['product_name'],
+                'shortage': go['shortage'],
+                'vendor': 'No vendor found',
+                'vendor_email': 'N/A',
+                'result': f"Error: No vendor found for vendor_id {go['vendor_id']}"
+            })
+            continue
+        order_payload = {
+            'store_id': '',
+            'product_id': go['product_id'],
+            'category': go.get('category', ''),
+            'product_name': go['product_name'],
+            'current_stock': go.get('current_stock', 0),
+            'demand': go.get('demand', 0),
+            'shortage': claim['quantity'],
+            'vendor_id': go['vendor_id'],
+        }
+        pending.append((len(results), len(attempted), vendor, order_payload))
+        attempted.append((claim, False))
+        results.append({
+            'product_id': go['product_id'],
+            'product_name': go['product_name'],
+            'shortage': claim['quantity'],
+            'vendor': vendor['vendor_name'],
+            'vendor_email': vendor['email'],
+            'result': None
+        })
+    sent = send_order_emails([(vendor, order_payload) for _, _, vendor, order_payload in pending])
+    for (i, j, _, _), result_msg in zip(pending, sent):
+        results[i]['result'] = result_msg
+        attempted[j] = (attempted[j][0], result_msg == "Sent")
+    if attempted:
+        complete_claims(db, [c for c, _ in attempted], [ok for _, ok in attempted])
+    reserve_sent(db, results)
+    return results
+
+
+def queue_orders_to_outbox(db, grouped_orders, outbox_dir):
+    """Write one .eml file per grouped order instead of sending, for a later SMTP run"""
+    outbox = Path(outbox_dir)
+    outbox.mkdir(parents=True, exist_ok=True)
+    sender_from = sender_address()
+    results = []
+    for go in grouped_orders:
+        vendor = find_vendor_by_id(db, go['vendor_id']) if go.get('vendor_id') else None
+        if not vendor:
+            result_msg = f"Error: No vendor found for vendor_id {go.get('vendor_id', '')}"
+        else:
+            mail = order_mail(vendor, go)
+            path = outbox / f"{go['vendor_id']}_{go['product_id']}.eml"
+            path.write_bytes(order_template(sender_from).render(mail.to, mail.fields, linesep="\n"))
+            result_msg = f"Queued: {path}"
+        results.append({
+            'product_id': go['product_id'],
+            'product_name': go['product_name'],
+            'shortage': go['shortage'],
+            'vendor': vendor['vendor_name'] if vendor else 'No vendor found',
+            'vendor_email': vendor['email'] if vendor else 'N/A',
+            'result': result_msg
+        })
+    return results
@@ -0,0 +1,58 @@
+# pipeline/paging.py
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+
+PAGE_SIZES = (25, 50, 100, 500)
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    return pd.Series(["" if v is None or pd.isna(v) else str(v) for v in values], dtype=object)
+
+
+def filter_positions(df: pd.DataFrame, query: str) -> np.ndarray:
+    """Row positions whose text in any column contains `query` (case-insensitive)"""
+    query = (query or "").strip().lower()
+    if not query:
+        return np.arange(len(df))
+    hit = np.zeros(len(df), dtype=bool)
+    for name in df.columns:
+        # Test each distinct value once, then spread the result over the rows by code
+        codes, uniques = pd.factorize(df[name])
+        matches = _as_text(uniques).str.lower().str.contains(query, regex=False).to_numpy(dtype=bool)
+        hit |= np.append(matches, False)[codes]
+    return np.flatnonzero(hit)
+
+
+def sort_positions(df: pd.DataFrame, positions: np.ndarray, column: Optional[str],
+                   ascending: bool = True) -> np.ndarray:
+    """`positions` ordered by `column` (stable, blanks last); file order without a column"""
+    if not column or column not in df.columns or not len(positions):
+        return positions
+    codes, uniques = pd.factorize(df[column].iloc[positions])
+    try:
+        order = np.argsort(uniques, kind="stable")
+    except TypeError:
+        # Mixed types (numbers next to text) sort by their text
+        order = np.argsort(_as_text(uniques).to_numpy(dtype=str), kind="stable")
+    rank = np.empty(len(uniques) + 1, dtype=np.int64)
+    rank[order] = np.arange(len(uniques)) if ascending else np.arange(len(uniques))[::-1]
+    rank[-1] = len(uniques)
+    return positions[np.argsort(rank[codes], kind="stable")]
+
+
+def table_view(df: pd.DataFrame, query: str = "", sort_by: Optional[str] = None,
+               ascending: bool = True) -> np.ndarray:
+    """Row positions of `df` after filtering and sorting; pair with page_frame to slice a window"""
+    return sort_positions(df, filter_positions(df, query), sort_by, ascending)
+
+
+def page_count(rows: int, page_size: int) -> int:
+    return max(1, -(-rows // page_size))
+
+
+def page_frame(df: pd.DataFrame, positions: np.ndarray, page: int, page_size: int) -> pd.DataFrame:
+    """The rows of one page (1-based) of a view; only these are copied"""
+    start = (max(page, 1) - 1) * page_size
+    return df.iloc[positions[start:start + page_size]]
@@ -0,0 +1,111 @@
+# pipeline/ranking.py
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+
+# Orderings for shortage lists: largest absolute shortage, largest share of demand that is
+# short, or vendor by vendor (the vendor with the most units short first)
+RANKINGS = {
+    "shortage": "Largest shortage",
+    "shortage_ratio": "Shortage relative to demand",
+    "vendor": "Vendor (most units short first)",
+}
+
+
+def _int_column(orders: Sequence[Dict], field: str) -> np.ndarray:
+    return np.fromiter((int(o.get(field, 0) or 0) for o in orders), dtype=np.int64, count=len(orders))
+
+
+def _smallest(keys: Sequence[np.ndarray], candidates: np.ndarray, k: int) -> np.ndarray:
+    """The k candidates that come first by `keys` (lexicographic), ties broken by position.
+
+    Each key level is one np.partition over the remaining candidates; only the values tied
+    at the cut move on to the next key, so nothing is fully sorted. `candidates` is kept
+    in ascending order, which makes the final tie-break simply "earliest first".
+    """
+    if k >= len(candidates):
+        return candidates
+    if k <= 0:
+        return candidates[:0]
+    if not keys:
+        return candidates[:k]
+    values = keys[0][candidates]
+    cut = np.partition(values, k - 1)[k - 1]
+    before = candidates[values < cut]
+    tied = candidates[values == cut]
+    return np.concatenate([before, _smallest(keys[1:], tied, k - len(before))])
+
+
+class ShortageRanking:
+    """Priority order over a list of shortages (orders_to_send or grouped vendor orders).
+
+    Fields are pulled into arrays once; top() then picks any page of the ranking by
+    partial selection (np.partition), O(n) per call, and sorts only the rows it returns.
+    """
+
+    def __init__(self, orders: Sequence[Dict]):
+        self.orders = orders
+        self.shortage = _int_column(orders, "shortage")
+        self.demand = _int_column(orders, "demand")
+        self.vendor_ids = np.array([str(o.get("vendor_id", "") or "") for o in orders], dtype=object)
+        self._keys: Dict[str, List[np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def ratio(self) -> np.ndarray:
+        """Share of demand that is short; 1.0 when there is a shortage but no recorded demand"""
+        ratio = np.ones(len(self), dtype=np.float64)
+        np.divide(self.shortage, self.demand, out=ratio, where=self.demand > 0)
+        return np.where(self.shortage > 0, ratio, 0.0)
+
+    def _vendor_rank(self) -> np.ndarray:
+        """Rank of each row's vendor: most units short first, then vendor_id; no vendor last"""
+        vendors, inverse = np.unique(self.vendor_ids.astype(str), return_inverse=True)
+        totals = np.bincount(inverse, weights=self.shortage, minlength=len(vendors))
+        order = np.lexsort((vendors, -totals, vendors == ""))
+        rank = np.empty(len(vendors), dtype=np.int64)
+        rank[order] = np.arange(len(vendors))
+        return rank[inverse]
+
+    def keys(self, by: str) -> List[np.ndarray]:
+        """Ascending sort keys, most significant first, for a ranking in RANKINGS"""
+        if by not in RANKINGS:
+            raise ValueError(f"Unknown ranking '{by}'; expected one of {', '.join(RANKINGS)}")
+        if by not in self._keys:
+            if by == "shortage":
+                self._keys[by] = [-self.shortage]
+            elif by == "shortage_ratio":
+                self._keys[by] = [-self.ratio(), -self.shortage]
+            else:
+                self._keys[by] = [self._vendor_rank(), -self.shortage]
+        return self._keys[by]
+
+    def top(self, by: str = "shortage", limit: Optional[int] = None, offset: int = 0) -> np.ndarray:
+        """Positions of ranks offset+1 .. offset+limit (all remaining without a limit), in order"""
+        offset = max(0, offset)
+        end = len(self) if limit is None else min(len(self), offset + max(0, limit))
+        if end <= offset:
+            return np.empty(0, dtype=np.int64)
+        keys = self.keys(by)
+        everything = np.arange(len(self))
+        chosen = _smallest(keys, everything, end)
+        if offset:
+            # Deep pages: drop the first `offset` ranks (a second selection) so only the page is sorted
+            earlier = np.zeros(len(self), dtype=bool)
+            earlier[_smallest(keys, everything, offset)] = True
+            chosen = chosen[~earlier[chosen]]
+        # np.lexsort takes the most significant key last; position breaks remaining ties
+        return chosen[np.lexsort([chosen] + [key[chosen] for key in reversed(keys)])]
+
+    def page(self, by: str = "shortage", limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Orders ranked offset+1 .. offset+limit, each with its 1-based `rank`"""
+        positions = self.top(by, limit, offset)
+        return [{"rank": offset + i + 1, **self.orders[p]} for i, p in enumerate(positions.tolist())]
+
+
+def rank_shortages(orders: Sequence[Dict], by: str = "shortage", limit: Optional[int] = None,
+                   offset: int = 0) -> Tuple[List[Dict], int]:
+    """One priority-ordered page of `orders` and the total number of orders"""
+    ranking = ShortageRanking(orders)
+    return ranking.page(by, limit, offset), len(ranking)
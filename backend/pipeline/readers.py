@@ -0,0 +1,210 @@
+# pipeline/readers.py
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from config.settings import settings
+
+
+EXCEL_SUFFIXES = (".xlsx", ".xlsm", ".xls")
+CSV_SUFFIXES = (".csv",)
+
+BATCH_ROWS = 50000
+
+# Column types: "text" becomes str (missing cells stay NaN), "number" goes through
+# pd.to_numeric (integral columns come back as int64), "date" becomes datetime64 (NaT when
+# unparseable) and None keeps whatever the engine parsed
+TEXT, NUMBER, DATE = "text", "number", "date"
+
+DEMAND_SCHEMA = {
+    "store_id": TEXT, "product_id": TEXT, "Category": TEXT, "product_name": TEXT,
+    # Coerced by pipeline.validation, which reports bad cells instead of failing the file
+    "demand": None, "sales": None,
+    # Dating columns used by the demand history (see pipeline.history.DATE_COLUMNS)
+    "date": DATE, "Date": DATE, "month": DATE, "Month": DATE, "period": DATE,
+}
+STOCK_SCHEMA = {"product_id": TEXT, "Category_name": TEXT, "product_name": TEXT, "vendor_id": TEXT, "stock": NUMBER}
+VENDOR_SCHEMA = {"vendor_id": TEXT, "vendor_name": TEXT, "Location": TEXT, "email": TEXT, "contact": TEXT}
+WAREHOUSE_SCHEMA = {"warehouse_id": TEXT, "warehouse_name": TEXT, "Location": TEXT, "latitude": NUMBER, "longitude": NUMBER}
+WAREHOUSE_STOCK_SCHEMA = {"warehouse_id": TEXT, "product_id": TEXT, "stock": NUMBER}
+
+EXCEL_ENGINES = ("calamine", "openpyxl", "pandas")
+
+
+class UnsupportedFileError(ValueError):
+    """Raised for files that are neither CSV nor Excel"""
+
+
+def calamine_available() -> bool:
+    try:
+        import python_calamine  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_engine(file_name: str, engine: Optional[str] = None) -> str:
+    """Pick an Excel engine: EXCEL_ENGINE ("auto" by default) prefers calamine, then openpyxl streaming.
+
+    Legacy .xls files are not readable by openpyxl and go through pandas without calamine.
+    """
+    engine = engine or settings.EXCEL_ENGINE
+    if engine == "auto":
+        if calamine_available():
+            return "calamine"
+        return "pandas" if file_name.lower().endswith(".xls") else "openpyxl"
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"Unknown Excel engine '{engine}'")
+    return engine
+
+
+def _cell_text(value) -> Optional[str]:
+    """Text of a cell as pandas would show it: integral floats without '.0', blanks as None"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _number(values: pd.Series, name: str) -> pd.Series:
+    try:
+        numbers = pd.to_numeric(values)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Column '{name}': {e}") from None
+    if numbers.dtype.kind == "f" and numbers.notna().all() and (numbers % 1 == 0).all():
+        numbers = numbers.astype("int64")
+    return numbers
+
+
+def apply_schema(frame: pd.DataFrame, schema: Optional[Dict[str, Optional[str]]]) -> pd.DataFrame:
+    """Cast known columns in place of pandas' per-file type guessing"""
+    for name, kind in (schema or {}).items():
+        if name not in frame.columns:
+            continue
+        if kind == TEXT:
+            # Convert each distinct value once; missing cells (code -1) stay NaN
+            codes, uniques = pd.factorize(frame[name])
+            texts = np.array([_cell_text(v) for v in uniques] + [None], dtype=object)
+            texts[np.equal(texts, None)] = np.nan
+            frame[name] = pd.Series(texts[codes], index=frame.index, dtype=object)
+        elif kind == NUMBER:
+            frame[name] = _number(frame[name], name)
+        elif kind == DATE:
+            frame[name] = pd.to_datetime(frame[name], errors="coerce")
+    return frame
+
+
+def _header(cells: Sequence) -> List[str]:
+    """Column names like pandas: blanks become 'Unnamed: i', repeats get '.1', '.2', ..."""
+    names, seen = [], {}
+    for i, cell in enumerate(cells):
+        name = f"Unnamed: {i}" if cell is None or cell == "" else str(cell)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(f"{name}.{count}" if count else name)
+    return names
+
+
+def _openpyxl_rows(source) -> Iterator[Sequence]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _calamine_rows(source) -> Iterator[Sequence]:
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_object(source)
+    yield from workbook.get_sheet_by_index(0).iter_rows()
+
+
+_ROW_READERS: Dict[str, Callable[..., Iterator[Sequence]]] = {
+    "openpyxl": _openpyxl_rows,
+    "calamine": _calamine_rows,
+}
+
+
+def _excel_batches(source, engine: str, schema: Optional[Dict], batch_rows: int) -> Iterator[pd.DataFrame]:
+    """Stream the first sheet row by row, keeping only schema columns, `batch_rows` rows at a time"""
+    rows = iter(_ROW_READERS[engine](source))
+    header = _header(next(rows, ()))
+    keep = [i for i, name in enumerate(header) if schema is None or name in schema]
+    columns = [header[i] for i in keep]
+    width = len(header)
+
+    def frame(batch: List[List]) -> pd.DataFrame:
+        return apply_schema(pd.DataFrame(dict(zip(columns, batch)), columns=columns), schema)
+
+    batch: List[List] = [[] for _ in keep]
+    filled, emitted = 0, False
+    for row in rows:
+        # Fully blank rows are skipped, as pandas does
+        if all(cell is None or cell == "" for cell in row):
+            continue
+        if len(row) < width:
+            row = tuple(row) + (None,) * (width - len(row))
+        for values, i in zip(batch, keep):
+            cell = row[i]
+            values.append(None if cell == "" else cell)
+        filled += 1
+        if filled == batch_rows:
+            yield frame(batch)
+            batch, filled, emitted = [[] for _ in keep], 0, True
+    if filled or not emitted:
+        yield frame(batch)
+
+
+def _projection(schema: Optional[Dict]):
+    return None if schema is None else (lambda name: name in schema)
+
+
+def _text_dtypes(schema: Optional[Dict]) -> Optional[Dict[str, type]]:
+    return None if schema is None else {name: str for name, kind in schema.items() if kind == TEXT}
+
+
+def _pandas_excel_batches(source, schema: Optional[Dict], batch_rows: int) -> Iterator[pd.DataFrame]:
+    frame = pd.read_excel(source, usecols=_projection(schema), dtype=_text_dtypes(schema))
+    # Blank rows inside the sheet are dropped, as the streaming engines do
+    frame = apply_schema(frame.dropna(how="all").reset_index(drop=True), schema)
+    for start in range(0, max(len(frame), 1), batch_rows):
+        yield frame.iloc[start:start + batch_rows].reset_index(drop=True)
+
+
+def _csv_batches(source, schema: Optional[Dict], batch_rows: int) -> Iterator[pd.DataFrame]:
+    reader = pd.read_csv(source, usecols=_projection(schema), dtype=_text_dtypes(schema), chunksize=batch_rows)
+    with reader:
+        for chunk in reader:
+            yield apply_schema(chunk.reset_index(drop=True), schema)
+
+
+def iter_table_batches(source, file_name: str, schema: Optional[Dict[str, Optional[str]]] = None,
+                       batch_rows: int = BATCH_ROWS, engine: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """Yield a CSV or Excel file (path, buffer or Streamlit UploadedFile) as DataFrame batches.
+
+    With a schema, only its columns are read and each is cast to its declared type;
+    without one every column is kept with the types the engine parsed.
+    """
+    name = file_name.lower()
+    if name.endswith(CSV_SUFFIXES):
+        yield from _csv_batches(source, schema, batch_rows)
+    elif name.endswith(EXCEL_SUFFIXES):
+        engine = resolve_engine(name, engine)
+        if engine == "pandas":
+            yield from _pandas_excel_batches(source, schema, batch_rows)
+        else:
+            yield from _excel_batches(source, engine, schema, batch_rows)
+    else:
+        raise UnsupportedFileError("Unsupported file format. Please upload CSV or Excel files.")
+
+
+def read_table(source, file_name: str, schema: Optional[Dict[str, Optional[str]]] = None,
+               engine: Optional[str] = None) -> pd.DataFrame:
+    """Whole file as one DataFrame (see iter_table_batches)"""
+    batches = list(iter_table_batches(source, file_name, schema, engine=engine))
+    if len(batches) == 1:
+        return batches[0]
+    return pd.concat(batches, ignore_index=True)
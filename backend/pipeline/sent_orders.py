@@ -0,0 +1,188 @@
+# pipeline/sent_orders.py
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence, Tuple
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert
+from database.models import SentOrder, engine
+from config.settings import settings
+
+
+DUPLICATE_POLICIES = ("skip", "top_up")
+
+# Keys per IN (...) lookup; 4 bound parameters each stays under SQLite's variable limit
+LOOKUP_BATCH = 5000
+
+_table_ready = False
+
+Key = Tuple[str, str, str, int]
+
+
+def _ensure_table() -> None:
+    global _table_ready
+    if not _table_ready:
+        SentOrder.__table__.create(bind=engine, checkfirst=True)
+        _table_ready = True
+
+
+def current_window(now: Optional[float] = None) -> int:
+    """Index of the dedup window containing `now` (epoch seconds)"""
+    span = max(1.0, settings.PO_DEDUP_WINDOW_HOURS * 3600)
+    return int((time.time() if now is None else now) // span)
+
+
+def order_fingerprint(order: Dict) -> str:
+    """Key for an order sent without a demand fingerprint.
+
+    Only vendor and product: a shortage that grew must still match the earlier PO, so the
+    duplicate policy (skip or top_up) decides what is sent.
+    """
+    raw = f"{order.get('vendor_id', '')}|{order.get('product_id', '')}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def find_sent_orders(db, keys: Sequence[Key]) -> Dict[Key, Dict]:
+    """Look up (vendor_id, product_id, fingerprint, window) keys with one indexed IN query"""
+    _ensure_table()
+    found: Dict[Key, Dict] = {}
+    keys = list(dict.fromkeys(keys))
+    for start in range(0, len(keys), LOOKUP_BATCH):
+        rows = db.execute(
+            select(SentOrder.id, SentOrder.vendor_id, SentOrder.product_id, SentOrder.fingerprint,
+                   SentOrder.window, SentOrder.quantity, SentOrder.status, SentOrder.sent_at)
+            .where(tuple_(SentOrder.vendor_id, SentOrder.product_id, SentOrder.fingerprint,
+                          SentOrder.window).in_(keys[start:start + LOOKUP_BATCH]))
+        )
+        for row in rows:
+            found[(row.vendor_id, row.product_id, row.fingerprint, row.window)] = {
+                "id": row.id, "quantity": int(row.quantity or 0),
+                "status": row.status, "sent_at": row.sent_at,
+            }
+    return found
+
+
+def claim_orders(db, orders: Sequence[Dict], fingerprint: Optional[str] = None,
+                 on_duplicate: str = "skip", now: Optional[float] = None) -> Tuple[Dict[int, Dict], Dict[int, Dict]]:
+    """Reserve the right to send each order before any email goes out.
+
+    Returns (claims, duplicates), both keyed by the order's position. A claim says which
+    quantity to send. A duplicate carries the earlier record it matched. An order is a
+    duplicate when the same (vendor, product, fingerprint) was recorded in this window or
+    the previous one. With on_duplicate="top_up", a larger shortage sends only the difference.
+    Claims are written with INSERT .. ON CONFLICT DO NOTHING, so two sessions sending the
+    same batch at once cannot both win. A claim left pending for PO_CLAIM_TIMEOUT_SECONDS
+    (its sender died before completing it) is expired and taken over by compare-and-set on
+    its status and claim time.
+    """
+    if on_duplicate not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy '{on_duplicate}'")
+    _ensure_table()
+    window = current_window(now)
+    sent_at = datetime.utcnow() if now is None else datetime.utcfromtimestamp(now)
+    expired_before = sent_at - timedelta(seconds=settings.PO_CLAIM_TIMEOUT_SECONDS)
+
+    keyed = []
+    for position, order in enumerate(orders):
+        fp = fingerprint or order_fingerprint(order)
+        base = (str(order.get('vendor_id', '')), str(order.get('product_id', '')), fp)
+        keyed.append((position, order, base))
+    existing = find_sent_orders(db, [base + (w,) for _, _, base in keyed for w in (window, window - 1)])
+
+    claims: Dict[int, Dict] = {}
+    duplicates: Dict[int, Dict] = {}
+    new_rows = []
+    batch_keys = {}
+    try:
+        for position, order, base in keyed:
+            shortage = int(order.get('shortage', 0) or 0)
+            previous = existing.get(base + (window,)) or existing.get(base + (window - 1,))
+            if previous is None and base in batch_keys:
+                # Same key twice in one batch: only the first one is sent
+                duplicates[position] = {"id": None, "quantity": batch_keys[base], "status": "pending",
+                                        "sent_at": sent_at}
+            elif previous is None:
+                batch_keys[base] = shortage
+                new_rows.append((position, shortage, {
+                    "vendor_id": base[0], "product_id": base[1], "fingerprint": base[2],
+                    "window": window, "quantity": shortage, "status": "pending", "sent_at": sent_at,
+                }))
+            elif previous["status"] == "pending" and previous["sent_at"] < expired_before:
+                claimed = db.execute(
+                    update(SentOrder)
+                    .where(SentOrder.id == previous["id"], SentOrder.status == "pending",
+                           SentOrder.sent_at == previous["sent_at"])
+                    .values(quantity=shortage, sent_at=sent_at)
+                ).rowcount
+                if claimed:
+                    claims[position] = {"id": previous["id"], "quantity": shortage, "previous_quantity": None,
+                                        "claimed_at": sent_at}
+                else:
+                    duplicates[position] = previous
+            elif on_duplicate == "top_up" and shortage > previous["quantity"]:
+                # Compare-and-set so a concurrent top-up of the same record loses cleanly
+                claimed = db.execute(
+                    update(SentOrder)
+                    .where(SentOrder.id == previous["id"], SentOrder.quantity == previous["quantity"])
+                    .values(quantity=shortage, sent_at=sent_at)
+                ).rowcount
+                if claimed:
+                    claims[position] = {"id": previous["id"], "quantity": shortage - previous["quantity"],
+                                        "previous_quantity": previous["quantity"], "claimed_at": sent_at}
+                else:
+                    duplicates[position] = previous
+            else:
+                duplicates[position] = previous
+
+        if new_rows:
+            inserted = db.execute(
+                insert(SentOrder).on_conflict_do_nothing(
+                    index_elements=["vendor_id", "product_id", "fingerprint", "window"]
+                ).returning(SentOrder.id, SentOrder.vendor_id, SentOrder.product_id, SentOrder.fingerprint),
+                [row for _, _, row in new_rows]
+            ).all()
+            ids = {(r.vendor_id, r.product_id, r.fingerprint): r.id for r in inserted}
+            for position, shortage, row in new_rows:
+                claim_id = ids.get((row["vendor_id"], row["product_id"], row["fingerprint"]))
+                if claim_id is None:
+                    # Another session claimed it between our lookup and insert
+                    duplicates[position] = {"id": None, "quantity": shortage, "status": "pending", "sent_at": sent_at}
+                else:
+                    claims[position] = {"id": claim_id, "quantity": shortage, "previous_quantity": None,
+                                        "claimed_at": sent_at}
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return claims, duplicates
+
+
+def complete_claims(db, claims: Sequence[Dict], sent: Sequence[bool]) -> None:
+    """Mark claims whose email went out as sent and release the others.
+
+    Rows are matched on id and claim time, so a claim that expired and was taken over by
+    another sender is left to its new owner.
+    """
+    key = tuple_(SentOrder.id, SentOrder.sent_at)
+    done = [(c["id"], c["claimed_at"]) for c, ok in zip(claims, sent) if ok]
+    released = [(c["id"], c["claimed_at"]) for c, ok in zip(claims, sent) if not ok and c["previous_quantity"] is None]
+    reverted = [c for c, ok in zip(claims, sent) if not ok and c["previous_quantity"] is not None]
+    try:
+        if done:
+            db.execute(update(SentOrder).where(key.in_(done)).values(status="sent"))
+        if released:
+            db.execute(delete(SentOrder).where(key.in_(released)))
+        for claim in reverted:
+            db.execute(update(SentOrder).where(SentOrder.id == claim["id"], SentOrder.sent_at == claim["claimed_at"])
+                       .values(quantity=claim["previous_quantity"]))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def duplicate_message(previous: Dict) -> str:
+    sent_at = previous.get("sent_at")
+    when = f" at {sent_at:%Y-%m-%d %H:%M} UTC" if isinstance(sent_at, datetime) else ""
+    state = "in progress" if previous.get("status") == "pending" else "sent"
+    return f"Skipped: duplicate of PO already {state}{when} ({previous.get('quantity', 0)} units)"
@@ -0,0 +1,115 @@
+# pipeline/sharding.py
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+import pandas as pd
+from pipeline.allocation import demand_frame, group_demand, STORE_KEYS
+from pipeline.demand import PRODUCT_KEYS, evaluate_demand, merge_aggregates, _no_progress
+from pipeline.readers import DEMAND_SCHEMA, iter_table_batches
+from pipeline.validation import SeenRows, ValidationReport, validate_demand
+
+
+DEMAND_SUFFIXES = (".csv", ".xlsx", ".xls")
+
+# A shard is either a path on disk or an in-memory (file_name, bytes) pair
+Shard = Union[str, Tuple[str, bytes]]
+
+
+def collect_demand_sources(sources) -> List[Shard]:
+    """Expand files, directories and uploaded buffers into an ordered list of shards.
+
+    Directories contribute their demand files sorted by name so results are deterministic.
+    """
+    if isinstance(sources, (str, os.PathLike)) or hasattr(sources, "getvalue"):
+        sources = [sources]
+
+    shards: List[Shard] = []
+    for source in sources:
+        if hasattr(source, "getvalue"):
+            shards.append((source.name, source.getvalue()))
+            continue
+        path = Path(source)
+        if path.is_dir():
+            shards.extend(
+                str(p) for p in sorted(path.iterdir())
+                if p.is_file() and p.suffix.lower() in DEMAND_SUFFIXES
+            )
+        else:
+            shards.append(str(path))
+    return shards
+
+
+def aggregate_shard(shard: Shard, with_stores: bool = False
+                    ) -> Tuple[pd.DataFrame, Optional[pd.DataFrame], int, ValidationReport]:
+    """Worker: parse and validate one shard batch by batch, pre-aggregating it per product (and per store if requested)"""
+    if isinstance(shard, tuple):
+        file_name, payload = shard
+        batches = iter_table_batches(io.BytesIO(payload), file_name, DEMAND_SCHEMA)
+    else:
+        file_name = Path(shard).name
+        batches = iter_table_batches(shard, shard, DEMAND_SCHEMA)
+    partials, store_partials, rows, report = [], [], 0, ValidationReport()
+    # Row hashes of earlier batches, so duplicate rows are found across the whole file
+    seen = SeenRows()
+    for batch in batches:
+        clean, batch_report = validate_demand(batch, first_row=rows + 1, seen=seen)
+        batch_report.rows.insert(0, "file", file_name)
+        report = report.merge(batch_report)
+        frame = demand_frame(clean)
+        partials.append(group_demand(frame, PRODUCT_KEYS))
+        if with_stores:
+            store_partials.append(group_demand(frame, STORE_KEYS))
+        rows += len(batch)
+    store_rows = merge_aggregates(store_partials, STORE_KEYS) if with_stores else None
+    return merge_aggregates(partials), store_rows, rows, report
+
+
+def aggregate_shards(shards: Sequence[Shard], max_workers: Optional[int] = None, with_stores: bool = False,
+                     progress: Callable[..., None] = _no_progress
+                     ) -> Tuple[pd.DataFrame, Optional[pd.DataFrame], int, ValidationReport]:
+    """Pre-aggregate shards in a process pool and merge the partial per-key sums.
+
+    Partials are merged in shard order, so the result is identical to aggregating the
+    concatenated files in a single pass regardless of the number of workers. Rows rejected
+    by validation are collected into one report (row numbers count within each file).
+    """
+    if not shards:
+        raise ValueError("No demand files found")
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(shards)))
+
+    partials, store_partials, rows_parsed, report = [], [], 0, ValidationReport()
+
+    def _collect(outputs):
+        nonlocal rows_parsed, report
+        for aggregated, store_rows, rows, shard_report in outputs:
+            partials.append(aggregated)
+            store_partials.append(store_rows)
+            rows_parsed += rows
+            report = report.merge(shard_report)
+            progress(rows_parsed=rows_parsed, keys_aggregated=sum(len(p) for p in partials))
+
+    if workers == 1:
+        _collect(aggregate_shard(shard, with_stores) for shard in shards)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # map yields in submission order, which keeps the merge deterministic
+            _collect(pool.map(aggregate_shard, shards, [with_stores] * len(shards)))
+
+    aggregated = merge_aggregates(partials)
+    store_rows = merge_aggregates(store_partials, STORE_KEYS) if with_stores else None
+    return aggregated, store_rows, rows_parsed, report
+
+
+def process_demand_sources(sources, db, store_mode: Optional[str] = None,
+                           store_priority: Optional[Sequence[str]] = None, max_workers: Optional[int] = None,
+                           progress: Callable[..., None] = _no_progress) -> Dict:
+    """Process several demand files (or a directory of them) as one combined upload"""
+    aggregated, store_rows, rows_parsed, report = aggregate_shards(
+        collect_demand_sources(sources), max_workers, bool(store_mode), progress
+    )
+    result = evaluate_demand(aggregated, db, rows_parsed, store_mode, store_priority, store_rows, progress)
+    result.update(report.to_dict())
+    return result
@@ -0,0 +1,451 @@
+# pipeline/snapshot.py
+import json
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from config.settings import settings
+from database.models import STOCK_GENERATION, InventoryData, StockLevel, get_generations
+from pipeline.inventory import normalize_series, strip_series
+from pipeline.ledger import ensure_ledger_tables
+
+
+BUILD_CHUNK = 50000
+
+# Mixes the category code into the product-name hash
+_CATEGORY_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+# Published snapshots live in <SNAPSHOT_DIR>/gen-<generation>/; POINTER_FILE names the current one
+POINTER_FILE = "CURRENT"
+SNAPSHOT_FORMAT = 1
+
+ARRAY_NAMES = (
+    "product_id_data", "product_id_offsets", "product_name_data", "product_name_offsets",
+    "category_codes", "vendor_codes", "stock", "on_order", "category_norm_codes", "row_category",
+    "id_hashes", "id_order", "name_hashes", "name_order",
+)
+TABLE_NAMES = ("categories", "vendors", "category_norms")
+
+
+class InventoryItem(NamedTuple):
+    """One inventory row as returned by snapshot lookups"""
+    product_id: str
+    category_name: str
+    product_name: str
+    vendor_id: str
+    stock: int  # on hand: ledger snapshot, or the loaded stock before any ledger activity
+    on_order: int
+
+
+def _norm(text) -> str:
+    return str(text or '').strip().lower()
+
+
+def _encode(values: Iterable) -> Tuple[np.ndarray, List[str]]:
+    """Integer codes into a table of distinct, interned strings"""
+    table: Dict[str, int] = {}
+    codes = [table.setdefault(str(v or ''), len(table)) for v in values]
+    return np.asarray(codes, dtype=np.int32), [sys.intern(v) for v in table]
+
+
+def _hash(values) -> np.ndarray:
+    # Keys are mostly distinct, so skip the factorize step
+    return pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+
+
+class _StringColumn:
+    """UTF-8 strings packed into one byte array plus offsets, so the column can be memory-mapped"""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def pack(cls, values: Iterable) -> "_StringColumn":
+        encoded = [str(v or '').encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def take(self, rows: Iterable[int]) -> np.ndarray:
+        return np.array([self[r] for r in rows], dtype=object)
+
+    def to_numpy(self) -> np.ndarray:
+        return self.take(range(len(self)))
+
+
+class _HashIndex:
+    """Sorted 64-bit key hashes; a key resolves to the last row that has it"""
+
+    def __init__(self, hashes: np.ndarray, order: np.ndarray):
+        self.hashes = hashes
+        self.order = order
+
+    @classmethod
+    def build(cls, key_hashes: np.ndarray) -> "_HashIndex":
+        order = np.lexsort((np.arange(len(key_hashes)), key_hashes))
+        return cls(key_hashes[order], order)
+
+    def candidates(self, hashes: np.ndarray) -> np.ndarray:
+        """Last row whose key hash equals each query hash, or -1"""
+        if not len(self.hashes):
+            return np.full(len(hashes), -1, dtype=np.int64)
+        pos = np.searchsorted(self.hashes, hashes, side="right") - 1
+        safe = np.maximum(pos, 0)
+        return np.where((pos >= 0) & (self.hashes[safe] == hashes), self.order[safe], -1)
+
+    def rows(self, key_hash) -> np.ndarray:
+        """All rows with this hash, last first (used to step past hash collisions)"""
+        lo = np.searchsorted(self.hashes, key_hash, side="left")
+        hi = np.searchsorted(self.hashes, key_hash, side="right")
+        return self.order[lo:hi][::-1]
+
+
+class InventorySnapshot:
+    """Read-only, array-backed inventory joined with on-hand/on-order stock.
+
+    Product ids and names are packed UTF-8 columns. Categories and vendors are int32 codes
+    into small string tables, and quantities are int64 arrays. Keys are indexed as sorted
+    64-bit hashes instead of per-row dict entries; every hit is checked against the stored
+    strings. Repeated keys resolve to the last row, as with the dicts this replaces.
+
+    Every column is a flat array, so a snapshot saved with `save` can be opened memory-mapped
+    by any number of processes without copying or re-indexing it.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], tables: Dict[str, List[str]]):
+        self.product_ids = _StringColumn(arrays["product_id_data"], arrays["product_id_offsets"])
+        self.product_names = _StringColumn(arrays["product_name_data"], arrays["product_name_offsets"])
+        self.category_codes = arrays["category_codes"]
+        self.vendor_codes = arrays["vendor_codes"]
+        self.stock = arrays["stock"]
+        self.on_order = arrays["on_order"]
+        self.category_norm_codes = arrays["category_norm_codes"]
+        self._row_category = arrays["row_category"]
+        self._by_id = _HashIndex(arrays["id_hashes"], arrays["id_order"])
+        self._by_name = _HashIndex(arrays["name_hashes"], arrays["name_order"])
+        self.categories, self.vendors, self.category_norms = (tables[name] for name in TABLE_NAMES)
+        self._category_index = {name: code for code, name in enumerate(self.category_norms)}
+        self.path: Optional[Path] = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> "InventorySnapshot":
+        """Build from (product_id, category, product_name, vendor_id, stock, on_order) rows"""
+        # Transpose in chunks so only one chunk of row objects is alive at a time
+        columns: Tuple[List, ...] = ([], [], [], [], [], [])
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, BUILD_CHUNK))
+            if not chunk:
+                break
+            for column, values in zip(columns, zip(*chunk)):
+                column.extend(values)
+        product_ids, categories, names, vendors, stock, on_order = columns
+        product_ids = np.array([str(p or '') for p in product_ids], dtype=object)
+        names = np.array([str(n or '') for n in names], dtype=object)
+        category_codes, category_table = _encode(categories)
+        vendor_codes, vendor_table = _encode(vendors)
+
+        # Categories that differ only by case/whitespace share a normalized code
+        category_norm_codes, category_norms = _encode(_norm(c) for c in category_table)
+        row_category = category_norm_codes[category_codes]
+        id_index = _HashIndex.build(_hash(strip_series(pd.Series(product_ids))))
+        name_index = _HashIndex.build(cls._name_hashes(normalize_series(pd.Series(names)), row_category))
+        ids, product_names = _StringColumn.pack(product_ids), _StringColumn.pack(names)
+        arrays = {
+            "product_id_data": ids.data, "product_id_offsets": ids.offsets,
+            "product_name_data": product_names.data, "product_name_offsets": product_names.offsets,
+            "category_codes": category_codes, "vendor_codes": vendor_codes,
+            "stock": np.asarray([int(s or 0) for s in stock], dtype=np.int64),
+            "on_order": np.asarray([int(o or 0) for o in on_order], dtype=np.int64),
+            "category_norm_codes": category_norm_codes, "row_category": row_category,
+            "id_hashes": id_index.hashes, "id_order": id_index.order,
+            "name_hashes": name_index.hashes, "name_order": name_index.order,
+        }
+        return cls(arrays, {"categories": category_table, "vendors": vendor_table, "category_norms": category_norms})
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "product_id_data": self.product_ids.data, "product_id_offsets": self.product_ids.offsets,
+            "product_name_data": self.product_names.data, "product_name_offsets": self.product_names.offsets,
+            "category_codes": self.category_codes, "vendor_codes": self.vendor_codes,
+            "stock": self.stock, "on_order": self.on_order,
+            "category_norm_codes": self.category_norm_codes, "row_category": self._row_category,
+            "id_hashes": self._by_id.hashes, "id_order": self._by_id.order,
+            "name_hashes": self._by_name.hashes, "name_order": self._by_name.order,
+        }
+
+    def save(self, path: Path, **extra) -> None:
+        """Write one .npy file per array plus meta.json with the string tables (and any `extra` fields)"""
+        path.mkdir(parents=True, exist_ok=True)
+        for name, values in self._arrays().items():
+            np.save(path / f"{name}.npy", np.ascontiguousarray(values))
+        meta = {"format": SNAPSHOT_FORMAT, "rows": len(self), **extra}
+        meta.update({name: getattr(self, name) for name in TABLE_NAMES})
+        (path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    @classmethod
+    def open(cls, path: Path) -> "InventorySnapshot":
+        """Map a saved snapshot read-only; pages are shared with every other process mapping it"""
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+        arrays = {}
+        for name in ARRAY_NAMES:
+            try:
+                arrays[name] = np.load(path / f"{name}.npy", mmap_mode="r")
+            except ValueError:  # empty arrays cannot be mapped
+                arrays[name] = np.load(path / f"{name}.npy")
+        snapshot = cls(arrays, {name: meta[name] for name in TABLE_NAMES})
+        snapshot.path = path
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    @staticmethod
+    def _name_hashes(name_norms, category_codes: np.ndarray) -> np.ndarray:
+        return _hash(name_norms) ^ ((np.asarray(category_codes).astype(np.uint64) + np.uint64(1)) * _CATEGORY_MIX)
+
+    def _resolve(self, index: _HashIndex, hashes: np.ndarray, matches) -> np.ndarray:
+        """Verify hash candidates with `matches(rows, positions)`, stepping past collisions"""
+        rows = index.candidates(hashes)
+        hit = np.flatnonzero(rows >= 0)
+        bad = hit[~matches(rows[hit], hit)]
+        for position in bad:
+            rows[position] = next(
+                (r for r in index.rows(hashes[position]) if matches(np.array([r]), np.array([position]))[0]), -1
+            )
+        return rows
+
+    def match_rows(self, product_names: Sequence[str], categories: Sequence[str],
+                   product_ids: Optional[Sequence[str]] = None) -> np.ndarray:
+        """Row per query (or -1): normalized (name, category) first, then stripped product_id"""
+        names = normalize_series(pd.Series(list(product_names), dtype=object)).to_numpy()
+        codes = np.array([self._category_index.get(_norm(c), -1) for c in categories], dtype=np.int64)
+        rows = np.full(len(names), -1, dtype=np.int64)
+        known = np.flatnonzero(codes >= 0)
+        names, codes = names[known], codes[known]
+        rows[known] = self._resolve(self._by_name, self._name_hashes(names, codes), lambda r, q: (
+            (normalize_series(pd.Series(self.product_names.take(r))).to_numpy() == names[q])
+            & (self._row_category[r] == codes[q])
+        ))
+
+        if product_ids is not None:
+            missing = np.flatnonzero(rows < 0)
+            rows[missing] = self.rows_by_id(np.asarray(product_ids, dtype=object)[missing])
+        return rows
+
+    def rows_by_id(self, product_ids: Sequence[str]) -> np.ndarray:
+        """Row per stripped product_id (or -1; blank ids never match)"""
+        ids = strip_series(pd.Series(np.asarray(product_ids, dtype=object))).to_numpy()
+        rows = np.full(len(ids), -1, dtype=np.int64)
+        wanted = np.flatnonzero(ids != '')
+        ids = ids[wanted]
+        rows[wanted] = self._resolve(self._by_id, _hash(ids), lambda r, q: (
+            strip_series(pd.Series(self.product_ids.take(r))).to_numpy() == ids[q]
+        ))
+        return rows
+
+    def item(self, row: int) -> InventoryItem:
+        return InventoryItem(
+            self.product_ids[row], self.categories[self.category_codes[row]], self.product_names[row],
+            self.vendors[self.vendor_codes[row]], int(self.stock[row]), int(self.on_order[row])
+        )
+
+    # Single-key lookups: one hash, then plain string checks instead of the vectorized path
+
+    def find_by_id(self, product_id: Optional[str]) -> Optional[InventoryItem]:
+        key = str(product_id or '').strip()
+        if not key:
+            return None
+        for row in self._by_id.rows(_hash([key])[0]):
+            if self.product_ids[row].strip() == key:
+                return self.item(row)
+        return None
+
+    def find(self, product_name: str, category: str) -> Optional[InventoryItem]:
+        """Case-insensitive, trimmed match on (product_name, category)"""
+        code = self._category_index.get(_norm(category))
+        if code is None:
+            return None
+        name = _norm(product_name)
+        for row in self._by_name.rows(self._name_hashes([name], np.array([code]))[0]):
+            if self._row_category[row] == code and _norm(self.product_names[row]) == name:
+                return self.item(row)
+        return None
+
+    def match(self, product_name: str, category: str, product_id: Optional[str] = None) -> Optional[InventoryItem]:
+        """Match by name and category, falling back to product_id"""
+        return self.find(product_name, category) or self.find_by_id(product_id)
+
+    def stock_by_category(self) -> Dict[str, Tuple[str, int]]:
+        """{normalized category: (first non-empty display name, total on hand)}"""
+        totals = np.bincount(self._row_category, weights=self.stock, minlength=len(self.category_norms))
+        display: Dict[int, str] = {}
+        for raw, code in zip(self.categories, self.category_norm_codes.tolist()):
+            if raw and code not in display:
+                display[code] = raw
+        return {name: (display.get(code, ''), int(totals[code])) for code, name in enumerate(self.category_norms)}
+
+    def frame(self) -> pd.DataFrame:
+        """Columns product_id, category_name, product_name, vendor_id, stock, on_order; strings as categoricals"""
+        return pd.DataFrame({
+            "product_id": self.product_ids.to_numpy(),
+            "category_name": pd.Categorical.from_codes(self.category_codes, self.categories),
+            "product_name": self.product_names.to_numpy(),
+            "vendor_id": pd.Categorical.from_codes(self.vendor_codes, self.vendors),
+            "stock": np.asarray(self.stock),
+            "on_order": np.asarray(self.on_order),
+        })
+
+
+def load_inventory_snapshot(db) -> InventorySnapshot:
+    """Build a snapshot from one Core query over inventory joined with the stock levels"""
+    ensure_ledger_tables()
+    table = InventoryData.__table__
+    rows = db.execute(
+        select(
+            table.c.product_id, table.c.category_name, table.c.product_name, table.c.vendor_id,
+            func.coalesce(StockLevel.on_hand, table.c.stock), func.coalesce(StockLevel.on_order, 0)
+        ).outerjoin(StockLevel, StockLevel.product_id == func.trim(table.c.product_id))
+        .order_by(table.c.id)
+    )
+    return InventorySnapshot.from_rows(rows)
+
+
+def _generation_dir(root: Path, generation: int) -> Path:
+    return root / f"gen-{generation}"
+
+
+def _read_meta(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def current_generation(root: Path) -> Optional[int]:
+    """Generation named by the version pointer, or None if nothing was published yet"""
+    try:
+        name = (root / POINTER_FILE).read_text(encoding="utf-8").strip()
+        return int(name.rsplit("-", 1)[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+@contextmanager
+def _lock(root: Path, exclusive: bool):
+    """Publishers hold it exclusively so each generation is built once, not once per process"""
+    try:
+        import fcntl
+    except ImportError:  # not on POSIX; concurrent builds are still safe, only redundant
+        yield
+        return
+    with open(root / ".lock", "a+") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _point_to(root: Path, generation: int) -> None:
+    """Atomically swap the version pointer to `generation`, whichever way it moves.
+
+    A recreated database restarts its counters, so a lower generation is not an older one.
+    """
+    staging = root / f".{POINTER_FILE}.{os.getpid()}"
+    staging.write_text(_generation_dir(root, generation).name, encoding="utf-8")
+    os.replace(staging, root / POINTER_FILE)
+
+
+def _prune(root: Path, keep: Iterable[Optional[int]]) -> None:
+    """Remove every generation not in `keep`; open mappings stay valid until closed"""
+    kept = {_generation_dir(root, generation).name for generation in keep if generation is not None}
+    for path in root.glob("gen-*"):
+        if path.name not in kept:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def publish_snapshot(db, generation: int, root: Optional[Path] = None) -> InventorySnapshot:
+    """Build, write and point readers at the snapshot for `generation`, unless the pointer names it already.
+
+    The snapshot is written to a staging directory and renamed into place, then the
+    version pointer is swapped with os.replace, so readers never see a partial snapshot.
+    A directory for `generation` that the pointer does not name may come from a database
+    that was since recreated, so it is rebuilt rather than trusted.
+    """
+    root = Path(root or settings.SNAPSHOT_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    target = _generation_dir(root, generation)
+    with _lock(root, exclusive=True):
+        previous = current_generation(root)
+        if previous != generation or _read_meta(target) is None:
+            staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=root))
+            staging.chmod(0o755)  # readable by workers running as other users
+            try:
+                load_inventory_snapshot(db).save(staging, generation=generation)
+                shutil.rmtree(target, ignore_errors=True)
+                os.replace(staging, target)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            _point_to(root, generation)
+            # Keep the generation being replaced for readers that are still switching over
+            _prune(root, (generation, previous))
+        return InventorySnapshot.open(target)
+
+
+def open_current_snapshot(root: Optional[Path] = None) -> Optional[InventorySnapshot]:
+    """Map whatever generation the version pointer names, without touching the database"""
+    root = Path(root or settings.SNAPSHOT_DIR)
+    with _lock(root, exclusive=False):
+        generation = current_generation(root)
+        if generation is None:
+            return None
+        return InventorySnapshot.open(_generation_dir(root, generation))
+
+
+def _shared_snapshot(db, generation: int) -> InventorySnapshot:
+    root = Path(settings.SNAPSHOT_DIR)
+    if root.is_dir():
+        with _lock(root, exclusive=False):
+            target = _generation_dir(root, generation)
+            meta = _read_meta(target)
+            if current_generation(root) == generation and meta and meta.get("generation") == generation:
+                return InventorySnapshot.open(target)
+    return publish_snapshot(db, generation, root)
+
+
+_snapshot_cache: Dict[str, object] = {"generation": None, "snapshot": None}
+
+
+def get_inventory_snapshot(db) -> InventorySnapshot:
+    """Return the shared snapshot, remapping it only when the stock generation changes.
+
+    The first process to see a new generation publishes it under SNAPSHOT_DIR; every other
+    process maps the same files. Falls back to a private in-memory snapshot when the
+    directory is not writable.
+    """
+    generation = get_generations(db, (STOCK_GENERATION,))
+    if _snapshot_cache["generation"] != generation:
+        try:
+            snapshot = _shared_snapshot(db, generation[0])
+        except OSError:
+            snapshot = load_inventory_snapshot(db)
+        _snapshot_cache["snapshot"] = snapshot
+        _snapshot_cache["generation"] = generation
+    return _snapshot_cache["snapshot"]
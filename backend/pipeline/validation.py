@@ -0,0 +1,140 @@
+# pipeline/validation.py
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from pipeline.inventory import strip_series
+
+
+# Checks in report order; a rejected row is reported under the first one it fails
+REJECT_REASONS = ("non_numeric_demand", "negative_demand", "non_integer_demand", "blank_key", "duplicate_row")
+
+# Rejected rows kept per upload for results and reports; the counts always cover every row
+REPORT_ROWS = 1000
+
+
+class ValidationReport:
+    """Rejected-row counts per reason plus the first REPORT_ROWS rejected rows (with row number and reason)"""
+
+    def __init__(self, rows: Optional[pd.DataFrame] = None, by_reason: Optional[Dict[str, int]] = None,
+                 rejected: int = 0):
+        self.rows = rows if rows is not None else pd.DataFrame(columns=["row", "reason"])
+        self.by_reason = by_reason or {reason: 0 for reason in REJECT_REASONS}
+        self.rejected = rejected
+
+    def merge(self, other: "ValidationReport") -> "ValidationReport":
+        """Combine reports of consecutive batches or shards, keeping their order"""
+        rows = self.rows
+        if len(rows) < REPORT_ROWS and len(other.rows):
+            rows = pd.concat([rows, other.rows], ignore_index=True).head(REPORT_ROWS) if len(rows) else other.rows
+        by_reason = {reason: self.by_reason.get(reason, 0) + other.by_reason.get(reason, 0) for reason in REJECT_REASONS}
+        return ValidationReport(rows, by_reason, self.rejected + other.rejected)
+
+    def to_dict(self) -> Dict:
+        """Result fields: rows_rejected, rejected_by_reason and rejected_rows (JSON-safe records)"""
+        rows = self.rows.astype(object).where(self.rows.notna(), None)
+        return {
+            "rows_rejected": self.rejected,
+            "rejected_by_reason": dict(self.by_reason),
+            "rejected_rows": rows.to_dict("records"),
+        }
+
+
+def _factorize(df: pd.DataFrame, name: str) -> Tuple[np.ndarray, pd.Series]:
+    """Codes per row (-1 for missing cells) and the distinct values, so checks run once per value"""
+    if name not in df.columns:
+        return np.full(len(df), -1, dtype=np.intp), pd.Series([], dtype=object)
+    codes, uniques = pd.factorize(df[name])
+    return codes, pd.Series(uniques, dtype=object)
+
+
+def _blank(df: pd.DataFrame, name: str, codes: Dict[str, np.ndarray], uniques: Dict[str, pd.Series]) -> np.ndarray:
+    """Rows whose text in `name` is empty after stripping"""
+    codes[name], uniques[name] = _factorize(df, name)
+    blank = np.append(strip_series(uniques[name]).to_numpy() == "", True)
+    return blank[codes[name]]
+
+
+def _canonical(value) -> str:
+    """Distinct cell value as text, with numbers as floats: one batch may parse a column as
+    integers and the next as floats, like a whole-file read would"""
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return f"n:{float(value)!r}"
+    if isinstance(value, str):
+        return f"s:{value}"
+    return f"o:{value!r}"
+
+
+def _row_hashes(df: pd.DataFrame, codes: Dict[str, np.ndarray], uniques: Dict[str, pd.Series]) -> np.ndarray:
+    """64-bit hash of every row's values, comparable across batches of one file"""
+    columns = {}
+    for i, name in enumerate(df.columns):
+        texts = [_canonical(v) for v in uniques[name]] + ["missing"]
+        columns[i] = pd.util.hash_array(np.asarray(texts, dtype=object), categorize=False)[codes[name]]
+    return pd.util.hash_pandas_object(pd.DataFrame(columns, index=df.index), index=False).to_numpy()
+
+
+class SeenRows:
+    """Sorted hashes of the rows in earlier batches of one file"""
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def add(self, hashes: np.ndarray) -> np.ndarray:
+        """Which of `hashes` were seen before; then remember them all"""
+        found = np.minimum(np.searchsorted(self.hashes, hashes), max(len(self.hashes) - 1, 0))
+        repeated = self.hashes[found] == hashes if len(self.hashes) else np.zeros(len(hashes), dtype=bool)
+        self.hashes = np.union1d(self.hashes, hashes)
+        return repeated
+
+
+def validate_demand(df_demand: pd.DataFrame, first_row: int = 1,
+                    seen: Optional[SeenRows] = None) -> Tuple[pd.DataFrame, ValidationReport]:
+    """Split raw demand rows into clean rows and a rejected-rows report, column by column.
+
+    Demand is coerced to numbers. Rows are rejected when demand is non-numeric, negative or
+    fractional, when they have neither a product_id nor both product_name and Category, or when
+    they repeat an earlier row exactly. `first_row` is the `row` number of the first row in the
+    report. Batches of one file share SeenRows, so repeats are found across batches.
+
+    Every column is factorized once; each check then runs over distinct values and row codes.
+    """
+    codes: Dict[str, np.ndarray] = {}
+    uniques: Dict[str, pd.Series] = {}
+    codes["demand"], uniques["demand"] = _factorize(df_demand, "demand")
+    numbers = np.append(pd.to_numeric(uniques["demand"], errors="coerce").to_numpy(dtype=float), np.nan)
+    demand = numbers[codes["demand"]]
+    blank_key = _blank(df_demand, "product_id", codes, uniques) & (
+        _blank(df_demand, "product_name", codes, uniques) | _blank(df_demand, "Category", codes, uniques)
+    )
+    for name in df_demand.columns:
+        if name not in codes:
+            codes[name], uniques[name] = _factorize(df_demand, name)
+
+    hashes = _row_hashes(df_demand, codes, uniques)
+    duplicate = pd.Series(hashes).duplicated().to_numpy()
+    if seen is not None:
+        duplicate |= seen.add(hashes)
+    finite = np.isfinite(demand)
+    masks = [
+        ~finite & (codes["demand"] >= 0),
+        demand < 0,
+        finite & (demand != np.floor(demand)),
+        blank_key,
+        duplicate,
+    ]
+    rejected = np.logical_or.reduce(masks)
+
+    clean = df_demand[~rejected]
+    if "demand" in df_demand.columns:
+        clean = clean.assign(demand=demand[~rejected])
+    if not rejected.any():
+        return clean, ValidationReport()
+
+    # Each rejected row counts once, under the first reason it fails
+    reasons = np.select(masks, REJECT_REASONS, default="")
+    positions = np.flatnonzero(rejected)[:REPORT_ROWS]
+    rows = df_demand.iloc[positions].reset_index(drop=True)
+    rows.insert(0, "reason", reasons[positions])
+    rows.insert(0, "row", positions + first_row)
+    by_reason = {reason: int(np.count_nonzero(reasons == reason)) for reason in REJECT_REASONS}
+    return clean, ValidationReport(rows, by_reason, int(rejected.sum()))
@@ -0,0 +1,292 @@
+# pipeline/warehouses.py
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from config.settings import settings
+from database.models import (
+    SessionLocal, Warehouse, bump_generation, engine, ensure_generation_table, get_generations,
+    reload_tables, warehouse_stock_table
+)
+from pipeline.inventory import strip_series
+from pipeline.snapshot import get_inventory_snapshot
+
+
+EARTH_RADIUS_KM = 6371.0
+
+WAREHOUSE_COLUMNS = ["warehouse_id", "warehouse_name", "location", "latitude", "longitude"]
+TRANSFER_COLUMNS = ["product_id", "product_name", "from_warehouse", "from_location", "to_location",
+                    "distance_km", "available", "quantity"]
+
+_table_ready = False
+
+
+def ensure_warehouse_table() -> None:
+    global _table_ready
+    if not _table_ready:
+        ensure_generation_table()
+        Warehouse.__table__.create(bind=engine, checkfirst=True)
+        _table_ready = True
+
+
+def _norm(text) -> str:
+    return str(text or '').strip().lower()
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km (NaN where a coordinate is missing)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def rank_warehouses(warehouses: pd.DataFrame, local_location: str, max_km: float = 0) -> pd.DataFrame:
+    """Add distance_km from the local warehouse, `local`, `source` (may send transfers) and `rank`.
+
+    The local warehouse is the one at `local_location`. Rank orders warehouses nearest first;
+    those without coordinates come after the located ones and are only sources when there
+    is no distance limit.
+    """
+    ranked = warehouses.reset_index(drop=True).copy()
+    local = (ranked["location"].map(_norm) == _norm(local_location)).to_numpy(dtype=bool)
+    lat = pd.to_numeric(ranked["latitude"], errors="coerce").to_numpy(dtype=np.float64)
+    lon = pd.to_numeric(ranked["longitude"], errors="coerce").to_numpy(dtype=np.float64)
+    distance = np.full(len(ranked), np.nan)
+    if local.any():
+        home = np.flatnonzero(local)[0]
+        distance = haversine_km(lat[home], lon[home], lat, lon)
+    distance[local] = 0.0
+    known = ~np.isnan(distance)
+    rank = np.empty(len(ranked), dtype=np.int64)
+    rank[np.lexsort((ranked["warehouse_id"].astype(str).to_numpy(), np.where(known, distance, np.inf)))] = \
+        np.arange(len(ranked))
+    ranked["distance_km"] = np.round(distance, 1)
+    ranked["local"] = local
+    ranked["source"] = ~local & ((max_km <= 0) | (known & (distance <= max_km)))
+    ranked["rank"] = rank
+    return ranked
+
+
+class WarehouseNetwork:
+    """Stock held by the other warehouses, laid out for vectorized transfer planning.
+
+    Stock rows of every source warehouse are flat arrays sorted by (product, distance), with
+    the offset where each product's rows start. plan() gathers the rows of the products that
+    are short and fills them nearest warehouse first in one pass, so its cost follows the
+    shortages and the stock on hand for them, not the number of warehouses.
+    """
+
+    def __init__(self, warehouses: pd.DataFrame, stock: pd.DataFrame, local_location: str):
+        """`warehouses` comes from rank_warehouses; `stock` has warehouse_id, product_id, stock"""
+        self.warehouses = warehouses
+        self.local_location = local_location
+        codes = pd.Index(warehouses["warehouse_id"]).get_indexer(stock["warehouse_id"])
+        product_ids = strip_series(stock["product_id"]).to_numpy()
+        units = pd.to_numeric(stock["stock"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+        keep = (codes >= 0) & (units > 0) & (product_ids != '')
+        keep[keep] = warehouses["source"].to_numpy(dtype=bool)[codes[keep]]
+        codes, product_ids, units = codes[keep], product_ids[keep], units[keep]
+
+        products, uniques = pd.factorize(product_ids, sort=True)
+        order = np.lexsort((warehouses["rank"].to_numpy()[codes], products))
+        self.source_codes = codes[order]
+        self.stock = units[order]
+        self._products = pd.Index(uniques, dtype=object)
+        self._starts = np.zeros(len(uniques) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(products, minlength=len(uniques)), out=self._starts[1:])
+
+    def __len__(self) -> int:
+        return len(self.stock)
+
+    def plan(self, orders: Sequence[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Cover shortages from other warehouses first; returns (orders still short, transfers).
+
+        Each order gets `transfer`, the units it receives from other warehouses, and its
+        shortage is reduced by them; orders covered completely are dropped. Orders of the same
+        product share the transferred units in list order.
+        """
+        if not len(self) or not orders:
+            return [{**o, 'transfer': 0} for o in orders], []
+        shortage = np.fromiter((int(o.get("shortage", 0) or 0) for o in orders), dtype=np.int64, count=len(orders))
+        ids = strip_series(pd.Series([o.get("product_id") for o in orders], dtype=object)).to_numpy()
+        product = self._products.get_indexer(ids)
+        short = np.flatnonzero((product >= 0) & (shortage > 0))
+        wanted, first, codes = np.unique(product[short], return_index=True, return_inverse=True)
+        need = np.bincount(codes, weights=shortage[short], minlength=len(wanted)).astype(np.int64)
+
+        # Stock rows of the short products, nearest warehouse first within each product
+        lengths = self._starts[wanted + 1] - self._starts[wanted]
+        offsets = np.cumsum(lengths) - lengths
+        group = np.repeat(np.arange(len(wanted)), lengths)
+        rows = np.arange(lengths.sum()) + np.repeat(self._starts[wanted] - offsets, lengths)
+        available = self.stock[rows]
+        cumulative = np.cumsum(available)
+        starts = offsets[group]
+        taken_before = cumulative - available - (cumulative[starts] - available[starts])
+        take = np.clip(need[group] - taken_before, 0, available)
+
+        # Hand each product's transferred units to its orders in list order
+        covered = np.bincount(group, weights=take, minlength=len(wanted)).astype(np.int64)
+        order = np.lexsort((short, codes))
+        sorted_codes = codes[order]
+        sorted_shortage = shortage[short][order]
+        cumulative = np.cumsum(sorted_shortage)
+        starts = np.searchsorted(sorted_codes, sorted_codes, side="left")
+        served_before = cumulative - sorted_shortage - (cumulative[starts] - sorted_shortage[starts])
+        transfer = np.zeros(len(orders), dtype=np.int64)
+        transfer[short[order]] = np.clip(covered[sorted_codes] - served_before, 0, sorted_shortage)
+
+        remaining = []
+        for o, units, left in zip(orders, transfer.tolist(), (shortage - transfer).tolist()):
+            if left > 0 or not units:
+                remaining.append({**o, 'shortage': left if units else o.get('shortage', 0), 'transfer': units})
+
+        moved = np.flatnonzero(take > 0)
+        sources = self.source_codes[rows[moved]]
+        names = np.array([orders[short[i]].get('product_name', '') for i in first], dtype=object)
+        distance = self.warehouses["distance_km"].to_numpy()[sources]
+        columns = (
+            self._products.to_numpy()[wanted[group[moved]]],
+            names[group[moved]],
+            self.warehouses["warehouse_id"].to_numpy()[sources],
+            self.warehouses["location"].to_numpy()[sources],
+            np.full(len(moved), self.local_location, dtype=object),
+            np.where(np.isnan(distance), None, distance),
+            available[moved],
+            take[moved],
+        )
+        # Plain dicts straight from the columns; DataFrame.to_dict boxes every cell one by one
+        transfers = [dict(zip(TRANSFER_COLUMNS, values)) for values in zip(*(c.tolist() for c in columns))]
+        return remaining, transfers
+
+
+def _registry_frame(db) -> pd.DataFrame:
+    ensure_warehouse_table()
+    rows = db.execute(select(*[getattr(Warehouse, column) for column in WAREHOUSE_COLUMNS])).all()
+    return pd.DataFrame(rows, columns=WAREHOUSE_COLUMNS)
+
+
+def load_warehouse_network(db, local_location: Optional[str] = None,
+                           max_km: Optional[float] = None) -> WarehouseNetwork:
+    """Read the stock shards of every warehouse that may send transfers, shard by shard"""
+    local_location = settings.INVENTORY_LOCATION if local_location is None else local_location
+    max_km = settings.TRANSFER_MAX_KM if max_km is None else max_km
+    ranked = rank_warehouses(_registry_frame(db), local_location, max_km)
+    frames = [pd.DataFrame(columns=["warehouse_id", "product_id", "stock"])]
+    for warehouse_id in ranked.loc[ranked["source"], "warehouse_id"]:
+        table = warehouse_stock_table(warehouse_id)
+        rows = db.execute(select(table.c.product_id, table.c.stock).where(table.c.stock > 0)).all()
+        frames.append(pd.DataFrame(rows, columns=["product_id", "stock"]).assign(warehouse_id=warehouse_id))
+    return WarehouseNetwork(ranked, pd.concat(frames, ignore_index=True), local_location)
+
+
+_network_cache: Dict[str, object] = {"key": None, "network": None}
+
+
+def get_warehouse_network(db) -> WarehouseNetwork:
+    """The network for the current settings, rebuilt only when warehouse stock is reloaded"""
+    ensure_warehouse_table()
+    key = (get_generations(db, ("warehouses",)), settings.INVENTORY_LOCATION, settings.TRANSFER_MAX_KM)
+    if _network_cache["key"] != key:
+        _network_cache["network"] = load_warehouse_network(db)
+        _network_cache["key"] = key
+    return _network_cache["network"]
+
+
+def plan_transfers(db, orders: Sequence[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Cover shortages from nearby warehouses before they become purchase orders"""
+    return get_warehouse_network(db).plan(orders)
+
+
+def _register(db, warehouses: pd.DataFrame, now: datetime) -> None:
+    stmt = insert(Warehouse)
+    for record in warehouses.astype(object).where(warehouses.notna(), None).to_dict("records"):
+        values = {**record, "table_name": warehouse_stock_table(record["warehouse_id"]).name, "updated_at": now}
+        db.execute(stmt.values(**values).on_conflict_do_update(
+            index_elements=["warehouse_id"], set_={k: v for k, v in values.items() if k != "warehouse_id"}
+        ))
+
+
+def load_warehouses(warehouses: Optional[pd.DataFrame], stock: Optional[pd.DataFrame]) -> Dict[str, int]:
+    """Register warehouses and replace the stock of every warehouse that has rows in `stock`.
+
+    `warehouses` has warehouse_id, warehouse_name, Location, latitude, longitude; `stock` has
+    warehouse_id, product_id, stock (repeated products are summed). Shards are filled next to
+    the live ones and swapped in together with the registry, so transfer planning never sees
+    a partial load. Warehouses without stock rows keep the stock they had.
+    """
+    ensure_warehouse_table()
+    for frame, required in ((warehouses, ["warehouse_id"]), (stock, ["warehouse_id", "product_id", "stock"])):
+        missing = [column for column in required if frame is not None and column not in frame.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+    registry = pd.DataFrame(columns=WAREHOUSE_COLUMNS)
+    if warehouses is not None:
+        registry = warehouses.rename(columns={"Location": "location"}).reindex(columns=WAREHOUSE_COLUMNS)
+        registry["warehouse_id"] = strip_series(registry["warehouse_id"])
+        registry = registry[registry["warehouse_id"] != ""].drop_duplicates("warehouse_id", keep="last")
+    if stock is None:
+        stock = pd.DataFrame(columns=["warehouse_id", "product_id", "stock"])
+    stock = pd.DataFrame({
+        "warehouse_id": strip_series(stock["warehouse_id"]),
+        "product_id": strip_series(stock["product_id"]),
+        "stock": pd.to_numeric(stock["stock"], errors="coerce").fillna(0).astype("int64"),
+    })
+    stock = stock[(stock["warehouse_id"] != "") & (stock["product_id"] != "")]
+
+    with SessionLocal() as db:
+        known = set(_registry_frame(db)["warehouse_id"]) | set(registry["warehouse_id"])
+    stocked = sorted(set(stock["warehouse_id"]))
+    unknown = [w for w in stocked if w not in known]
+    if unknown:
+        raise ValueError(f"Stock for unregistered warehouses: {', '.join(unknown)}")
+    tables = {w: warehouse_stock_table(w) for w in sorted(set(registry["warehouse_id"]) | set(stocked))}
+    reserved = [w for w, t in tables.items() if re.search(r"_g\d+$", t.name)]
+    if reserved:
+        # reload_tables names its shadow copies <table>_g<generation>
+        raise ValueError(f"Warehouse ids may not end in g<number>: {', '.join(reserved)}")
+    if len({t.name for t in tables.values()}) < len(tables):
+        raise ValueError("Warehouse ids that differ only in case or punctuation share a stock table")
+
+    per_product = stock.groupby(["warehouse_id", "product_id"], sort=False)["stock"].sum().reset_index()
+    for table in tables.values():
+        table.create(bind=engine, checkfirst=True)
+    now = datetime.utcnow()
+    if stocked:
+        reload_tables([
+            (tables[w], rows[["product_id", "stock"]].to_dict("records"))
+            for w, rows in per_product.groupby("warehouse_id", sort=True)
+        ], generation_names=("warehouses",), after_swap=lambda db: _register(db, registry, now))
+    else:
+        with SessionLocal() as db:
+            _register(db, registry, now)
+            bump_generation(db, "warehouses")
+            db.commit()
+    return {"warehouses": len(tables), "rows": len(per_product)}
+
+
+def warehouse_summary(db) -> List[Dict]:
+    """Registered warehouses nearest first, with distance from the local one and stock on hand"""
+    ranked = rank_warehouses(_registry_frame(db), settings.INVENTORY_LOCATION, settings.TRANSFER_MAX_KM)
+    summary = []
+    for record in ranked.sort_values("rank").to_dict("records"):
+        if record["local"]:
+            # The local warehouse's stock is the main inventory
+            snapshot = get_inventory_snapshot(db)
+            products, units = int(np.count_nonzero(np.asarray(snapshot.stock) > 0)), int(np.sum(snapshot.stock))
+        else:
+            table = warehouse_stock_table(record["warehouse_id"])
+            products, units = db.execute(
+                select(func.count(), func.coalesce(func.sum(table.c.stock), 0)).where(table.c.stock > 0)
+            ).one()
+        distance = record["distance_km"]
+        summary.append({
+            "warehouse_id": record["warehouse_id"], "warehouse_name": record["warehouse_name"],
+            "location": record["location"], "distance_km": None if pd.isna(distance) else float(distance),
+            "local": bool(record["local"]), "transfer_source": bool(record["source"]),
+            "products": int(products), "units": int(units),
+        })
+    return summary
@@ -0,0 +1,461 @@
+# pipeline/watcher.py
+import ctypes
+import ctypes.util
+import json
+import multiprocessing
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+import pandas as pd
+from config.settings import settings
+from database.models import IngestedFile, SessionLocal, engine
+from pipeline.allocation import ORDER_COLUMNS
+from pipeline.demand import evaluate_demand
+from pipeline.jobs import payload_fingerprint
+from pipeline.sharding import DEMAND_SUFFIXES, aggregate_shard
+from pipeline.warehouses import TRANSFER_COLUMNS
+
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# struct inotify_event header: wd, mask, cookie, len; followed by a NUL-padded name
+_EVENT = struct.Struct("iIII")
+
+# Sub-directories of the watch directory that handled files are moved into
+PROCESSED_DIR, FAILED_DIR = "processed", "failed"
+
+# (size, mtime_ns) of a file, compared to tell whether a writer is still busy with it
+Stat = Tuple[int, int]
+
+# Released paths the debouncer remembers, so a late event for an unchanged file is ignored
+RELEASED_MEMORY = 4096
+
+_table_ready = False
+
+
+def _ensure_table() -> None:
+    global _table_ready
+    if not _table_ready:
+        IngestedFile.__table__.create(bind=engine, checkfirst=True)
+        _table_ready = True
+
+
+def is_demand_file(name: str) -> bool:
+    """CSV/Excel files, leaving out hidden files and Office lock files (~$...)"""
+    return name.lower().endswith(DEMAND_SUFFIXES) and not name.startswith((".", "~$"))
+
+
+def _stat(path: str) -> Optional[Stat]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class _Inotify:
+    """inotify on one directory through libc (ctypes), so no extra dependency is needed"""
+
+    def __init__(self, directory: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def read(self, timeout: float) -> Tuple[Set[str], bool]:
+        """Names touched within `timeout` seconds, and whether the kernel dropped events"""
+        names, overflow = set(), False
+        if not select.select([self.fd], [], [], max(timeout, 0.0))[0]:
+            return names, overflow
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names, overflow
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            elif name:
+                names.add(os.fsdecode(name))
+        return names, overflow
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class DirectoryWatcher:
+    """Reports demand files in one directory that were created or changed.
+
+    Uses inotify on Linux and falls back to polling the listing (size and mtime) elsewhere,
+    or when use_inotify is False: network shares do not deliver inotify events for writes
+    made on other machines. The first call reports every file already there.
+    """
+
+    def __init__(self, directory, poll_interval: float = 1.0, use_inotify: bool = True):
+        self.directory = Path(directory)
+        self.poll_interval = poll_interval
+        self._inotify = None
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify(self.directory)
+            except (OSError, AttributeError):
+                # AttributeError: a libc without the inotify symbols
+                self._inotify = None
+        self.mode = "inotify" if self._inotify else "polling"
+        self._listing: Optional[Dict[str, Stat]] = None
+        self._last_scan = 0.0
+
+    def _scan(self) -> Dict[str, Stat]:
+        listing = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not is_demand_file(entry.name):
+                    continue
+                try:
+                    if entry.is_file():
+                        st = entry.stat()
+                        listing[entry.path] = (st.st_size, st.st_mtime_ns)
+                except FileNotFoundError:
+                    continue
+        self._last_scan = time.monotonic()
+        return listing
+
+    def changes(self, timeout: Optional[float] = None) -> Set[str]:
+        """Paths created or modified since the last call, waiting up to `timeout` seconds for one"""
+        wait = self.poll_interval if timeout is None else max(timeout, 0.0)
+        if self._listing is None:
+            self._listing = self._scan()
+            return set(self._listing)
+        if self._inotify:
+            names, overflow = self._inotify.read(wait)
+            if overflow:
+                # Events were lost; report the whole listing and let fingerprints sort out repeats
+                return set(self._scan())
+            return {str(self.directory / name) for name in names if is_demand_file(name)}
+        due = self._last_scan + self.poll_interval - time.monotonic()
+        if wait < due:
+            time.sleep(wait)
+            return set()
+        time.sleep(max(due, 0.0))
+        listing = self._scan()
+        changed = {path for path, stat in listing.items() if self._listing.get(path) != stat}
+        self._listing = listing
+        return changed
+
+    def close(self) -> None:
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+
+class Debouncer:
+    """Holds paths back until they have stopped changing for `settle` seconds.
+
+    Every event pushes a path's deadline back. At the deadline the file is stat'ed again
+    and only released if size and mtime match the previous look, which also catches
+    writers that pause without producing events. Events that arrive after a release for a
+    file still as it was released (a poll that lagged behind the settle time) are ignored.
+    """
+
+    def __init__(self, settle: float, clock: Callable[[], float] = time.monotonic):
+        self.settle = settle
+        self._clock = clock
+        self._pending: Dict[str, Tuple[float, Optional[Stat]]] = {}
+        self._released: "OrderedDict[str, Stat]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, path: str) -> None:
+        stat = _stat(path)
+        if path not in self._pending and stat is not None and self._released.get(path) == stat:
+            return
+        self._pending[path] = (self._clock() + self.settle, stat)
+
+    def wait_time(self) -> Optional[float]:
+        """Seconds until the next deadline, or None when nothing is pending"""
+        if not self._pending:
+            return None
+        return max(0.0, min(deadline for deadline, _ in self._pending.values()) - self._clock())
+
+    def ready(self) -> List[Tuple[str, Stat]]:
+        """Paths that settled, with the (size, mtime) they settled at"""
+        now = self._clock()
+        settled = []
+        for path, (deadline, seen) in list(self._pending.items()):
+            if deadline > now:
+                continue
+            current = _stat(path)
+            if current is None:
+                del self._pending[path]  # deleted or renamed away before it settled
+            elif current != seen:
+                self._pending[path] = (now + self.settle, current)
+            else:
+                del self._pending[path]
+                settled.append((path, current))
+                self._released[path] = current
+                self._released.move_to_end(path)
+                if len(self._released) > RELEASED_MEMORY:
+                    self._released.popitem(last=False)
+        return settled
+
+
+def write_csv(records: Sequence[Dict], path: Path, columns: Optional[Sequence[str]] = None) -> str:
+    """Write records through a temporary file and a rename, so readers never see a partial file"""
+    tmp = path.with_name(f".{path.name}.tmp")
+    pd.DataFrame(list(records), columns=columns).to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return str(path)
+
+
+def ingest_file(file_name: str, payload: bytes, fingerprint: str, out_dir: str,
+                store_mode: Optional[str] = None, store_priority: Optional[Sequence[str]] = None) -> Dict:
+    """Worker: aggregate one dropped file batch by batch, match it against inventory and write its results"""
+    start = time.perf_counter()
+    aggregated, store_rows, rows, report = aggregate_shard((file_name, payload), bool(store_mode))
+    db = SessionLocal()
+    try:
+        result = evaluate_demand(aggregated, db, rows, store_mode, store_priority, store_rows)
+    finally:
+        db.close()
+
+    prefix = f"{Path(file_name).stem}-{fingerprint[:8]}"
+    out = Path(out_dir)
+    outputs = [write_csv(result['orders_to_send'], out / f"{prefix}.shortages.csv", ORDER_COLUMNS)]
+    if result['transfers']:
+        outputs.append(write_csv(result['transfers'], out / f"{prefix}.transfers.csv", TRANSFER_COLUMNS))
+    if result['missing_products']:
+        outputs.append(write_csv(result['missing_products'], out / f"{prefix}.missing_products.csv"))
+    if result['store_allocation']:
+        outputs.append(write_csv(result['store_allocation'], out / f"{prefix}.store_allocation.csv"))
+    if report.rejected:
+        # Rejected cells hold mixed types (e.g. text in demand), so they are written as text
+        rejected = [{k: v if k == "row" or v is None else str(v) for k, v in r.items()}
+                    for r in report.to_dict()['rejected_rows']]
+        outputs.append(write_csv(rejected, out / f"{prefix}.rejected_rows.csv"))
+    return {
+        "file_name": file_name,
+        "fingerprint": fingerprint,
+        "rows": rows,
+        "rejected": report.rejected,
+        "shortages": len(result['orders_to_send']),
+        "transfers": len(result['transfers']),
+        "missing": len(result['missing_products']),
+        "outputs": outputs,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def succeeded_fingerprints(db) -> Set[str]:
+    """Content hashes of every file already ingested successfully"""
+    _ensure_table()
+    return {fp for (fp,) in db.query(IngestedFile.fingerprint).filter(IngestedFile.status == "succeeded")}
+
+
+def record_ingested(db, status: str, summary: Dict) -> None:
+    _ensure_table()
+    db.merge(IngestedFile(
+        fingerprint=summary["fingerprint"],
+        file_name=summary["file_name"],
+        status=status,
+        rows=summary.get("rows", 0),
+        shortages=summary.get("shortages", 0),
+        missing=summary.get("missing", 0),
+        result=json.dumps(summary, default=str),
+        error=summary.get("error"),
+        created_at=datetime.utcnow()
+    ))
+    db.commit()
+
+
+def _no_report(summary: Dict) -> None:
+    pass
+
+
+class DemandWatcher:
+    """Daemon feeding demand files dropped into a directory through the demand pipeline.
+
+    New or changed files wait until their writes settle, are fingerprinted by content (a
+    file whose content already succeeded is skipped whatever its name) and run in a bounded
+    process pool: `workers` files are processed while as many wait inside the pool, the rest
+    queue here. Each file's shortages are written to `out_dir` as soon as it finishes, it is
+    recorded in ingested_files and, with `archive`, moved to processed/ or failed/.
+    """
+
+    def __init__(self, directory=None, out_dir=None, workers: Optional[int] = None,
+                 settle: Optional[float] = None, poll_interval: Optional[float] = None,
+                 use_inotify: bool = True, store_mode: Optional[str] = None,
+                 store_priority: Optional[Sequence[str]] = None, archive: bool = True,
+                 on_result: Callable[[Dict], None] = _no_report):
+        self.directory = Path(directory or settings.WATCH_DIR)
+        self.out_dir = Path(out_dir or settings.WATCH_OUTPUT_DIR)
+        self.workers = max(1, workers or settings.WATCH_WORKERS)
+        self.settle = settings.WATCH_SETTLE_SECONDS if settle is None else settle
+        self.poll_interval = settings.WATCH_POLL_SECONDS if poll_interval is None else poll_interval
+        self.use_inotify = use_inotify
+        self.store_mode = store_mode
+        self.store_priority = list(store_priority or [])
+        self.archive = archive
+        self.on_result = on_result
+        self.mode = None
+        self.stats = {"succeeded": 0, "failed": 0, "duplicates": 0, "rows": 0, "shortages": 0}
+        self.started_at: Optional[float] = None
+        # ("ready", (path, stat)) from the watch thread and ("done", future) from pool callbacks
+        self._events: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+        self._queued: deque = deque()
+        self._running: Dict[Future, Tuple[str, Stat, str, str, ProcessPoolExecutor]] = {}
+        self._fingerprints: Set[str] = set()
+        self._debouncer = Debouncer(self.settle)
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._primed = False
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn keeps workers independent of the daemon's watch thread
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _watch(self, watcher: DirectoryWatcher, stop: threading.Event) -> None:
+        while not stop.is_set():
+            wait = self._debouncer.wait_time()
+            changed = watcher.changes(self.poll_interval if wait is None else min(wait, self.poll_interval))
+            with self._lock:
+                for path in changed:
+                    self._debouncer.touch(path)
+                for settled in self._debouncer.ready():
+                    self._events.put(("ready", settled))
+                self._primed = True
+
+    def _submit(self) -> None:
+        """Hand queued files to the pool, keeping at most two per worker in flight"""
+        while self._queued and len(self._running) < 2 * self.workers:
+            path, stat = self._queued.popleft()
+            try:
+                payload = Path(path).read_bytes()
+            except FileNotFoundError:
+                continue
+            if _stat(path) != stat:
+                # Written to again since it settled; wait for it to settle once more
+                with self._lock:
+                    self._debouncer.touch(path)
+                continue
+            file_name = Path(path).name
+            fingerprint = payload_fingerprint(payload)
+            if fingerprint in self._fingerprints:
+                self.stats["duplicates"] += 1
+                self._archive(path, stat, PROCESSED_DIR, fingerprint)
+                self.on_result({"status": "duplicate", "file_name": file_name, "fingerprint": fingerprint})
+                continue
+            self._fingerprints.add(fingerprint)
+            future = self._pool.submit(ingest_file, file_name, payload, fingerprint, str(self.out_dir),
+                                       self.store_mode, self.store_priority)
+            self._running[future] = (path, stat, file_name, fingerprint, self._pool)
+            future.add_done_callback(lambda f: self._events.put(("done", f)))
+
+    def _finished(self, db, future: Future) -> None:
+        path, stat, file_name, fingerprint, pool = self._running.pop(future)
+        try:
+            summary, status = future.result(), "succeeded"
+            self.stats["rows"] += summary["rows"]
+            self.stats["shortages"] += summary["shortages"]
+        except Exception as e:
+            summary, status = {"file_name": file_name, "fingerprint": fingerprint,
+                               "error": f"Error processing file: {e}"}, "failed"
+            # A failed file may be dropped again (e.g. once the database is back)
+            self._fingerprints.discard(fingerprint)
+            if isinstance(e, BrokenProcessPool) and pool is self._pool:
+                # A worker died (e.g. out of memory); files in flight fail, later ones get a new pool
+                self._pool.shutdown(wait=False)
+                self._pool = self._new_pool()
+        self.stats[status] += 1
+        record_ingested(db, status, summary)
+        self._archive(path, stat, PROCESSED_DIR if status == "succeeded" else FAILED_DIR, fingerprint)
+        self.on_result({"status": status, **summary})
+
+    def _archive(self, path: str, stat: Stat, folder: str, fingerprint: str) -> None:
+        """Move a handled file out of the drop directory, unless a newer version replaced it meanwhile"""
+        if not self.archive or _stat(path) != stat:
+            return
+        source = Path(path)
+        target_dir = self.directory / folder
+        target_dir.mkdir(exist_ok=True)
+        target = target_dir / source.name
+        if target.exists():
+            target = target_dir / f"{source.stem}-{fingerprint[:8]}{source.suffix}"
+        os.replace(source, target)
+
+    def idle(self) -> bool:
+        """The first listing was taken and nothing is settling, queued or running"""
+        with self._lock:
+            return self._primed and not (len(self._debouncer) or self._events.qsize() or self._queued or self._running)
+
+    def files_per_minute(self) -> float:
+        """Files ingested successfully per minute since start"""
+        if self.started_at is None:
+            return 0.0
+        return self.stats["succeeded"] * 60 / max(time.monotonic() - self.started_at, 1e-9)
+
+    def run(self, stop: Optional[threading.Event] = None, once: bool = False) -> Dict:
+        """Watch until `stop` is set (with `once`, until the files already there are handled),
+        then let running files finish. Returns the stats.
+        """
+        stop = stop or threading.Event()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        watcher = DirectoryWatcher(self.directory, self.poll_interval, self.use_inotify)
+        self.mode = watcher.mode
+        watching = threading.Event()
+        thread = threading.Thread(target=self._watch, args=(watcher, watching), daemon=True)
+        db = SessionLocal()
+        self._pool = self._new_pool()
+        try:
+            self._fingerprints = succeeded_fingerprints(db)
+            self.started_at = time.monotonic()
+            thread.start()
+            while not stop.is_set():
+                try:
+                    kind, item = self._events.get(timeout=0.2)
+                except queue.Empty:
+                    if once and self.idle():
+                        break
+                    continue
+                if kind == "ready":
+                    self._queued.append(item)
+                else:
+                    self._finished(db, item)
+                self._submit()
+            watching.set()
+            thread.join()
+            while self._running:
+                kind, item = self._events.get()
+                if kind == "done":
+                    self._finished(db, item)
+        finally:
+            watching.set()
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            watcher.close()
+            db.close()
+        return {**self.stats, "mode": self.mode, "files_per_minute": round(self.files_per_minute(), 1)}
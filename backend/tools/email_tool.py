@@ -1,16 +1,42 @@
 # tools/email_tool.py
+import asyncio
 from typing import Dict
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import sys
 from pathlib import Path
 
 # Add the parent directory to Python path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.settings import settings
+from database.models import SessionLocal
+from pipeline.ledger import record_movements
+from pipeline.mailer import MailPipeline, MailTemplate, OrderMail
+
+# Compiled once; every call renders and sends through the mail pipeline
+ORDER_TEMPLATE = MailTemplate(settings.EMAIL_FROM, "Purchase Order - {product_name} ({product_id})", """
+            Dear {vendor_name},
+            
+            We would like to place an order for the following item:
+            
+            Product: {product_name}
+            Product ID: {product_id}
+            Quantity: {quantity}
+            
+            Please confirm availability and provide delivery timeline.
+            
+            Best regards,
+            Inventory Management System
+            """)
+
+SMTP_CONFIG = {
+    "smtp_server": settings.EMAIL_HOST,
+    "smtp_port": settings.EMAIL_PORT,
+    "sender_email": settings.EMAIL_USERNAME,
+    "sender_password": settings.EMAIL_PASSWORD,
+    "sender_from": settings.EMAIL_FROM,
+    "smtp_security": settings.EMAIL_SECURITY,
+}
 
 class SendOrderEmailInput(BaseModel):
     vendor_email: str = Field(..., description="Vendor's email address")
@@ -27,37 +53,25 @@ class SendOrderEmailTool(BaseTool):
     def _run(self, vendor_email: str, vendor_name: str, product_name: str, 
              quantity: int, product_id: str) -> Dict:
         try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = settings.EMAIL_FROM
-            msg['To'] = vendor_email
-            msg['Subject'] = f"Purchase Order - {product_name} ({product_id})"
-            
-            # Email body
-            body = f"""
-            Dear {vendor_name},
-            
-            We would like to place an order for the following item:
-            
-            Product: {product_name}
-            Product ID: {product_id}
-            Quantity: {quantity}
-            
-            Please confirm availability and provide delivery timeline.
-            
-            Best regards,
-            Inventory Management System
-            """
-            
-            msg.attach(MIMEText(body, 'plain'))
+            result = MailPipeline(SMTP_CONFIG, ORDER_TEMPLATE).send([OrderMail(vendor_email, {
+                "vendor_name": vendor_name, "product_name": product_name,
+                "product_id": product_id, "quantity": quantity,
+            })])[0]
+            if result != "Sent":
+                return {
+                    "status": "error",
+                    "message": f"Failed to send email: {result.removeprefix('Error: ')}"
+                }
             
-            # Connect to SMTP server and send email
-            server = smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT)
-            server.starttls()
-            server.login(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
-            text = msg.as_string()
-            server.sendmail(settings.EMAIL_FROM, vendor_email, text)
-            server.quit()
+            # Book the ordered quantity as on-order stock
+            db = SessionLocal()
+            try:
+                record_movements(db, [{
+                    "product_id": product_id, "kind": "reservation",
+                    "quantity": quantity, "reference": f"PO:{vendor_name}"
+                }])
+            finally:
+                db.close()
             
             return {
                 "status": "success",
@@ -72,4 +86,7 @@ class SendOrderEmailTool(BaseTool):
     
     async def _arun(self, vendor_email: str, vendor_name: str, product_name: str, 
                    quantity: int, product_id: str) -> Dict:
-        raise NotImplementedError("Async not implemented")
\ No newline at end of file
+        # smtplib is blocking; run it off the event loop
+        return await asyncio.to_thread(
+            self._run, vendor_email, vendor_name, product_name, quantity, product_id
+        )
\ No newline at end of file
@@ -1,12 +1,10 @@
 # tools/inventory_tool.py
-from typing import Dict, Optional
+from typing import Dict, List, Mapping, Optional, Sequence
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-from database.models import SessionLocal, InventoryData
-
-
-def _normalize(text: str) -> str:
-    return (text or "").strip().lower()
+from database.models import SessionLocal
+from database.async_connection import AsyncSessionLocal
+from pipeline.snapshot import InventoryItem, InventorySnapshot, get_inventory_snapshot
 
 
 class StockAnalysisInput(BaseModel):
@@ -16,6 +14,61 @@ class StockAnalysisInput(BaseModel):
     product_id: Optional[str] = Field(None, description="Optional product ID for fallback matching")
 
 
+def stock_analysis(matched_item: Optional[InventoryItem], product_name: str, category: str, demand: int,
+                   product_id: Optional[str] = None) -> Dict:
+    """Result of stock_analysis for one product, given its inventory match (or None)"""
+    if not matched_item:
+        return {
+            "status": "not_found",
+            "message": "Product not found in inventory",
+            "product_name": product_name,
+            "category": category,
+            "product_id": product_id or "",
+            "demand": int(demand),
+        }
+
+    # On-hand from the ledger snapshot; stock already on order is not reordered
+    current_stock, on_order = matched_item.stock, matched_item.on_order
+    required_stock = max(0, int(demand) - current_stock - on_order)
+
+    return {
+        "status": "reorder_needed" if required_stock > 0 else "sufficient_stock",
+        "product_id": matched_item.product_id,
+        "product_name": matched_item.product_name,
+        "category_name": matched_item.category_name,
+        "current_stock": current_stock,
+        "on_order": on_order,
+        "demand": int(demand),
+        "required_stock": required_stock,
+        "vendor_id": matched_item.vendor_id,
+    }
+
+
+def batch_stock_analysis(snapshot: InventorySnapshot, items: Sequence[Mapping],
+                         demand_by_product: Optional[Mapping[str, int]] = None) -> List[Dict]:
+    """stock_analysis for many products with one vectorized match against the snapshot.
+
+    Items carry product_name, category, demand and optionally product_id. An item without
+    demand takes the recorded demand of its matched product from `demand_by_product`.
+    """
+    if not items:
+        return []
+    rows = snapshot.match_rows(
+        [item.get("product_name") or "" for item in items], [item.get("category") or "" for item in items],
+        [item.get("product_id") or "" for item in items]
+    ).tolist()
+    results = []
+    for item, row in zip(items, rows):
+        matched_item = snapshot.item(row) if row >= 0 else None
+        demand = item.get("demand")
+        if demand is None:
+            key = matched_item.product_id if matched_item else (item.get("product_id") or "")
+            demand = (demand_by_product or {}).get(key, 0)
+        results.append(stock_analysis(matched_item, item.get("product_name") or "", item.get("category") or "",
+                                      demand, item.get("product_id")))
+    return results
+
+
 class StockAnalysisTool(BaseTool):
     name: str = "stock_analysis"
     description: str = (
@@ -24,50 +77,26 @@ class StockAnalysisTool(BaseTool):
     )
     args_schema: type = StockAnalysisInput
 
+    def _match(self, snapshot: InventorySnapshot, product_name: str, category: str, demand: int,
+               product_id: Optional[str] = None) -> Dict:
+        # Name/category first, then product_id as a fallback
+        return stock_analysis(snapshot.match(product_name, category, product_id),
+                              product_name, category, demand, product_id)
+
     def _run(self, product_name: str, category: str, demand: int, product_id: Optional[str] = None) -> Dict:
         db = SessionLocal()
         try:
-            normalized_key = (_normalize(product_name), _normalize(category))
-
-            # Load inventory and build lookup
-            inventory = db.query(InventoryData).all()
-            key_to_item = {(_normalize(i.product_name), _normalize(i.category_name)): i for i in inventory}
-
-            matched_item = key_to_item.get(normalized_key)
-
-            # Fallback: try by product_id if provided and not matched by name/category
-            if not matched_item and product_id:
-                product_id_norm = (product_id or "").strip()
-                matched_item = next((i for i in inventory if (i.product_id or "").strip() == product_id_norm), None)
-
-            if not matched_item:
-                return {
-                    "status": "not_found",
-                    "message": "Product not found in inventory",
-                    "product_name": product_name,
-                    "category": category,
-                    "product_id": product_id or "",
-                    "demand": int(demand),
-                }
-
-            current_stock = int(matched_item.stock or 0)
-            required_stock = max(0, int(demand) - current_stock)
-
-            return {
-                "status": "reorder_needed" if required_stock > 0 else "sufficient_stock",
-                "product_id": matched_item.product_id,
-                "product_name": matched_item.product_name,
-                "category_name": matched_item.category_name,
-                "current_stock": current_stock,
-                "demand": int(demand),
-                "required_stock": required_stock,
-                "vendor_id": matched_item.vendor_id,
-            }
-
+            return self._match(get_inventory_snapshot(db), product_name, category, demand, product_id)
         except Exception as e:
             return {"error": str(e)}
         finally:
             db.close()
 
     async def _arun(self, product_name: str, category: str, demand: int, product_id: Optional[str] = None) -> Dict:
-        raise NotImplementedError("Async not implemented")
\ No newline at end of file
+        try:
+            async with AsyncSessionLocal() as db:
+                snapshot = await db.run_sync(get_inventory_snapshot)
+            return self._match(snapshot, product_name, category, demand, product_id)
+        except Exception as e:
+            return {"error": str(e)}
+
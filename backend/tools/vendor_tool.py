@@ -2,7 +2,9 @@
 from typing import Dict
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
+from sqlalchemy import select
 from database.models import SessionLocal, VendorList
+from database.async_connection import AsyncSessionLocal
 
 class VendorLookupInput(BaseModel):
     vendor_id: str = Field(..., description="The vendor ID to look up")
@@ -12,6 +14,15 @@ class VendorLookupTool(BaseTool):
     description: str = "Find vendor information using vendor ID"
     args_schema: type = VendorLookupInput
     
+    def _vendor_details(self, vendor) -> Dict:
+        return {
+            "vendor_id": vendor.vendor_id,
+            "vendor_name": vendor.vendor_name,
+            "location": vendor.location,
+            "email": vendor.email,
+            "contact": vendor.contact
+        }
+    
     def _run(self, vendor_id: str) -> Dict:
         db = SessionLocal()
         try:
@@ -22,13 +33,7 @@ class VendorLookupTool(BaseTool):
             if not vendor:
                 return {"error": f"Vendor {vendor_id} not found"}
             
-            return {
-                "vendor_id": vendor.vendor_id,
-                "vendor_name": vendor.vendor_name,
-                "location": vendor.location,
-                "email": vendor.email,
-                "contact": vendor.contact
-            }
+            return self._vendor_details(vendor)
             
         except Exception as e:
             return {"error": str(e)}
@@ -36,4 +41,16 @@ class VendorLookupTool(BaseTool):
             db.close()
     
     async def _arun(self, vendor_id: str) -> Dict:
-        raise NotImplementedError("Async not implemented")
\ No newline at end of file
+        try:
+            async with AsyncSessionLocal() as db:
+                vendor = (await db.execute(
+                    select(VendorList).where(VendorList.vendor_id == vendor_id).limit(1)
+                )).scalars().first()
+            
+            if not vendor:
+                return {"error": f"Vendor {vendor_id} not found"}
+            
+            return self._vendor_details(vendor)
+            
+        except Exception as e:
+            return {"error": str(e)}
@@ -0,0 +1,85 @@
+# benchmarks/bench_async_routes.py
+"""Load test: requests/sec of the threadpool router vs the async (aiosqlite) router.
+
+The agent endpoint is exercised with a stand-in agent that waits --llm-latency seconds
+(time.sleep for invoke, asyncio.sleep for ainvoke), so the numbers reflect how many slow
+LLM calls one worker can keep in flight rather than Gemini's own throughput.
+
+Usage: python benchmarks/bench_async_routes.py [--requests 400] [--concurrency 200] [--llm-latency 1.0]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+from api import async_routes, routes  # noqa: E402
+from api.app import create_app  # noqa: E402
+from api.cache import response_cache  # noqa: E402
+from database.async_connection import async_engine  # noqa: E402
+
+
+class SlowAgent:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def invoke(self, payload):
+        time.sleep(self.latency)
+        return {"output": "ok"}
+
+    async def ainvoke(self, payload):
+        await asyncio.sleep(self.latency)
+        return {"output": "ok"}
+
+
+async def run_load(app, requests: int, concurrency: int, make_request) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            async with semaphore:
+                response = await make_request(client, i)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    # Pooled aiosqlite connections are bound to this event loop
+    await async_engine.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    agent = SlowAgent(args.llm_latency)
+    routes.create_workflow_agent = async_routes.create_workflow_agent = lambda: agent
+
+    scenarios = {
+        "agent-workflow": lambda client, i: client.post(
+            "/api/agent-workflow", json={"product_identifier": f"P{i}"}
+        ),
+        # Distinct cursors so every request misses the response cache and hits SQLite
+        "inventory pages": lambda client, i: client.get(f"/api/inventory?after_id={i}&limit=50"),
+    }
+    for name, make_request in scenarios.items():
+        for use_async in (False, True):
+            response_cache.clear()
+            elapsed = asyncio.run(run_load(create_app(use_async), args.requests, args.concurrency, make_request))
+            label = "async" if use_async else "sync "
+            print(f"{name:<16} {label}: {args.requests / elapsed:8.1f} req/s  ({elapsed:.2f}s "
+                  f"for {args.requests} requests, concurrency {args.concurrency})")
+
+
+if __name__ == "__main__":
+    main()
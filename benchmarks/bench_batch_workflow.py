@@ -0,0 +1,109 @@
+# benchmarks/bench_batch_workflow.py
+"""Gemini round trips and prompt size per product: one ReAct run per product vs the batched workflow.
+
+The batched side runs BatchWorkflow.decide on synthetic analyses with a stand-in model that
+answers every row. The ReAct side replays the trajectory the workflow prompt asks for
+(stock_analysis, vendor_lookup, send_order_email when reordering, final answer): every step
+is one model call whose input is the workflow prompt plus the scratchpad so far. Tokens are
+estimated as characters / 4 on both sides.
+
+Usage: python benchmarks/bench_batch_workflow.py [--products 1000 10000] [--reorder-fraction 0.3]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+from agents.batch_workflow import ROW_FIELDS, BatchWorkflow  # noqa: E402
+from agents.workflow_agent import WORKFLOW_PROMPT  # noqa: E402
+
+
+class StandInModel:
+    """Reorders every row it is shown, replying like the prompt asks"""
+
+    def __init__(self):
+        self.output_chars = 0
+
+    def invoke(self, prompt: str):
+        rows = [line.split("|") for line in prompt.splitlines() if line.count("|") == len(ROW_FIELDS) - 1]
+        reply = json.dumps([
+            {"product_id": row[0], "decision": "reorder", "quantity": int(row[6]), "reason": "Shortage"}
+            for row in rows[1:]  # first match is the field legend
+        ])
+        self.output_chars += len(reply)
+        return reply
+
+
+def synthetic_analyses(products: int, reorder_fraction: float, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    analyses = []
+    for i in range(products):
+        stock = int(rng.integers(0, 500))
+        demand = stock + int(rng.integers(1, 200)) if rng.random() < reorder_fraction else int(rng.integers(0, stock + 1))
+        required = max(0, demand - stock)
+        analyses.append({
+            "status": "reorder_needed" if required else "sufficient_stock",
+            "product_id": f"P{i:06d}", "product_name": f"Product {i}", "category_name": f"Category {i % 25}",
+            "current_stock": stock, "on_order": 0, "demand": demand, "required_stock": required,
+            "vendor_id": f"V{i % 60:03d}", "vendor_name": f"Vendor {i % 60}", "vendor_email": f"v{i % 60}@example.com",
+        })
+    return analyses
+
+
+def react_cost(analysis):
+    """(model calls, input chars, output chars) of one ReAct run for one product"""
+    question = (f"Analyze inventory and check if reordering is needed for product: "
+                f"{analysis['product_name']} ({analysis['category_name']}), demand {analysis['demand']}")
+    vendor = {k: analysis[k] for k in ("vendor_id", "vendor_name", "vendor_email")}
+    steps = [
+        ("stock_analysis", json.dumps({"product_name": analysis["product_name"],
+                                       "category": analysis["category_name"], "demand": analysis["demand"]}),
+         json.dumps({k: v for k, v in analysis.items() if k not in ("vendor_name", "vendor_email")})),
+        ("vendor_lookup", analysis["vendor_id"], json.dumps(vendor)),
+    ]
+    if analysis["status"] == "reorder_needed":
+        steps.append(("send_order_email", json.dumps({**vendor, "product_name": analysis["product_name"],
+                                                       "quantity": analysis["required_stock"],
+                                                       "product_id": analysis["product_id"]}),
+                      json.dumps({"status": "success", "message": "Order email sent"})))
+    scratchpad, calls, input_chars, output_chars = "", 0, 0, 0
+    for tool, tool_input, observation in steps:
+        input_chars += len(WORKFLOW_PROMPT.format(input=question, agent_scratchpad=scratchpad))
+        step = f"I should call {tool}.\nAction: {tool}\nAction Input: {tool_input}"
+        output_chars += len(step)
+        scratchpad += f"{step}\nObservation: {observation}\nThought: "
+        calls += 1
+    input_chars += len(WORKFLOW_PROMPT.format(input=question, agent_scratchpad=scratchpad))
+    output_chars += len("I now know the final answer\nFinal Answer: ") + 120
+    return calls + 1, input_chars, output_chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--reorder-fraction", type=float, default=0.3)
+    args = parser.parse_args()
+
+    for products in args.products:
+        analyses = synthetic_analyses(products, args.reorder_fraction)
+        react = np.array([react_cost(a) for a in analyses]).sum(axis=0)
+        model = StandInModel()
+        result = BatchWorkflow(model).decide(analyses)
+        batch = (result["llm_calls"], result["prompt_chars"], model.output_chars)
+        print(f"{products:,} products ({result['summary']['reorder']:,} reorders)")
+        for name, (calls, input_chars, output_chars) in (("react", react), ("batched", batch)):
+            tokens = (input_chars + output_chars) / 4
+            print(f"  {name:>8}: {calls:,} model calls ({calls / products:.3f}/product), "
+                  f"~{tokens:,.0f} tokens ({tokens / products:,.1f}/product)")
+        print(f"  reduction: {react[0] / max(batch[0], 1):,.0f}x calls, "
+              f"{(react[1] + react[2]) / max(batch[1] + batch[2], 1):,.1f}x tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_excel_readers.py
+"""Compare Excel engines on a large demand workbook: plain pd.read_excel vs the reader layer
+(openpyxl read-only streaming, calamine when installed, pandas) with column projection.
+
+Usage: python benchmarks/bench_excel_readers.py [--rows 200000] [--extra-columns 6]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+import pandas as pd  # noqa: E402
+from openpyxl import Workbook  # noqa: E402
+from pipeline.readers import DEMAND_SCHEMA, EXCEL_ENGINES, calamine_available, iter_table_batches  # noqa: E402
+
+
+def write_workbook(path: Path, rows: int, extra_columns: int) -> None:
+    """Demand sheet plus unrelated columns that projection should skip"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    extras = [f"note_{i}" for i in range(extra_columns)]
+    sheet.append(["store_id", "product_id", "Category", "product_name", "demand"] + extras)
+    categories = ["Electronics", "Clothing", "Furniture", "Toys", "Groceries"]
+    for i in range(rows):
+        sheet.append([f"S{i % 20}", f"P{i % 50000:06d}", categories[i % 5], f"Product {i % 50000}", i % 17]
+                     + [f"free text {i}"] * extra_columns)
+    workbook.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--extra-columns", type=int, default=6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "demand.xlsx"
+        start = time.perf_counter()
+        write_workbook(path, args.rows, args.extra_columns)
+        print(f"workbook: {args.rows:,} rows, {path.stat().st_size / 1e6:.1f} MB "
+              f"(written in {time.perf_counter() - start:.1f}s)")
+
+        start = time.perf_counter()
+        baseline = pd.read_excel(path)
+        elapsed = time.perf_counter() - start
+        print(f"{'pd.read_excel (all columns)':<32} {elapsed:7.2f}s  {len(baseline) / elapsed:10,.0f} rows/s")
+        expected = int(baseline["demand"].sum())
+        del baseline
+
+        for engine in EXCEL_ENGINES:
+            if engine == "calamine" and not calamine_available():
+                print(f"{'calamine':<32}  skipped (pip install python-calamine)")
+                continue
+            start = time.perf_counter()
+            rows = demand = batches = 0
+            for batch in iter_table_batches(path, path.name, DEMAND_SCHEMA, engine=engine):
+                rows += len(batch)
+                demand += int(batch["demand"].sum())
+                batches += 1
+            elapsed = time.perf_counter() - start
+            assert rows == args.rows and demand == expected, (engine, rows, demand)
+            print(f"{engine + ' (projected, batched)':<32} {elapsed:7.2f}s  {rows / elapsed:10,.0f} rows/s"
+                  f"  ({batches} batches)")
+
+
+if __name__ == "__main__":
+    main()
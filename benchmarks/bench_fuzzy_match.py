@@ -0,0 +1,109 @@
+# benchmarks/bench_fuzzy_match.py
+"""Per-query latency of close-match suggestions (pipeline.fuzzy_match) on a large catalogue.
+
+Builds a TrigramIndex over synthetic product names that share common words (so some trigrams
+are in most names), then times batches of missing names: typos of catalogue names and names
+that match nothing. For a sample of the queries, the suggestions are compared with exact
+Dice scores over the whole catalogue. Peak RSS covers the whole run.
+
+Usage: python benchmarks/bench_fuzzy_match.py [--items 100000] [--queries 100 1000 5000]
+"""
+import argparse
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+from pipeline.fuzzy_match import TrigramIndex  # noqa: E402
+
+WORDS = ["classic", "premium", "cotton", "steel", "wooden", "leather", "wireless", "organic", "large",
+         "small", "blue", "black", "white", "chair", "table", "sweater", "jacket", "speaker", "lamp",
+         "sofa", "shelf", "mug", "bottle", "cable", "charger", "pillow", "blanket", "desk", "rug"]
+
+
+def synthetic_catalogue(items: int, seed: int = 5) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS, dtype=object)
+    picks = rng.integers(0, len(WORDS), (items, 3))
+    names = [f"{words[a]} {words[b]} {words[c]} {code:x}"
+             for (a, b, c), code in zip(picks.tolist(), rng.integers(0x1000, 0xFFFFF, items).tolist())]
+    return pd.DataFrame({"product_id": [f"P{i:07d}" for i in range(items)], "product_name": names,
+                         "category_name": "General", "vendor_id": [f"V{i % 500:03d}" for i in range(items)]})
+
+
+def missing_names(catalogue: pd.DataFrame, count: int, seed: int = 9):
+    """Half typos of catalogue names (one character dropped), half made-up names"""
+    rng = np.random.default_rng(seed)
+    names = catalogue["product_name"].to_numpy()[rng.integers(0, len(catalogue), count)]
+    out = []
+    for i, name in enumerate(names.tolist()):
+        if i % 2:
+            cut = int(rng.integers(0, len(name)))
+            out.append(name[:cut] + name[cut + 1:])
+        else:
+            out.append(f"unknown gadget {int(rng.integers(0, 10**6))}")
+    return out
+
+
+def exact_scores(catalogue_grams, name: str, top_k: int, min_score: float):
+    """Top-k Dice scores over the whole catalogue, computed pair by pair"""
+    padded = "  " + " ".join(name.lower().split()) + " "
+    query = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    scores = sorted((2 * len(query & grams) / (len(query) + len(grams)) for grams in catalogue_grams), reverse=True)
+    return [round(score, 3) for score in scores[:top_k] if score >= min_score]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, nargs="+", default=[100, 1_000, 5_000])
+    parser.add_argument("--recall-sample", type=int, default=50)
+    parser.add_argument("--min-score", type=float, default=0.3)
+    args = parser.parse_args()
+
+    catalogue = synthetic_catalogue(args.items)
+    start = time.perf_counter()
+    index = TrigramIndex(catalogue)
+    print(f"{args.items:,} items: index built in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({len(index.vocabulary):,} trigrams)")
+
+    for count in args.queries:
+        names = missing_names(catalogue, count)
+        index.suggest(names[:10], 3, args.min_score)
+        start = time.perf_counter()
+        results = index.suggest(names, 3, args.min_score)
+        elapsed = time.perf_counter() - start
+        found = sum(bool(r) for r in results)
+        print(f"  {count:>6,} names: {elapsed * 1000:8.1f} ms  {elapsed / count * 1000:.3f} ms/name  "
+              f"{found:,} with suggestions")
+
+    print(f"  peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+    names = missing_names(catalogue, args.recall_sample, seed=11)
+    grams = []
+    for name in catalogue["product_name"].tolist():
+        padded = "  " + name.lower() + " "
+        grams.append({padded[i:i + 3] for i in range(len(padded) - 2)})
+    results = index.suggest(names, 3, args.min_score)
+    best = top = total = 0
+    for name, result in zip(names, results):
+        exact = exact_scores(grams, name, 3, args.min_score)
+        scores = [match["score"] for match in result]
+        if exact:
+            total += 1
+            best += scores[:1] == exact[:1]
+            top += scores == exact
+    # Matches that share only stop-grams with a name are not candidates, so lower ranks can differ
+    print(f"  vs exhaustive scoring of {len(names)} sampled names ({total} with a match): "
+          f"best match {best}/{total}, all top-3 scores {top}/{total}")
+
+
+if __name__ == "__main__":
+    main()
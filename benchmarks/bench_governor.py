@@ -0,0 +1,149 @@
+# benchmarks/bench_governor.py
+"""Outbound call governor against local stubs that throttle or go down.
+
+smtp:   the SMTP stub accepts --stub-rate messages/sec and answers 421 beyond that (as Gmail
+        does); a burst of --messages is sent without a governor and with one whose rate limit
+        is set too high (--rate), so AIMD has to find the provider's real rate.
+gemini: --callers threads call an API stub that allows --stub-rate calls/sec and raises
+        HTTP 429 beyond that, without and with a governor.
+outage: the SMTP server is gone; repeated sends fail until the circuit opens, then fail fast.
+
+Usage: python benchmarks/bench_governor.py [--messages 200] [--stub-rate 50] [--rate 200] [--callers 32]
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "benchmarks"))
+
+from bench_mail_pipeline import SMTPStub, orders  # noqa: E402
+from pipeline.governor import Governor, TokenBucket  # noqa: E402
+from pipeline.mailer import MailPipeline  # noqa: E402
+from pipeline.orders import order_mail, order_template  # noqa: E402
+
+
+class ThrottlingSMTPStub(SMTPStub):
+    def __init__(self, rate: float):
+        super().__init__(0.0)
+        self.bucket = TokenBucket(rate, burst=5)
+
+    def accept_mail(self) -> bool:
+        return self.bucket.try_take()
+
+
+class APIError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ThrottlingAPI:
+    """Stand-in for Gemini: --stub-rate calls/sec, 429 beyond that, 20 ms per call"""
+
+    def __init__(self, rate: float):
+        self.bucket = TokenBucket(rate, burst=5)
+
+    def generate(self, prompt: str) -> str:
+        if not self.bucket.try_take():
+            raise APIError(429)
+        time.sleep(0.02)
+        return prompt.upper()
+
+
+def smtp_config(port: int):
+    return {
+        "smtp_server": "127.0.0.1", "smtp_port": port, "sender_email": "po@example.com",
+        "sender_password": "", "sender_from": "po@example.com", "smtp_security": "none",
+    }
+
+
+def report(name: str, results, elapsed: float, governor: Optional[Governor]) -> None:
+    sent = sum(r in ("Sent", "ok") for r in results)
+    if governor is None:
+        print(f"  {name:<11} delivered {sent}/{len(results)} in {elapsed:.2f}s  throttled={len(results) - sent}")
+        return
+    metrics = governor.metrics()
+    print(f"  {name:<11} delivered {sent}/{len(results)} in {elapsed:.2f}s  throttled={metrics['throttled']} "
+          f"retries={metrics['retries']} rejected={metrics['rejected']} "
+          f"rate_limit={metrics['rate_limit']} concurrency_limit={metrics['concurrency_limit']:g} "
+          f"circuit={metrics['circuit']}")
+
+
+def run_smtp(args) -> None:
+    print("smtp (stub accepts %g msg/s)" % args.stub_rate)
+    mails = [order_mail(vendor, order) for vendor, order in orders(args.messages)]
+    for name, governor in (
+        ("ungoverned", Governor("smtp", max_concurrency=10 ** 6, retries=0)),
+        ("governed", Governor("smtp", rate=args.rate, burst=5, retries=6, backoff=0.05)),
+    ):
+        stub = ThrottlingSMTPStub(args.stub_rate)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        config = smtp_config(stub.server_address[1])
+        start = time.perf_counter()
+        results = MailPipeline(config, order_template(config["sender_from"]), governor=governor).send(mails)
+        report(name, results, time.perf_counter() - start, governor)
+        stub.shutdown()
+        stub.server_close()
+
+
+def run_gemini(args) -> None:
+    print("gemini (stub allows %g calls/s, %d concurrent callers)" % (args.stub_rate, args.callers))
+    for name, governor in (
+        ("ungoverned", None),
+        ("governed", Governor("gemini", rate=args.rate, burst=5, max_concurrency=8, retries=6, backoff=0.05)),
+    ):
+        api = ThrottlingAPI(args.stub_rate)
+
+        def one(i: int) -> str:
+            try:
+                if governor is None:
+                    api.generate(f"prompt {i}")
+                else:
+                    governor.call(api.generate, f"prompt {i}")
+                return "ok"
+            except Exception as e:
+                return str(e)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.callers) as pool:
+            results = list(pool.map(one, range(args.messages)))
+        report(name, results, time.perf_counter() - start, governor)
+
+
+def run_outage(args) -> None:
+    print("outage (nothing listening; one pipeline run per order, as repeated UI sends do)")
+    stub = SMTPStub(0.0)
+    port = stub.server_address[1]
+    stub.server_close()
+    governor = Governor("smtp", failure_threshold=5, reset_after=30.0)
+    config = smtp_config(port)
+    mails = [order_mail(vendor, order) for vendor, order in orders(20)]
+    start = time.perf_counter()
+    results = [MailPipeline(config, order_template(config["sender_from"]), governor=governor).send([mail])[0]
+               for mail in mails]
+    report("20 sends", results, time.perf_counter() - start, governor)
+    print(f"  last result: {results[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--stub-rate", type=float, default=50.0)
+    parser.add_argument("--rate", type=float, default=200.0, help="governor rate limit (set above the stub's)")
+    parser.add_argument("--callers", type=int, default=32)
+    args = parser.parse_args()
+
+    run_smtp(args)
+    run_gemini(args)
+    run_outage(args)
+
+
+if __name__ == "__main__":
+    main()
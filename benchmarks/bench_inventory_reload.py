@@ -0,0 +1,213 @@
+# benchmarks/bench_inventory_reload.py
+"""Reader latency while the inventory is reloaded: the previous init_db vs shadow tables + swap.
+
+"legacy" is the previous init_db: DELETE both tables and re-add every row through the ORM
+in one transaction, in the default rollback-journal mode. "swap" is reload_tables: shadow
+tables filled in chunks, one rename transaction, WAL. Reader processes keep running an
+inventory count plus an indexed product/vendor lookup, first idle and then for the whole
+reload; reads that see an empty table or fail with "database is locked" are counted.
+
+Each scenario runs in its own subprocess on a scratch database, because the journal mode
+and DATABASE_URL are fixed when database.models is imported.
+
+Usage: python benchmarks/bench_inventory_reload.py [--rows 50000] [--readers 2]
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+COUNT = "SELECT COUNT(*) FROM inventory_data"
+LOOKUP = ("SELECT i.stock, v.email FROM inventory_data i JOIN vendor_list v ON v.vendor_id = i.vendor_id "
+          "WHERE i.product_id = :product_id")
+
+
+def frames(rows: int, vendors: int, seed: int):
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    categories = ["Electronics", "Clothing", "Furniture", "Toys", "Groceries"]
+    stock = pd.DataFrame({
+        "product_id": [f"P{i:07d}" for i in range(rows)],
+        "Category_name": [categories[i % len(categories)] for i in range(rows)],
+        "product_name": [f"Product {i}" for i in range(rows)],
+        "vendor_id": [f"V{i % vendors:04d}" for i in range(rows)],
+        "stock": rng.integers(0, 500, rows),
+    })
+    vendor = pd.DataFrame({
+        "vendor_id": [f"V{i:04d}" for i in range(vendors)],
+        "vendor_name": [f"Vendor {i}" for i in range(vendors)],
+        "Location": ["Pune"] * vendors,
+        "email": [f"v{i}@example.com" for i in range(vendors)],
+        "contact": ["000"] * vendors,
+    })
+    return stock, vendor
+
+
+def reader(url: str, rows: int, stop, results) -> None:
+    """Reader process: latency of each read, plus empty and failed reads"""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import OperationalError
+    engine = create_engine(url)
+    rng = np.random.default_rng(os.getpid())
+    latencies, empty, failed = [], 0, 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                if not conn.execute(text(COUNT)).scalar():
+                    empty += 1
+                conn.execute(text(LOOKUP), {"product_id": f"P{int(rng.integers(rows)):07d}"}).first()
+        except OperationalError:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+    results.put((latencies, empty, failed))
+
+
+def measure(url: str, rows: int, readers: int, work, seconds: float = 0.0, deadline: float = 0.0):
+    """Run `work` (or sleep `seconds`) with reader processes running; returns (elapsed, read stats).
+
+    If `work` is still running after `deadline` seconds the readers are stopped and it is
+    left to finish alone; the caller is told via the returned `outcome`.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    stop, results = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=reader, args=(url, rows, stop, results)) for _ in range(readers)]
+    for p in procs:
+        p.start()
+    time.sleep(2.0)  # let the readers import and connect
+    start = time.perf_counter()
+    outcome = ""
+    errors = []
+
+    def run_work():
+        try:
+            work()
+        except Exception as e:
+            errors.append(e)
+
+    if work:
+        worker = threading.Thread(target=run_work)
+        worker.start()
+        worker.join(deadline or None)
+        if worker.is_alive():
+            outcome = "the reload could not commit while readers ran; it finished only after they were stopped"
+    else:
+        time.sleep(seconds)
+    stop.set()
+    collected = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    if work:
+        worker.join()
+    if errors:
+        outcome = f"the reload failed: {str(errors[0]).splitlines()[0]}"
+    elapsed = time.perf_counter() - start
+    latencies = np.concatenate([np.array(c[0]) for c in collected]) * 1000
+    return elapsed, latencies, sum(c[1] for c in collected), sum(c[2] for c in collected), outcome
+
+
+def legacy_reload(stock, vendor):
+    """The previous init_db body: delete, add row by row, one transaction"""
+    from database.models import InventoryData, SessionLocal, VendorList, bump_generation, reset_stock_levels
+    db = SessionLocal()
+    try:
+        db.query(InventoryData).delete()
+        db.query(VendorList).delete()
+        for _, row in stock.iterrows():
+            db.add(InventoryData(product_id=row['product_id'], category_name=row['Category_name'],
+                                 product_name=row['product_name'], vendor_id=row['vendor_id'],
+                                 stock=int(row['stock'])))
+        for _, row in vendor.iterrows():
+            db.add(VendorList(vendor_id=row['vendor_id'], vendor_name=row['vendor_name'],
+                              location=row['Location'], email=row['email'], contact=row['contact']))
+        db.flush()
+        reset_stock_levels(db)
+        bump_generation(db, "inventory")
+        db.commit()
+    finally:
+        db.close()
+
+
+def swap_reload(stock, vendor):
+    from database.models import InventoryData, VendorList, _records, reload_tables, reset_stock_levels
+    reload_tables([
+        (InventoryData.__table__, _records(stock, {
+            "product_id": "product_id", "Category_name": "category_name", "product_name": "product_name",
+            "vendor_id": "vendor_id", "stock": "stock"})),
+        (VendorList.__table__, _records(vendor, {
+            "vendor_id": "vendor_id", "vendor_name": "vendor_name", "Location": "location",
+            "email": "email", "contact": "contact"})),
+    ], after_swap=reset_stock_levels)
+
+
+def summary(label: str, elapsed: float, latencies, empty: int, failed: int, outcome: str = "") -> str:
+    line = (f"  {label:<16} {elapsed:6.2f}s  {len(latencies):7,} reads  p50 {np.percentile(latencies, 50):7.2f} ms  "
+            f"p99 {np.percentile(latencies, 99):8.2f} ms  max {latencies.max():8.1f} ms  "
+            f"empty {empty:,}  locked {failed:,}")
+    if outcome:
+        line += f"\n  ({outcome})"
+    return line
+
+
+def run_scenario(args) -> None:
+    """Child process: one scenario on its own scratch database"""
+    from sqlalchemy import insert
+    from database.models import Base, InventoryData, VendorList, engine, _records
+    url = os.environ["DATABASE_URL"]
+    Base.metadata.create_all(bind=engine)
+    stock, vendor = frames(args.rows, args.vendors, seed=1)
+    with engine.begin() as conn:
+        conn.execute(insert(InventoryData), _records(stock, {
+            "product_id": "product_id", "Category_name": "category_name", "product_name": "product_name",
+            "vendor_id": "vendor_id", "stock": "stock"}))
+        conn.execute(insert(VendorList), _records(vendor, {
+            "vendor_id": "vendor_id", "vendor_name": "vendor_name", "Location": "location",
+            "email": "email", "contact": "contact"}))
+    with engine.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    new_stock, new_vendor = frames(args.rows, args.vendors, seed=2)
+    reload = legacy_reload if args.scenario == "legacy" else swap_reload
+    print(f"{args.scenario} (journal_mode={mode})", flush=True)
+    print(summary("idle", *measure(url, args.rows, args.readers, None, args.idle)), flush=True)
+    print(summary("during reload", *measure(url, args.rows, args.readers, lambda: reload(new_stock, new_vendor),
+                                            deadline=args.deadline)), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--vendors", type=int, default=500)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--idle", type=float, default=3.0, help="seconds of reads without a reload, for reference")
+    parser.add_argument("--deadline", type=float, default=60.0,
+                        help="seconds after which readers are stopped if the reload has not finished")
+    parser.add_argument("--scenario", choices=["legacy", "swap"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_scenario(args)
+        return
+    print(f"{args.rows:,} products, {args.vendors} vendors, {args.readers} reader processes, {os.cpu_count()} CPUs",
+          flush=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        for scenario in ("legacy", "swap"):
+            env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp}/{scenario}.db",
+                   "SQLITE_WAL": "true" if scenario == "swap" else "false",
+                   "SNAPSHOT_DIR": f"{tmp}/snapshots"}
+            argv = [arg for arg in sys.argv[1:]] + ["--scenario", scenario]
+            subprocess.run([sys.executable, __file__, *argv], env=env, check=True)
+
+
+if __name__ == "__main__":
+    main()
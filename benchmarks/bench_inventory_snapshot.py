@@ -0,0 +1,83 @@
+# benchmarks/bench_inventory_snapshot.py
+"""Memory and lookup cost of ORM inventory lists vs the array-backed InventorySnapshot,
+built in-process or published once and memory-mapped (as every extra worker does).
+
+Usage: python benchmarks/bench_inventory_snapshot.py [--rows 200000]
+"""
+import argparse
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from database.models import Base, InventoryData  # noqa: E402
+from pipeline.snapshot import InventorySnapshot, load_inventory_snapshot  # noqa: E402
+
+
+def measure(label, build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed:6.2f}s  {current / 1e6:8.1f} MB retained")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--vendors", type=int, default=500)
+    args = parser.parse_args()
+
+    categories = ["Electronics", "Clothing", "Furniture", "Toys", "Groceries"]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(insert(InventoryData), [
+                {"product_id": f"P{i:07d}", "category_name": categories[i % len(categories)],
+                 "product_name": f"Product {i}", "vendor_id": f"V{i % args.vendors:04d}", "stock": i % 300}
+                for i in range(args.rows)
+            ])
+        Session = sessionmaker(bind=engine)
+
+        with Session() as db:
+            items = measure("ORM list (query().all())", lambda: db.query(InventoryData).all())
+            start = time.perf_counter()
+            by_id = {i.product_id.strip(): i for i in items}
+            hits = sum(1 for i in range(0, args.rows, 7) if by_id.get(f"P{i:07d}"))
+            print(f"{'  dict index + lookups':<28} {time.perf_counter() - start:6.2f}s  ({hits} hits)")
+            del items, by_id
+
+        with Session() as db:
+            snapshot = measure("InventorySnapshot", lambda: load_inventory_snapshot(db))
+            start = time.perf_counter()
+            hits = sum(1 for i in range(0, args.rows, 7) if snapshot.find_by_id(f"P{i:07d}"))
+            print(f"{'  lookups':<28} {time.perf_counter() - start:6.2f}s  ({hits} hits)")
+
+        published = Path(tmp) / "snapshot"
+        start = time.perf_counter()
+        snapshot.save(published)
+        print(f"{'  publish (save)':<28} {time.perf_counter() - start:6.2f}s")
+        del snapshot
+        mapped = measure("Mapped snapshot (per worker)", lambda: InventorySnapshot.open(published))
+        start = time.perf_counter()
+        hits = sum(1 for i in range(0, args.rows, 7) if mapped.find_by_id(f"P{i:07d}"))
+        print(f"{'  lookups':<28} {time.perf_counter() - start:6.2f}s  ({hits} hits)")
+        del mapped
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/bench_mail_pipeline.py
+"""Messages/sec for purchase order emails, end to end, against a local SMTP stub.
+
+"inline" is the old path: build a MIMEMultipart, as_string() and a fresh connection per
+message. "pipeline" is pipeline.mailer: compiled template, batched rendering in the
+background and one connection for the whole run. The stub can add --latency seconds per
+command to stand in for a remote server.
+
+Usage: python benchmarks/bench_mail_pipeline.py [--messages 500] [--latency 0.0] [--workers 1]
+"""
+import argparse
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+from pipeline.governor import Governor  # noqa: E402
+from pipeline.mailer import MailPipeline  # noqa: E402
+from pipeline.orders import ORDER_BODY, ORDER_SUBJECT, order_mail, order_template  # noqa: E402
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """Accepts any message and counts it; just enough SMTP for smtplib"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency: float):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.latency = latency
+        self.received = 0
+        self.lock = threading.Lock()
+
+    def accept_mail(self) -> bool:
+        """Whether to take the next message; throttling stubs answer 421 when this is False"""
+        return True
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self) -> None:
+        self.reply("220 stub ready")
+        for raw in self.rfile:
+            command = raw.decode(errors="replace").strip().upper()
+            if command.startswith("EHLO"):
+                self.wfile.write(b"250-stub\r\n")
+                self.reply("250 SIZE 10000000")
+            elif command.startswith("MAIL") and not self.server.accept_mail():
+                # Like Gmail's rate limiting: 421 and the connection is closed
+                self.reply("421 4.7.0 Try again later, closing connection")
+                return
+            elif command == "DATA":
+                self.reply("354 end with .")
+                for line in self.rfile:
+                    if line in (b".\r\n", b".\n"):
+                        break
+                with self.server.lock:
+                    self.server.received += 1
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+def orders(count: int):
+    return [
+        ({"vendor_name": f"Vendor {i % 40}", "email": f"vendor{i % 40}@example.com"},
+         {"product_name": f"Product {i}", "product_id": f"P{i:06d}", "shortage": 5 + i % 20})
+        for i in range(count)
+    ]
+
+
+def send_inline(config, pairs):
+    """The previous send_order_email: build, serialize and connect per message"""
+    for vendor, order in pairs:
+        mail = order_mail(vendor, order)
+        msg = MIMEMultipart()
+        msg['From'] = f"Inventory Agent <{config['sender_from']}>"
+        msg['To'] = mail.to
+        msg['Subject'] = ORDER_SUBJECT.format(**mail.fields)
+        msg.attach(MIMEText(ORDER_BODY.format(**mail.fields), 'plain'))
+        with smtplib.SMTP(config['smtp_server'], config['smtp_port'], timeout=20) as server:
+            server.ehlo()
+            server.sendmail(config['sender_from'], [mail.to], msg.as_string())
+
+
+def send_pipeline(config, pairs, workers):
+    mails = [order_mail(vendor, order) for vendor, order in pairs]
+    # Unlimited governor: this measures the pipeline, not the configured SMTP rate limit
+    results = MailPipeline(config, order_template(config['sender_from']), workers=workers,
+                           governor=Governor("smtp-bench")).send(mails)
+    assert all(r == "Sent" for r in results), results[:3]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    stub = SMTPStub(args.latency)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    config = {
+        "smtp_server": "127.0.0.1", "smtp_port": stub.server_address[1],
+        "sender_email": "po@example.com", "sender_password": "", "sender_from": "po@example.com",
+        "smtp_security": "none",
+    }
+    pairs = orders(args.messages)
+    for name, run in (("inline", lambda: send_inline(config, pairs)),
+                      ("pipeline", lambda: send_pipeline(config, pairs, args.workers))):
+        before = stub.received
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8}: {stub.received - before:,} messages in {elapsed:.2f}s  "
+              f"{args.messages / elapsed:,.0f} msg/s")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/bench_paging.py
+"""Compare the per-rerun cost of sending a whole upload to the browser with sending one page.
+
+st.dataframe serializes its frame to Arrow on every rerun; this times that serialization for
+the full frame and for a single page, plus the one-off filter/sort that builds a paged view.
+
+Usage: python benchmarks/bench_paging.py [--sizes 10000 100000 1000000] [--page-size 100]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pyarrow as pa
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "benchmarks"))
+
+from bench_validation import synthetic_upload  # noqa: E402
+from pipeline.paging import page_frame, table_view  # noqa: E402
+
+
+def arrow_bytes(df) -> int:
+    """Serialize like st.dataframe does and return the payload size"""
+    table = pa.Table.from_pandas(df.astype(str))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - start, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    for rows in args.sizes:
+        df = synthetic_upload(rows, 0.0)
+        full, full_size = timed(lambda: arrow_bytes(df))
+        view_time, positions = timed(lambda: table_view(df, "product 12", "demand", ascending=False))
+        page, page_size = timed(lambda: arrow_bytes(page_frame(df, positions, 2, args.page_size)))
+        print(f"{rows:>9,} rows  full frame {full:.3f}s ({full_size / 1e6:.1f} MB)  "
+              f"view build {view_time:.3f}s ({len(positions):,} matching)  "
+              f"page {page * 1000:.2f}ms ({page_size / 1e3:.1f} kB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_parallel_forecast.py
+"""Scaling benchmark for forecast / reorder-point computation (1..N worker processes).
+
+Usage: python benchmarks/bench_parallel_forecast.py [--products 200000] [--stores 2] [--days 365] [--max-workers 8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+from pipeline.forecast import (  # noqa: E402
+    POINT_FIELDS, DemandMatrix, compute_reorder_points, compute_reorder_points_parallel
+)
+
+
+def synthetic_matrix(path: str, products: int, stores: int, days: int, seed: int = 7) -> DemandMatrix:
+    """Memory-mapped (store, product) x day matrix with Poisson demand of varying level"""
+    rng = np.random.default_rng(seed)
+    series = products * stores
+    values = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(series, days))
+    for start in range(0, series, 50_000):
+        rows = min(50_000, series - start)
+        level = rng.gamma(2.0, 5.0, (rows, 1))
+        values[start:start + rows] = rng.poisson(level, (rows, days))
+    values.flush()
+    product_ids = np.char.add("P", (np.arange(series) % products).astype(str))
+    keys = pd.DataFrame({
+        "store_id": np.char.add("S", (np.arange(series) // products).astype(str)),
+        "product_key": product_ids, "product_id": product_ids,
+        "product_name": product_ids, "category_name": "",
+    })
+    return DemandMatrix(keys, pd.period_range("2025-01-01", periods=days, freq="D"), values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--stores", type=int, default=2)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        matrix = synthetic_matrix(str(Path(tmp) / "demand.npy"), args.products, args.stores, args.days)
+        series = len(matrix)
+        print(f"matrix: {series:,} series x {args.days} days ({matrix.values.nbytes / 1e9:.2f} GB float32)")
+
+        start = time.perf_counter()
+        reference = compute_reorder_points(matrix.values)
+        single = time.perf_counter() - start
+        print(f"in-process: {single:.2f}s ({series / single:,.0f} series/s)")
+
+        workers = 1
+        baseline = None
+        while workers <= args.max_workers:
+            start = time.perf_counter()
+            points = compute_reorder_points_parallel(matrix.values, matrix.keys["product_key"], workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            for field in POINT_FIELDS:
+                np.testing.assert_allclose(points[field], reference[field], rtol=1e-6)
+            print(f"workers={workers:>2}: {elapsed:.2f}s  {series / elapsed:,.0f} series/s  "
+                  f"speedup x{baseline / elapsed:.2f}  (identical to in-process result)")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_sharded_aggregation.py
+"""Scaling benchmark for parallel shard aggregation (1..N worker processes).
+
+Usage: python benchmarks/bench_sharded_aggregation.py [--shards 16] [--rows 250000] [--max-workers 8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+from pipeline.demand import aggregate_demand  # noqa: E402
+from pipeline.sharding import aggregate_shards, collect_demand_sources  # noqa: E402
+from pipeline.validation import validate_demand  # noqa: E402
+
+
+def write_shards(directory: Path, shards: int, rows: int, products: int, seed: int = 7) -> None:
+    rng = np.random.default_rng(seed)
+    categories = np.array(["Electronics", "Clothing", "Furniture", "Toys", "Groceries"])
+    for shard in range(shards):
+        ids = rng.integers(0, products, rows)
+        pd.DataFrame({
+            "store_id": [f"S{shard:03d}"] * rows,
+            "product_id": np.char.add("P", ids.astype(str)),
+            "Category": categories[ids % len(categories)],
+            "product_name": np.char.add("Product ", ids.astype(str)),
+            "demand": rng.integers(0, 100, rows),
+        }).to_csv(directory / f"region_{shard:03d}.csv", index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--rows", type=int, default=250_000, help="rows per shard")
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        write_shards(directory, args.shards, args.rows, args.products)
+        shards = collect_demand_sources(directory)
+        total_rows = args.shards * args.rows
+
+        # Reference: one pass over the concatenated files, validated like the shards
+        start = time.perf_counter()
+        reference = aggregate_demand(validate_demand(pd.concat([pd.read_csv(s) for s in shards], ignore_index=True))[0])
+        single = time.perf_counter() - start
+        print(f"single file path: {single:.2f}s ({total_rows / single:,.0f} rows/s)")
+
+        workers = 1
+        baseline = None
+        while workers <= args.max_workers:
+            start = time.perf_counter()
+            aggregated, _, rows, _ = aggregate_shards(shards, max_workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            pd.testing.assert_frame_equal(aggregated, reference)
+            print(f"workers={workers:>2}: {elapsed:.2f}s  {rows / elapsed:,.0f} rows/s  "
+                  f"speedup x{baseline / elapsed:.2f}  (identical to single-file result)")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_shortage_ranking.py
+"""Top-N shortages by partial selection (pipeline.ranking) vs sorting the whole list.
+
+For each ranking, times sorted() over the order dicts and a full np.lexsort over the same
+key arrays, then ShortageRanking.top for the first page and for a deep page. Building the
+ranking (pulling the fields into arrays) is timed separately, since the UI and the API keep
+it per result. Every page is checked against the fully sorted order.
+
+Usage: python benchmarks/bench_shortage_ranking.py [--orders 100000 1000000] [--limit 100]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+from pipeline.ranking import RANKINGS, ShortageRanking  # noqa: E402
+
+
+def synthetic_orders(count: int, vendors: int, seed: int = 3):
+    """orders_to_send-shaped dicts: skewed shortages, many ties, some rows without a vendor"""
+    rng = np.random.default_rng(seed)
+    demand = rng.integers(1, 500, count)
+    shortage = np.minimum(demand, rng.zipf(1.6, count))
+    vendor = rng.integers(0, vendors, count)
+    return [{"product_id": f"P{i:07d}", "vendor_id": f"V{v:04d}" if v else None,
+             "demand": int(d), "shortage": int(s)}
+            for i, (d, s, v) in enumerate(zip(demand.tolist(), shortage.tolist(), vendor.tolist()))]
+
+
+def python_key(by: str, orders):
+    """sort key for sorted(): the same order ShortageRanking.keys describes"""
+    if by == "shortage":
+        return lambda i: (-orders[i]["shortage"], i)
+    if by == "shortage_ratio":
+        def ratio(o):
+            if not o["shortage"]:
+                return 0.0
+            return o["shortage"] / o["demand"] if o["demand"] > 0 else 1.0
+        return lambda i: (-ratio(orders[i]), -orders[i]["shortage"], i)
+    totals = {}
+    for o in orders:
+        totals[o["vendor_id"] or ""] = totals.get(o["vendor_id"] or "", 0) + o["shortage"]
+    return lambda i: ((orders[i]["vendor_id"] or "") == "", -totals[orders[i]["vendor_id"] or ""],
+                      orders[i]["vendor_id"] or "", -orders[i]["shortage"], i)
+
+
+def timed(fn, repeat: int = 3):
+    best, value = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--vendors", type=int, default=2_000)
+    parser.add_argument("--limit", type=int, default=100, help="page size")
+    parser.add_argument("--deep-page", type=int, default=50, help="page number for the deep-page timing")
+    args = parser.parse_args()
+
+    for count in args.orders:
+        orders = synthetic_orders(count, args.vendors)
+        build, ranking = timed(lambda: ShortageRanking(orders), repeat=1)
+        print(f"{count:,} orders (ranking built in {build * 1000:.0f} ms)")
+        for by in RANKINGS:
+            keys = ranking.keys(by)
+            full_py, reference = timed(lambda: sorted(range(count), key=python_key(by, orders)), repeat=1)
+            full_np, _ = timed(lambda: np.lexsort([np.arange(count)] + list(reversed(keys))))
+            first, top = timed(lambda: ranking.top(by, args.limit))
+            offset = (args.deep_page - 1) * args.limit
+            deep, page = timed(lambda: ranking.top(by, args.limit, offset))
+            ok = (top.tolist() == reference[:args.limit]
+                  and page.tolist() == reference[offset:offset + args.limit])
+            print(f"  {by:<15} sorted() {full_py * 1000:8.0f} ms  lexsort {full_np * 1000:7.1f} ms  "
+                  f"top {args.limit} {first * 1000:6.1f} ms  page {args.deep_page} {deep * 1000:6.1f} ms  "
+                  f"[{'ok' if ok else 'MISMATCH'}]")
+
+
+if __name__ == "__main__":
+    main()
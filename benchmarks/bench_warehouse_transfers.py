@@ -0,0 +1,100 @@
+# benchmarks/bench_warehouse_transfers.py
+"""Transfer planning time as warehouses are added: one pass (pipeline.warehouses) vs a pass per warehouse.
+
+Each warehouse holds stock for --coverage of the catalogue; --orders shortages (one per
+product) are covered nearest warehouse first. "per warehouse" walks the warehouses in
+distance order and reindexes the remaining shortages against each one's stock, which is
+how matching against several stock tables looks without a combined layout. "one pass" is
+WarehouseNetwork.plan over the stock of every warehouse at once. Building the network (done
+once per stock reload) is timed separately. Both plans are checked to move the same units.
+
+Usage: python benchmarks/bench_warehouse_transfers.py [--warehouses 1 4 16 64] [--products 200000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+from pipeline.warehouses import WarehouseNetwork, rank_warehouses  # noqa: E402
+
+
+def synthetic_network(warehouses: int, products: int, coverage: float, seed: int = 11):
+    """Local warehouse plus `warehouses` others around it, and each one's stock rows"""
+    rng = np.random.default_rng(seed)
+    registry = pd.DataFrame({
+        "warehouse_id": ["LOCAL"] + [f"W{i:03d}" for i in range(warehouses)],
+        "warehouse_name": "",
+        "location": ["Chennai"] + [f"City {i}" for i in range(warehouses)],
+        "latitude": np.concatenate([[13.08], rng.uniform(8, 30, warehouses)]),
+        "longitude": np.concatenate([[80.27], rng.uniform(70, 90, warehouses)]),
+    })
+    frames = []
+    for warehouse_id in registry["warehouse_id"][1:]:
+        held = np.flatnonzero(rng.random(products) < coverage)
+        frames.append(pd.DataFrame({
+            "warehouse_id": warehouse_id,
+            "product_id": [f"P{i:07d}" for i in held],
+            "stock": rng.integers(0, 40, len(held)),
+        }))
+    return rank_warehouses(registry, "Chennai"), pd.concat(frames, ignore_index=True)
+
+
+def per_warehouse(ranked: pd.DataFrame, stock: pd.DataFrame, orders):
+    """Units moved per (product, warehouse), visiting the warehouses one by one"""
+    remaining = pd.DataFrame(orders).groupby("product_id", sort=False)["shortage"].sum()
+    shards = dict(tuple(stock.groupby("warehouse_id", sort=False)))
+    moved = {}
+    for warehouse_id in ranked.sort_values("rank").loc[lambda r: r["source"], "warehouse_id"]:
+        shard = shards.get(warehouse_id)
+        if shard is None:
+            continue
+        available = shard.set_index("product_id")["stock"].reindex(remaining.index, fill_value=0).clip(lower=0)
+        take = np.minimum(available.to_numpy(), remaining.to_numpy())
+        remaining -= take
+        hit = take > 0
+        moved.update(zip(zip(remaining.index[hit], [warehouse_id] * int(hit.sum())), take[hit].tolist()))
+    return moved
+
+
+def timed(fn, repeat: int = 3):
+    best, value = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--warehouses", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--orders", type=int, default=50_000, help="short products per plan")
+    parser.add_argument("--coverage", type=float, default=0.3, help="share of the catalogue each warehouse holds")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(5)
+    orders = [{"product_id": f"P{i:07d}", "shortage": int(s)}
+              for i, s in zip(rng.choice(args.products, args.orders, replace=False).tolist(),
+                              rng.integers(1, 60, args.orders).tolist())]
+    print(f"{args.orders:,} shortages, {args.products:,} products, each warehouse holds {args.coverage:.0%}")
+    for count in args.warehouses:
+        ranked, stock = synthetic_network(count, args.products, args.coverage)
+        build, network = timed(lambda: WarehouseNetwork(ranked, stock, "Chennai"), repeat=1)
+        naive, expected = timed(lambda: per_warehouse(ranked, stock, orders), repeat=1)
+        single, (_, transfers) = timed(lambda: network.plan(orders))
+        got = {(t["product_id"], t["from_warehouse"]): t["quantity"] for t in transfers}
+        print(f"  {count:>3} warehouses ({len(network):>9,} stock rows): per warehouse {naive * 1000:8.0f} ms  "
+              f"one pass {single * 1000:6.0f} ms  (network built in {build * 1000:.0f} ms)  "
+              f"{sum(got.values()):,} units moved [{'ok' if got == expected else 'MISMATCH'}]")
+
+
+if __name__ == "__main__":
+    main()
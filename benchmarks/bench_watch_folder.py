@@ -0,0 +1,150 @@
+# benchmarks/bench_watch_folder.py
+"""Sustained files/minute of the watch-folder daemon (pipeline.watcher.DemandWatcher).
+
+A feeder thread drops --files demand files into a temporary directory, --interval seconds
+apart. Each one is written in two halves with a pause in between, like a slow network copy,
+so the debounce has to hold it back. A --duplicates fraction are byte-identical copies under
+new names, which the fingerprint check has to skip. The daemon runs on a scratch copy of
+inventory.db. The rate is measured from the first drop to the last result, and every run is
+checked: all rows must be ingested, with no file read half-written.
+
+Usage: python benchmarks/bench_watch_folder.py [--files 200] [--rows 5000] [--workers 1 2] [--modes inotify polling]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRATCH = Path(tempfile.mkdtemp(prefix="bench_watch_"))
+# Set before the backend is imported, so the daemon and its spawned workers use the scratch copy
+shutil.copy(ROOT / "inventory.db", SCRATCH / "inventory.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{SCRATCH / 'inventory.db'}"
+os.environ["SNAPSHOT_DIR"] = str(SCRATCH / "snapshots")
+sys.path.append(str(ROOT / "backend"))
+sys.path.append(str(ROOT))
+
+from database.models import IngestedFile, InventoryData, SessionLocal  # noqa: E402
+from pipeline.watcher import DemandWatcher, succeeded_fingerprints  # noqa: E402
+
+
+def demand_payloads(files: int, rows: int, duplicates: float, seed: int = 7):
+    """(file name, CSV bytes, row count) per file; about `duplicates` of them repeat an earlier file"""
+    db = SessionLocal()
+    try:
+        products = [(p.product_id, p.category_name, p.product_name) for p in db.query(InventoryData)]
+    finally:
+        db.close()
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for i in range(files):
+        if payloads and rng.random() < duplicates:
+            _, payload, count = payloads[int(rng.integers(len(payloads)))]
+            payloads.append((f"store_{i:04d}_resend.csv", payload, count))
+            continue
+        lines = ["store_id,product_id,Category,product_name,demand"]
+        for r in range(rows):
+            if r % 10 == 0:
+                # Products the inventory does not have
+                lines.append(f"S{i % 50:03d},X{r:06d},Misc,Unknown item {r},{int(rng.integers(1, 20))}")
+            else:
+                product_id, category, name = products[r % len(products)]
+                lines.append(f"S{i % 50:03d},{product_id},{category},{name},{int(rng.integers(1, 40))}")
+        payloads.append((f"store_{i:04d}.csv", ("\n".join(lines) + "\n").encode(), rows))
+    return payloads
+
+
+def feed(directory: Path, payloads, interval: float, pause: float, dropped: dict) -> None:
+    for file_name, payload, _ in payloads:
+        half = len(payload) // 2
+        with open(directory / file_name, "wb") as f:
+            f.write(payload[:half])
+            f.flush()
+            time.sleep(pause)
+            f.write(payload[half:])
+        dropped[file_name] = time.perf_counter()
+        time.sleep(interval)
+
+
+def run(mode: str, workers: int, payloads, args) -> None:
+    drop_dir = SCRATCH / f"drop_{mode}_{workers}"
+    out_dir = SCRATCH / f"out_{mode}_{workers}"
+    drop_dir.mkdir()
+    # Fingerprints are remembered across runs; start each run with an empty record
+    db = SessionLocal()
+    try:
+        succeeded_fingerprints(db)  # creates the table on first use
+        db.query(IngestedFile).delete()
+        db.commit()
+    finally:
+        db.close()
+
+    expected = len({payload for _, payload, _ in payloads})
+    results, dropped, latencies = [], {}, []
+
+    def on_result(summary):
+        if summary["file_name"] in dropped:
+            latencies.append(time.perf_counter() - dropped[summary["file_name"]])
+        results.append((time.perf_counter(), summary))
+
+    watcher = DemandWatcher(drop_dir, out_dir, workers, settle=args.settle, poll_interval=args.poll_interval,
+                            use_inotify=mode == "inotify", on_result=on_result)
+    stop = threading.Event()
+    daemon = threading.Thread(target=watcher.run, args=(stop,))
+    daemon.start()
+    # Let the spawned workers start before the clock does, as they would in a long-running daemon
+    time.sleep(args.warmup)
+    start = time.perf_counter()
+    feeder = threading.Thread(target=feed, args=(drop_dir, payloads, args.interval, args.pause, dropped))
+    feeder.start()
+    while sum(s["status"] == "succeeded" for _, s in results) < expected and time.perf_counter() - start < args.timeout:
+        time.sleep(0.05)
+    feeder.join()
+    stop.set()
+    daemon.join()
+
+    succeeded = [s for _, s in results if s["status"] == "succeeded"]
+    elapsed = max(t for t, _ in results) - start if results else float("nan")
+    rows = sum(s["rows"] for s in succeeded)
+    expected_rows = sum(count for _, payload, count in {p[1]: p for p in payloads}.values())
+    ok = len(succeeded) == expected and rows == expected_rows and not watcher.stats["failed"]
+    print(f"  {watcher.mode:>8} x{workers}: {len(succeeded)} files ({watcher.stats['duplicates']} duplicates skipped, "
+          f"{watcher.stats['failed']} failed) in {elapsed:.1f}s = {len(payloads) * 60 / elapsed:,.0f} files/min "
+          f"({rows * 60 / elapsed:,.0f} rows/min); drop->result p50 {np.median(latencies):.2f}s "
+          f"p95 {np.percentile(latencies, 95):.2f}s  [{'ok' if ok else 'MISMATCH'}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=5000, help="rows per file")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="fraction of files that repeat an earlier one")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--modes", nargs="+", choices=["inotify", "polling"], default=["inotify", "polling"])
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between drops (0 = as fast as possible)")
+    parser.add_argument("--pause", type=float, default=0.05, help="pause between the two halves of each write")
+    parser.add_argument("--settle", type=float, default=0.2)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    try:
+        payloads = demand_payloads(args.files, args.rows, args.duplicates)
+        print(f"{args.files} files x {args.rows:,} rows, {args.files - len({p[1] for p in payloads})} duplicates, "
+              f"{os.cpu_count()} CPUs")
+        for mode in args.modes:
+            for workers in args.workers:
+                run(mode, workers, payloads, args)
+    finally:
+        shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
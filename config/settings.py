@@ -13,9 +13,17 @@ class Settings:
     DATA_DIR = BASE_DIR / "backend" / "data"
     INVENTORY_DATA_PATH = DATA_DIR / "inventory_data.xlsx"
     
+    # Database (SQLAlchemy URL); the async engine uses the same file through aiosqlite
+    DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR}/inventory.db")
+    # Write-ahead logging, so readers are never blocked by writers; turn off on network filesystems
+    SQLITE_WAL = os.getenv("SQLITE_WAL", "true").lower() == "true"
+    
     # API settings
     API_HOST = os.getenv("API_HOST", "127.0.0.1")
     API_PORT = int(os.getenv("API_PORT", "8000"))
+    ASYNC_API = os.getenv("ASYNC_API", "true").lower() == "true"
+    # Address the browser uses to reach the API (the UI links large downloads to it)
+    API_PUBLIC_URL = os.getenv("API_PUBLIC_URL", f"http://{API_HOST}:{API_PORT}").rstrip("/")
     
     # Gemini AI settings
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
@@ -27,6 +35,60 @@ class Settings:
     EMAIL_USERNAME = os.getenv("EMAIL_USERNAME", "")
     EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
     EMAIL_FROM = os.getenv("EMAIL_FROM", "")
+    # ssl, starttls or none; implicit TLS on port 465, STARTTLS otherwise
+    EMAIL_SECURITY = os.getenv("EMAIL_SECURITY", "ssl" if EMAIL_PORT == 465 else "starttls")
+    
+    # Processes rendering purchase order emails; 1 renders in a thread next to the SMTP sender
+    MAIL_RENDER_WORKERS = int(os.getenv("MAIL_RENDER_WORKERS", "1"))
+    
+    # Outbound call governors (pipeline.governor): calls/sec (0 = unlimited) and burst for the
+    # token bucket, and the concurrency ceiling AIMD adapts below on throttling
+    SMTP_RATE_LIMIT = float(os.getenv("SMTP_RATE_LIMIT", "10"))
+    SMTP_BURST = int(os.getenv("SMTP_BURST", "20"))
+    SMTP_MAX_CONCURRENCY = int(os.getenv("SMTP_MAX_CONCURRENCY", "4"))
+    GEMINI_RATE_LIMIT = float(os.getenv("GEMINI_RATE_LIMIT", "1"))
+    GEMINI_BURST = int(os.getenv("GEMINI_BURST", "5"))
+    GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+    # Consecutive failures that open a provider's circuit, and seconds before a trial call
+    BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+    BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+    
+    # Purchase orders to the same vendor/product for the same demand within this window are duplicates
+    PO_DEDUP_WINDOW_HOURS = float(os.getenv("PO_DEDUP_WINDOW_HOURS", "24"))
+    # A claim still pending after this long belongs to a sender that died; the next send takes it over
+    PO_CLAIM_TIMEOUT_SECONDS = float(os.getenv("PO_CLAIM_TIMEOUT_SECONDS", "3600"))
+    
+    # Warehouses (pipeline.warehouses): the main inventory is the stock of the warehouse at
+    # INVENTORY_LOCATION (also the delivery location on purchase orders); other warehouses
+    # within TRANSFER_MAX_KM of it (0 = any distance) are asked for transfers before vendors
+    INVENTORY_LOCATION = os.getenv("INVENTORY_LOCATION", "Chennai")
+    TRANSFER_MAX_KM = float(os.getenv("TRANSFER_MAX_KM", "0"))
+    
+    # Background processing jobs
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOBS_DIR = Path(os.getenv("JOBS_DIR", str(DATA_DIR / "jobs")))
+    
+    # Watch-folder ingestion (watch_demand.py): the drop directory, where per-file results are
+    # written, worker processes, and seconds a file must stay unchanged before it is read
+    WATCH_DIR = Path(os.getenv("WATCH_DIR", str(DATA_DIR / "incoming")))
+    WATCH_OUTPUT_DIR = Path(os.getenv("WATCH_OUTPUT_DIR", str(DATA_DIR / "watch_results")))
+    WATCH_WORKERS = int(os.getenv("WATCH_WORKERS", "2"))
+    WATCH_SETTLE_SECONDS = float(os.getenv("WATCH_SETTLE_SECONDS", "2"))
+    # Scan interval when inotify is unavailable (or disabled for network shares)
+    WATCH_POLL_SECONDS = float(os.getenv("WATCH_POLL_SECONDS", "1"))
+    
+    # Excel reader for uploads and reference workbooks: auto (calamine if installed, else openpyxl
+    # read-only streaming), calamine, openpyxl or pandas
+    EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "auto")
+    
+    # Inventory snapshots published once per generation and memory-mapped by every process
+    SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", str(DATA_DIR / "snapshots")))
+    
+    # Processes used for forecasting (series are sharded by product hash)
+    FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", "1"))
+    
+    # API response cache (entries per process, invalidated by data generation bumps)
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
     
     # Application settings
     DEBUG = os.getenv("DEBUG", "true").lower() == "true"
@@ -3,9 +3,6 @@ import streamlit as st
 import pandas as pd
 import sqlite3
 from datetime import datetime, timedelta
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import sys
 from pathlib import Path
 import os
@@ -16,7 +13,22 @@ sys.path.append(str(Path(__file__).parent / "backend"))
 
 # Import backend modules
 try:
-    from backend.database.models import init_db, SessionLocal, InventoryData, VendorList
+    from backend.database.models import init_db, SessionLocal, VendorList
+    from backend.pipeline.demand import read_demand_file, process_demand, UnsupportedFileError
+    from backend.pipeline.sharding import process_demand_sources
+    from backend.pipeline.export import EXPORT_FORMATS, parquet_available
+    from backend.pipeline.orders import (
+        find_vendor_by_id, send_order_email, send_bulk_orders,
+        group_orders_by_vendor_product, send_bulk_orders_grouped
+    )
+    from backend.pipeline import jobs
+    from backend.pipeline.ledger import record_movements
+    from backend.pipeline.paging import PAGE_SIZES, table_view, page_count, page_frame
+    from backend.pipeline.ranking import RANKINGS, ShortageRanking
+    from backend.pipeline.warehouses import warehouse_summary
+    from config.settings import settings
+    # Same module object the pipeline imports, so the UI shares its cached inventory snapshot
+    from pipeline.snapshot import get_inventory_snapshot
 except ImportError as e:
     st.error(f"Database import failed: {e}")
     st.stop()
@@ -39,333 +51,189 @@ def init_database():
         st.error(f"Database initialization failed: {e}")
         return None
 
-def find_vendor_by_id(db, vendor_id):
-    """Find vendor by vendor_id"""
+# Shortage modes offered in the UI: None aggregates across stores, otherwise the
+# value is passed to compute_store_shortages as the allocation mode
+STORE_MODES = {
+    "Aggregate across all stores": None,
+    "Per store - proportional allocation": "proportional",
+    "Per store - priority allocation": "priority",
+}
+
+def process_uploaded_demand(uploaded_file, db, store_mode=None, store_priority=None):
+    """Process uploaded demand file and compare with inventory.
+
+    With store_mode ("proportional" or "priority") stock is allocated across stores and
+    orders_to_send holds one entry per short (store, product). uploaded_file may also be a
+    path, a directory or a list of files; those shards are pre-aggregated in parallel.
+    """
     try:
-        vendor = db.query(VendorList).filter(
-            VendorList.vendor_id == vendor_id
-        ).first()
-        
-        if vendor:
-            return {
-                "vendor_id": vendor.vendor_id,
-                "vendor_name": vendor.vendor_name,
-                "email": vendor.email,
-                "contact": vendor.contact,
-                "location": vendor.location
-            }
-        return None
+        if isinstance(uploaded_file, (str, Path, list, tuple)):
+            return process_demand_sources(uploaded_file, db, store_mode, store_priority), None
+        df_demand = read_demand_file(uploaded_file, uploaded_file.name)
+        return process_demand(df_demand, db, store_mode, store_priority), None
+    except UnsupportedFileError as e:
+        return None, str(e)
     except Exception as e:
-        st.error(f"Error finding vendor: {e}")
-        return None
+        return None, f"Error processing file: {e}"
 
-def send_order_email(vendor_data, order_details):
-    """Send order email to vendor"""
-    try:
-        import os
-        # Email configuration (prefer env vars if set)
-        smtp_server = os.getenv("EMAIL_HOST", "smtp.gmail.com")
-        smtp_port = int(os.getenv("EMAIL_PORT", "465"))  # default SSL port
-        sender_email = os.getenv("EMAIL_USERNAME", "loganayakib861@gmail.com")
-        sender_password = os.getenv("EMAIL_PASSWORD", "qaez xqxz aron xqta")
-        sender_from = os.getenv("EMAIL_FROM", sender_email)
-        
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = f"Inventory Agent <{sender_from}>"
-        msg['To'] = vendor_data['email']
-        msg['Subject'] = f"Purchase Order - {order_details['product_name']} ({order_details['product_id']})"
-        
-        body = f"""
-Dear {vendor_data['vendor_name']},
+def submit_demand_job(uploaded_file, store_mode=None, store_priority=None, record_history=False):
+    """Queue an uploaded file for background processing and remember the job across refreshes"""
+    payload = uploaded_file.getvalue()
+    job_id = jobs.submit_job(uploaded_file.name, payload, store_mode, store_priority, record_history)
+    st.session_state['active_job'] = job_id
+    st.session_state['submitted_fingerprint'] = jobs.payload_fingerprint(payload)
+    st.query_params['job'] = job_id
+    return job_id
 
-We would like to place an order for the following:
+def inventory_table(db):
+    """Inventory with vendor details and ledger stock, built from the shared snapshot"""
+    frame = get_inventory_snapshot(db).frame()
+    vendors = {v.vendor_id: v for v in db.query(VendorList).all()}
+    return pd.DataFrame({
+        "Product ID": frame["product_id"],
+        "Category": frame["category_name"],
+        "Product Name": frame["product_name"],
+        "Vendor ID": frame["vendor_id"],
+        "Vendor Name": frame["vendor_id"].map(lambda v: getattr(vendors.get(v), 'vendor_name', '')),
+        "Vendor Email": frame["vendor_id"].map(lambda v: getattr(vendors.get(v), 'email', '')),
+        "Current Stock": frame["stock"],
+        "On Order": frame["on_order"]
+    })
 
-Product: {order_details['product_name']}
-Product ID: {order_details['product_id']}
-Quantity Needed: {order_details['shortage']} units
-Inventory Location: {os.getenv('INVENTORY_LOCATION', 'Chennai')}
+def apply_demand_result(db, result):
+    """Persist a finished processing result in the session for the result sections"""
+    st.session_state['last_result'] = result
+    st.session_state.pop('order_results', None)
+    st.session_state['inventory_df'] = inventory_table(db)
+    st.session_state['grouped_preview'] = group_orders_by_vendor_product(db, result['orders_to_send'])
 
-Please confirm availability and provide delivery timeline.
+@st.fragment(run_every=1.0)
+def render_job_progress(db):
+    """Poll the active job and load its result into the session once it finishes"""
+    job_id = st.session_state.get('active_job')
+    job = jobs.get_job(job_id, include_result=False) if job_id else None
+    if job is None:
+        st.session_state.pop('active_job', None)
+        return
+    
+    progress = job['progress']
+    if job['status'] in jobs.ACTIVE_STATUSES:
+        rows_total = progress['rows_total'] or 0
+        total_keys = progress['total_keys'] or 0
+        parsed = progress['rows_parsed'] / rows_total if rows_total else 0.0
+        matched = progress['matches_done'] / total_keys if total_keys else 0.0
+        st.progress(
+            min(1.0, 0.5 * parsed + 0.5 * matched),
+            text=(f"Job {job['status']}: {progress['rows_parsed']}/{rows_total} rows parsed, "
+                  f"{progress['keys_aggregated']} keys aggregated, {progress['matches_done']} matches done")
+        )
+    elif job['status'] == 'succeeded':
+        apply_demand_result(db, jobs.get_job(job_id)['result'])
+        st.session_state.pop('active_job', None)
+        st.session_state['applied_job'] = job_id
+        st.rerun()
+    else:
+        st.error(job['error'] or "Processing failed")
+        st.session_state.pop('active_job', None)
+        st.session_state['applied_job'] = job_id
 
-Best regards,
-Inventory Management System
-        """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        # Send email over SSL (more reliable with Gmail/App Password)
-        import smtplib
-        with smtplib.SMTP_SSL(smtp_server, smtp_port, timeout=20) as server:
-            server.ehlo()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_from, [vendor_data['email']], msg.as_string())
-        
-        return f"Sent"
-    except smtplib.SMTPAuthenticationError as e:
-        return f"Error: SMTP auth failed ({e.smtp_code}) {e.smtp_error}"
-    except smtplib.SMTPException as e:
-        return f"Error: SMTP error {str(e)}"
-    except Exception as e:
-        return f"Error: {str(e)}"
+def render_missing_with_suggestions(missing_df, suggestions):
+    """Show missing products with their closest inventory matches side by side"""
+    if not suggestions:
+        st.dataframe(missing_df, width='stretch')
+        return
+    left, right = st.columns([3, 2])
+    with left:
+        st.dataframe(missing_df, width='stretch')
+    with right:
+        st.caption("🔎 Did you mean? Closest inventory matches")
+        st.dataframe(pd.DataFrame(suggestions), width='stretch', hide_index=True)
 
-def process_uploaded_demand(uploaded_file, db):
-    """Process uploaded demand file and compare with inventory"""
-    try:
-        # Read uploaded file (YOUR INPUT DATA)
-        if uploaded_file.name.endswith('.csv'):
-            df_demand = pd.read_csv(uploaded_file)
-        elif uploaded_file.name.endswith('.xlsx') or uploaded_file.name.endswith('.xls'):
-            df_demand = pd.read_excel(uploaded_file)
-        else:
-            return None, "Unsupported file format. Please upload CSV or Excel files."
-        
-        # Get inventory data (YOUR STOCK DATA.XLSX)
-        inventory_data = db.query(InventoryData).all()
-        
-        # Create normalization helpers and indexes
-        def _norm(text: str) -> str:
-            return str(text or '').strip().lower()
-        
-        # Indexes for inventory
-        name_cat_to_item = {}
-        product_id_to_item = {}
-        for item in inventory_data:
-            name_key = (_norm(item.product_name), _norm(item.category_name))
-            name_cat_to_item[name_key] = item
-            product_id_to_item[str(item.product_id).strip()] = item
-        
-        # Aggregate demand across all stores by product (product_name + category)
-        agg_rows = {}
-        for _, row in df_demand.iterrows():
-            product_name = str(row.get('product_name', ''))
-            category = str(row.get('Category', ''))
-            product_id = str(row.get('product_id', '')).strip()
-            demand_qty = int(row.get('demand', 0) or 0)
-            key = (_norm(product_name), _norm(category))
-            if key not in agg_rows:
-                agg_rows[key] = {
-                    'product_name': product_name,
-                    'category': category,
-                    'product_id': product_id,  # keep first seen id as representative
-                    'total_demand': 0
-                }
-            agg_rows[key]['total_demand'] += demand_qty
-            # Prefer a non-empty product_id if encountered later
-            if product_id and not agg_rows[key]['product_id']:
-                agg_rows[key]['product_id'] = product_id
-        
-        # Evaluate aggregated demand against inventory
-        orders_to_send = []
-        missing_products = []
-        found_products = []  # kept for completeness, not displayed
-        
-        for key, info in agg_rows.items():
-            prod_name_norm, cat_norm = key
-            product_name = info['product_name']
-            category = info['category']
-            product_id = info['product_id']
-            total_demand = int(info['total_demand'])
-            
-            inventory_item = name_cat_to_item.get(key)
-            if not inventory_item and product_id:
-                inventory_item = product_id_to_item.get(product_id)
-            
-            if inventory_item:
-                current_stock = int(inventory_item.stock or 0)
-                shortage = max(0, total_demand - current_stock)
-                
-                found_products.append({
-                    'product_id': product_id or inventory_item.product_id,
-                    'category': category or inventory_item.category_name,
-                    'product_name': product_name or inventory_item.product_name,
-                    'demand': total_demand,
-                    'current_stock': current_stock,
-                    'shortage': shortage,
-                    'status': 'Found in inventory',
-                    'vendor_id': inventory_item.vendor_id
-                })
-                
-                if shortage > 0:
-                    orders_to_send.append({
-                        'store_id': '',  # aggregated across stores
-                        'product_id': product_id or inventory_item.product_id,
-                        'category': category or inventory_item.category_name,
-                        'product_name': product_name or inventory_item.product_name,
-                        'current_stock': current_stock,
-                        'demand': total_demand,
-                        'shortage': shortage,
-                        'vendor_id': inventory_item.vendor_id
-                    })
-            else:
-                missing_products.append({
-                    'product_id': product_id,
-                    'category': category,
-                    'product_name': product_name,
-                    'demand': total_demand,
-                    'current_stock': 0,
-                    'shortage': total_demand,
-                    'status': 'Not found in inventory',
-                    'vendor_id': 'N/A'
-                })
-                # Consider not-found items as needed, but vendor unknown
-                orders_to_send.append({
-                    'store_id': '',
-                    'product_id': product_id,
-                    'category': category,
-                    'product_name': product_name,
-                    'current_stock': 0,
-                    'demand': total_demand,
-                    'shortage': total_demand,
-                    'vendor_id': ''
-                })
-        
-        # Category-level aggregation (optional): total demand vs stock per category
-        demand_by_cat = {}
-        stock_by_cat = {}
-        cat_display_name = {}
-        for key, info in agg_rows.items():
-            cat_raw = info['category']
-            k = _norm(cat_raw)
-            demand_by_cat[k] = demand_by_cat.get(k, 0) + int(info['total_demand'])
-            if k not in cat_display_name and cat_raw:
-                cat_display_name[k] = cat_raw
-        for item in inventory_data:
-            k = _norm(item.category_name)
-            stock_by_cat[k] = stock_by_cat.get(k, 0) + int(item.stock or 0)
-            if k not in cat_display_name and item.category_name:
-                cat_display_name[k] = item.category_name
-        category_summary = []
-        for k in sorted(set(list(demand_by_cat.keys()) + list(stock_by_cat.keys()))):
-            td = int(demand_by_cat.get(k, 0))
-            ts = int(stock_by_cat.get(k, 0))
-            category_summary.append({
-                'Category': cat_display_name.get(k, k),
-                'Total Demand': td,
-                'Total Stock': ts,
-                'Shortage': max(0, td - ts)
-            })
-        
-        return {
-            'orders_to_send': orders_to_send,
-            'missing_products': missing_products,
-            'found_products': found_products,
-            'category_summary': category_summary,
-            'total_processed': len(df_demand)
-        }, None
-        
-    except Exception as e:
-        return None, f"Error processing file: {e}"
+def render_rejected_rows(result):
+    """Rows left out by validation, with the reason and row number of each"""
+    if not result.get('rows_rejected'):
+        return
+    reasons = ", ".join(
+        f"{reason.replace('_', ' ')}: {count}" for reason, count in result['rejected_by_reason'].items() if count
+    )
+    st.warning(f"{result['rows_rejected']} rows were skipped ({reasons})")
+    shown = result.get('rejected_rows', [])
+    if len(shown) < result['rows_rejected']:
+        st.caption(f"Showing the first {len(shown)} rejected rows")
+    st.dataframe(pd.DataFrame(shown), width='stretch', hide_index=True)
 
-def send_bulk_orders(db, orders_to_send):
-    """Send bulk orders for multiple items"""
-    results = []
-    
-    for order in orders_to_send:
-        vendor_data = find_vendor_by_id(db, order['vendor_id'])
-        if vendor_data:
-            result = send_order_email(vendor_data, order)
-            results.append({
-                'store_id': order.get('store_id', ''),
-                'product_id': order['product_id'],
-                'product_name': order['product_name'],
-                'shortage': order['shortage'],
-                'vendor': vendor_data['vendor_name'],
-                'vendor_email': vendor_data['email'],
-                'result': result
-            })
-        else:
-            results.append({
-                'store_id': order.get('store_id', ''),
-                'product_id': order['product_id'],
-                'product_name': order['product_name'],
-                'shortage': order['shortage'],
-                'vendor': 'No vendor found',
-                'vendor_email': 'N/A',
-                'result': f"Error: No vendor found for vendor_id {order.get('vendor_id', '')}"
-            })
-    
-    return results
+def load_uploaded_frame(uploaded_file, key):
+    """Parse an uploaded file once per upload and keep the frame in the session across reruns"""
+    file_id = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+    cached = st.session_state.get(key)
+    if cached is None or cached[0] != file_id:
+        cached = (file_id, read_demand_file(uploaded_file, uploaded_file.name, schema=None))
+        st.session_state[key] = cached
+    return cached[1]
 
+def session_frame(key, records):
+    """DataFrame of result records, built once per result instead of on every rerun"""
+    cached = st.session_state.get(key)
+    if cached is None or cached[0] is not records:
+        cached = (records, pd.DataFrame(records))
+        st.session_state[key] = cached
+    return cached[1]
 
-def group_orders_by_vendor_product(db, orders_to_send):
-    """Group orders to avoid duplicate emails to the same vendor/product. Sum shortages."""
-    grouped = {}
-    for o in orders_to_send:
-        key = (o.get('vendor_id', ''), o.get('product_id', ''))
-        if key not in grouped:
-            grouped[key] = {
-                'vendor_id': o.get('vendor_id', ''),
-                'product_id': o.get('product_id', ''),
-                'product_name': o.get('product_name', ''),
-                'category': o.get('category', ''),
-                'current_stock': int(o.get('current_stock', 0) or 0),
-                'demand': int(o.get('demand', 0) or 0),
-                'shortage': int(o.get('shortage', 0) or 0),
-            }
-        else:
-            grouped[key]['demand'] += int(o.get('demand', 0) or 0)
-            grouped[key]['shortage'] += int(o.get('shortage', 0) or 0)
-            # keep minimal stock for info
-            grouped[key]['current_stock'] = min(grouped[key]['current_stock'], int(o.get('current_stock', 0) or 0))
+def render_paged_table(df, key, hide_index=False):
+    """Filter, sort and page a frame on the server; only the visible page is sent to the browser.
+
+    The filtered and sorted row order is kept in the session per frame and controls,
+    so reruns that only change the page slice a window instead of touching every row.
+    """
+    query_col, sort_col, order_col, size_col = st.columns([3, 2, 1, 1])
+    query = query_col.text_input("Filter", key=f"{key}_query", placeholder="Search all columns")
+    sort_by = sort_col.selectbox("Sort by", ["(file order)"] + [str(c) for c in df.columns], key=f"{key}_sort")
+    descending = order_col.checkbox("Descending", key=f"{key}_desc")
+    page_size = size_col.selectbox("Rows per page", PAGE_SIZES, index=2, key=f"{key}_size")
+    
+    controls = (query, sort_by, descending)
+    view = st.session_state.get(f"{key}_view")
+    if view is None or view[0] is not df or view[1] != controls:
+        column = next((c for c in df.columns if str(c) == sort_by), None)
+        view = (df, controls, table_view(df, query, column, not descending))
+        st.session_state[f"{key}_view"] = view
+        st.session_state[f"{key}_page"] = 1
+    positions = view[2]
+    
+    pages = page_count(len(positions), page_size)
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    st.dataframe(page_frame(df, positions, page, page_size), width='stretch', hide_index=hide_index)
     
-    # Enrich with vendor name/email
-    consolidated = []
-    for (_, _), g in grouped.items():
-        vendor = find_vendor_by_id(db, g['vendor_id']) if g['vendor_id'] else None
-        consolidated.append({
-            **g,
-            'vendor': vendor['vendor_name'] if vendor else 'No vendor found',
-            'vendor_email': vendor['email'] if vendor else 'N/A',
-        })
-    return consolidated
+    start = (page - 1) * page_size
+    shown = f"rows {start + 1}-{min(start + page_size, len(positions))}" if len(positions) else "no rows"
+    st.caption(f"Showing {shown} of {len(positions):,} matching ({len(df):,} total)")
 
+def render_ranked_orders(orders, key):
+    """Show planned emails in priority order, one page at a time; returns the orders on the page.
 
-def send_bulk_orders_grouped(db, grouped_orders):
-    """Send one email per (vendor_id, product_id) with consolidated shortage."""
-    results = []
-    for go in grouped_orders:
-        if not go.get('vendor_id'):
-            results.append({
-                'product_id': go['product_id'],
-                'product_name': go['product_name'],
-                'shortage': go['shortage'],
-                'vendor': 'No vendor found',
-                'vendor_email': 'N/A',
-                'result': 'Error: Missing vendor_id'
-            })
-            continue
-        vendor = find_vendor_by_id(db, go['vendor_id'])
-        if not vendor:
-            results.append({
-                'product_id': go['product_id'],
-                'product_name': go['product_name'],
-                'shortage': go['shortage'],
-                'vendor': 'No vendor found',
-                'vendor_email': 'N/A',
-                'result': f"Error: No vendor found for vendor_id {go['vendor_id']}"
-            })
-            continue
-        order_payload = {
-            'store_id': '',
-            'product_id': go['product_id'],
-            'category': go.get('category', ''),
-            'product_name': go['product_name'],
-            'current_stock': go.get('current_stock', 0),
-            'demand': go.get('demand', 0),
-            'shortage': go.get('shortage', 0),
-            'vendor_id': go['vendor_id'],
-        }
-        result_msg = send_order_email(vendor, order_payload)
-        results.append({
-            'product_id': go['product_id'],
-            'product_name': go['product_name'],
-            'shortage': go['shortage'],
-            'vendor': vendor['vendor_name'],
-            'vendor_email': vendor['email'],
-            'result': result_msg
-        })
-    return results
+    The ranking is kept in the session per order list, and each page is picked by partial
+    selection, so a long shortage list is never fully sorted or rendered.
+    """
+    rank_col, size_col = st.columns([3, 1])
+    rank_by = rank_col.selectbox("Prioritize by", list(RANKINGS), format_func=RANKINGS.get, key=f"{key}_rank_by")
+    page_size = size_col.selectbox("Top N per page", ["All"] + list(PAGE_SIZES), key=f"{key}_size")
+    ranking = st.session_state.get(f"{key}_ranking")
+    if ranking is None or ranking.orders is not orders:
+        ranking = ShortageRanking(orders)
+        st.session_state[f"{key}_ranking"] = ranking
+        st.session_state[f"{key}_page"] = 1
+    limit = None if page_size == "All" else page_size
+    pages = page_count(len(ranking), limit or max(len(ranking), 1))
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    offset = (page - 1) * limit if limit else 0
+    ranked = ranking.page(rank_by, limit, offset)
+    st.dataframe(pd.DataFrame(ranked), width='stretch', hide_index=True)
+    st.caption(f"Showing ranks {offset + 1}-{offset + len(ranked)} of {len(ranking):,} planned emails")
+    return ranked
 
 # Main application
 def main():
@@ -375,6 +243,11 @@ def main():
         st.error("Failed to initialize database. Please check your configuration.")
         return
     
+    # Resume a background job referenced in the URL (e.g. after a page refresh)
+    url_job = st.query_params.get('job')
+    if url_job and url_job != st.session_state.get('applied_job') and not st.session_state.get('active_job'):
+        st.session_state['active_job'] = url_job
+    
     # App title
     st.title("📦 Inventory Management System")
     st.markdown("---")
@@ -396,7 +269,7 @@ def main():
     if page == "File Upload":
         st.header("📁 Upload Your Demand Data")
         
-        st.info("Upload your demand data file. The system will check it against the inventory data (stock data.xlsx) and send emails to vendors for products that need restocking.")
+        st.info("Upload your demand data file. The system will check it against the inventory data (stock data.xlsx) and send emails to vendors for products that need restocking. Rows that repeat an earlier row exactly are counted once, so put a store's total for a product on one line (or on lines that differ) rather than repeating it.")
         
         # File upload
         uploaded_file = st.file_uploader(
@@ -410,115 +283,141 @@ def main():
             
             # Show complete uploaded file
             try:
-                if uploaded_file.name.endswith('.csv'):
-                    df_uploaded = pd.read_csv(uploaded_file)
-                else:
-                    df_uploaded = pd.read_excel(uploaded_file)
+                df_uploaded = load_uploaded_frame(uploaded_file, 'uploaded_frame')
                 
                 st.subheader(f"Your Complete Uploaded File: {uploaded_file.name}")
-                st.dataframe(df_uploaded, width='stretch')
+                render_paged_table(df_uploaded, 'upload_table')
                 
                 # Show file info
                 st.info(f"Total rows in your file: {len(df_uploaded)}")
                 
-                # Process demand file
-                if st.button("Check Demand Against Inventory", type="primary"):
-                    with st.spinner("Checking your demand data against inventory..."):
-                        result, error = process_uploaded_demand(uploaded_file, db)
-                        
-                        if error:
-                            st.error(error)
-                        else:
-                            # Save to session so content persists after further actions
-                            st.session_state['last_result'] = result
-                            # Precompute inventory df for display and persist
-                            inventory_data = db.query(InventoryData).all()
-                            st.session_state['inventory_df'] = pd.DataFrame([{
-                                "Product ID": item.product_id,
-                                "Category": item.category_name,
-                                "Product Name": item.product_name,
-                                "Vendor ID": item.vendor_id,
-                                "Current Stock": item.stock
-                            } for item in inventory_data])
-                            
-                            # Also prepare grouped preview and persist
-                            grouped_preview = group_orders_by_vendor_product(db, result['orders_to_send'])
-                            st.session_state['grouped_preview'] = grouped_preview
-                            # Removed completion banner per requirement
+                store_mode_label = st.selectbox(
+                    "Shortage calculation",
+                    list(STORE_MODES.keys()),
+                    help="Per-store modes split available stock across stores before computing shortages"
+                )
+                store_priority = []
+                if STORE_MODES[store_mode_label] == "priority":
+                    priority_text = st.text_input(
+                        "Store priority (comma-separated store_ids, highest first)",
+                        help="Stores not listed are served afterwards in file order"
+                    )
+                    store_priority = [s.strip() for s in priority_text.split(",") if s.strip()]
+                record_history = st.checkbox(
+                    "Add this upload to demand history",
+                    help="Recorded history drives the forecast and reorder points; a file is only recorded once"
+                )
                 
-                # Render from session if available (keeps all sections visible)
-                if 'last_result' in st.session_state:
-                    result = st.session_state['last_result']
-                    
-                    # Removed navigation hint per requirement
-                    
-                    # Category summary hidden per requirement
-                    
-                    # (Removed) Products Found in Inventory table per requirement
-                    
-                    # Show missing products
-                    if result['missing_products']:
-                        st.subheader(f"❌ Products NOT Found in Inventory ({len(result['missing_products'])} products)")
-                        missing_df = pd.DataFrame(result['missing_products'])
-                        st.dataframe(missing_df, width='stretch')
-                    
-                    # Products That Need Restocking table removed; continue with email plan if any
-                    if result['orders_to_send']:
-                        grouped_preview = st.session_state.get('grouped_preview') or group_orders_by_vendor_product(db, result['orders_to_send'])
-                        st.subheader("📧 Planned Vendor Emails (grouped by vendor and product)")
-                        preview_df = pd.DataFrame(grouped_preview)
-                        st.dataframe(preview_df, width='stretch')
-                        st.subheader("Send Purchase Orders to Vendors")
-                        if st.button(f"Send {len(grouped_preview)} Emails", type="primary"):
-                            with st.spinner("Sending purchase orders..."):
-                                order_results = send_bulk_orders_grouped(db, grouped_preview)
-                                st.session_state['order_results'] = order_results
-                        
-                        # Always show results if present
-                        if 'order_results' in st.session_state:
-                            order_results = st.session_state['order_results']
-                            # Summary table of all emails attempted
-                            st.subheader("Email Attempts Summary")
-                            summary_df = pd.DataFrame(order_results)
-                            st.dataframe(summary_df, width='stretch')
-                         
-                    if not result['orders_to_send'] and not result['missing_products']:
-                        st.success("✅ All products in your demand have sufficient stock in inventory!")
-                     
-                    st.info(f"Total items from your demand processed: {result['total_processed']}")
+                # Process demand file in the background job pool
+                if st.button("Check Demand Against Inventory", type="primary"):
+                    submit_demand_job(uploaded_file, STORE_MODES[store_mode_label], store_priority, record_history)
              
             except Exception as e:
                 st.error(f"Error reading file: {e}")
+        
+        # Progress of a running job (also resumed after a page refresh)
+        if st.session_state.get('active_job'):
+            render_job_progress(db)
+        
+        # Render from session if available (keeps all sections visible)
+        if 'last_result' in st.session_state:
+            result = st.session_state['last_result']
+            
+            # Removed navigation hint per requirement
+            
+            # Category summary hidden per requirement
+            
+            # (Removed) Products Found in Inventory table per requirement
+            
+            render_rejected_rows(result)
+            
+            # Show missing products
+            if result['missing_products']:
+                st.subheader(f"❌ Products NOT Found in Inventory ({len(result['missing_products'])} products)")
+                missing_df = pd.DataFrame(result['missing_products'])
+                render_missing_with_suggestions(missing_df, result.get('missing_suggestions', []))
+            
+            # Per-store allocation (store-aware mode only)
+            if result.get('store_allocation'):
+                st.subheader("🏬 Per-Store Allocation and Shortages")
+                render_paged_table(session_frame('store_allocation_df', result['store_allocation']), 'allocation_table')
+                st.subheader("Allocation Totals by Product")
+                st.dataframe(pd.DataFrame(result['store_summary']), width='stretch')
+            
+            # Stock other warehouses can send, planned before any purchase order
+            if result.get('transfers'):
+                st.subheader(f"🚚 Suggested Transfers from Other Warehouses ({len(result['transfers'])})")
+                render_paged_table(session_frame('transfers_df', result['transfers']), 'transfers_table')
+            
+            # Products That Need Restocking table removed; continue with email plan if any
+            if result['orders_to_send']:
+                grouped_preview = st.session_state.get('grouped_preview') or group_orders_by_vendor_product(db, result['orders_to_send'])
+                st.subheader("📧 Planned Vendor Emails (grouped by vendor and product)")
+                to_send = render_ranked_orders(grouped_preview, "upload_orders")
+                st.subheader("Send Purchase Orders to Vendors")
+                if st.button(f"Send {len(to_send)} Emails", type="primary"):
+                    with st.spinner("Sending purchase orders..."):
+                        order_results = send_bulk_orders_grouped(
+                            db, to_send, fingerprint=st.session_state.get('submitted_fingerprint')
+                        )
+                        st.session_state['order_results'] = order_results
+                        st.session_state.pop('inventory_df', None)
+                
+                # Always show results if present
+                if 'order_results' in st.session_state:
+                    order_results = st.session_state['order_results']
+                    # Summary table of all emails attempted
+                    st.subheader("Email Attempts Summary")
+                    summary_df = pd.DataFrame(order_results)
+                    st.dataframe(summary_df, width='stretch')
+                 
+            if not result['orders_to_send'] and not result['missing_products']:
+                if result.get('transfers'):
+                    st.success("✅ All products in your demand are covered by stock here plus the suggested transfers!")
+                else:
+                    st.success("✅ All products in your demand have sufficient stock in inventory!")
+             
+            st.info(f"Total items from your demand processed: {result['total_processed']}")
     elif page == "Inventory":
         st.header("📦 Inventory List")
         try:
             inventory_df = st.session_state.get('inventory_df')
             if inventory_df is None or inventory_df.empty:
-                inventory_data = db.query(InventoryData).all()
-                # join vendor name/email
-                vendors = {v.vendor_id: v for v in db.query(VendorList).all()}
-                records = []
-                for item in inventory_data:
-                    v = vendors.get(item.vendor_id)
-                    records.append({
-                        "Product ID": item.product_id,
-                        "Category": item.category_name,
-                        "Product Name": item.product_name,
-                        "Vendor ID": item.vendor_id,
-                        "Vendor Name": getattr(v, 'vendor_name', ''),
-                        "Vendor Email": getattr(v, 'email', ''),
-                        "Current Stock": item.stock
-                    })
-                inventory_df = pd.DataFrame(records)
+                inventory_df = inventory_table(db)
                 st.session_state['inventory_df'] = inventory_df
-            st.dataframe(inventory_df, width='stretch')
-            # Optional download
-            csv_inv = inventory_df.to_csv(index=False)
-            st.download_button(
-                label="Download Inventory CSV",
-                data=csv_inv,
-                file_name="inventory_export.csv",
-                mime="text/csv"
+            render_paged_table(inventory_df, 'inventory_table')
+            # Warehouses nearest first; the local one holds the stock listed above
+            warehouses = warehouse_summary(db)
+            if warehouses:
+                st.subheader("🏭 Warehouses")
+                st.dataframe(pd.DataFrame(warehouses), width='stretch', hide_index=True)
+            # Bulk receiving: a file of product_id + quantity adds to on-hand and clears on-order
+            receipts_file = st.file_uploader(
+                "Receive goods (CSV/XLSX with product_id and quantity columns)",
+                type=['csv', 'xlsx', 'xls'], key="receipts_file"
+            )
+            if receipts_file is not None and st.button("Record Receipts"):
+                receipts = read_demand_file(receipts_file, receipts_file.name, schema=None)
+                receipts.columns = [str(c).strip().lower() for c in receipts.columns]
+                if not {'product_id', 'quantity'} <= set(receipts.columns):
+                    st.error("Receipts file needs product_id and quantity columns")
+                else:
+                    receipts = receipts.dropna(subset=['product_id', 'quantity'])
+                    recorded = record_movements(db, (
+                        {"product_id": pid, "kind": "receipt", "quantity": int(qty),
+                         "reference": f"receipt:{receipts_file.name}"}
+                        for pid, qty in zip(receipts['product_id'], receipts['quantity'])
+                    ))
+                    st.session_state.pop('inventory_df', None)
+                    st.toast(f"Recorded {recorded} receipts")
+                    st.rerun()
+            # The API streams the export from a DB cursor; the browser downloads it from there
+            # so the file never sits in this session's memory
+            export_formats = [f for f in EXPORT_FORMATS if f != "parquet" or parquet_available()]
+            export_format = st.selectbox("Export format", export_formats, key="inventory_export_format")
+            st.link_button(
+                f"Download Inventory {export_format.upper()}",
+                f"{settings.API_PUBLIC_URL}/api/inventory/export?format={export_format}"
             )
         except Exception as e:
             st.error(f"Failed to load inventory: {e}")
@@ -547,22 +446,14 @@ def main():
                 with st.spinner("Thinking..."):
                     # Auto-process if a file was uploaded in assistant and not yet processed
                     ai_response = "You can upload a demand file below to process against inventory and send vendor emails."
-                    if 'ai_uploaded_file_buffer' in st.session_state and st.session_state['ai_uploaded_file_buffer'] is not None:
-                        result, error = process_uploaded_demand(st.session_state['ai_uploaded_file_buffer'], db)
-                        if error:
-                            ai_response += f"\n\nProcessing error: {error}"
+                    buffered_file = st.session_state.get('ai_uploaded_file_buffer')
+                    if buffered_file is not None:
+                        # Only queue a job when this exact file has not been submitted yet
+                        if st.session_state.get('submitted_fingerprint') == jobs.payload_fingerprint(buffered_file.getvalue()):
+                            ai_response += "\n\nYour uploaded file has already been processed. See results below."
                         else:
-                            st.session_state['last_result'] = result
-                            inventory_data = db.query(InventoryData).all()
-                            st.session_state['inventory_df'] = pd.DataFrame([{
-                                "Product ID": item.product_id,
-                                "Category": item.category_name,
-                                "Product Name": item.product_name,
-                                "Vendor ID": item.vendor_id,
-                                "Current Stock": item.stock
-                            } for item in inventory_data])
-                            st.session_state['grouped_preview'] = group_orders_by_vendor_product(db, result['orders_to_send'])
-                            ai_response += "\n\nYour uploaded file has been processed. See results below."
+                            submit_demand_job(buffered_file)
+                            ai_response += "\n\nYour uploaded file is being processed in the background. Progress is shown below."
                     st.markdown(ai_response)
                     st.session_state.messages.append({"role": "assistant", "content": ai_response})
         
@@ -577,57 +468,51 @@ def main():
         
         if ai_uploaded_file is not None:
             try:
-                if ai_uploaded_file.name.endswith('.csv'):
-                    ai_df_uploaded = pd.read_csv(ai_uploaded_file)
-                else:
-                    ai_df_uploaded = pd.read_excel(ai_uploaded_file)
+                ai_df_uploaded = load_uploaded_frame(ai_uploaded_file, 'ai_uploaded_frame')
                 st.success(f"Uploaded: {ai_uploaded_file.name}")
-                st.dataframe(ai_df_uploaded, width='stretch')
+                render_paged_table(ai_df_uploaded, 'ai_upload_table')
                 st.info(f"Total rows: {len(ai_df_uploaded)}")
                 # Keep a buffer in session so chat can auto-process on next message
                 st.session_state['ai_uploaded_file_buffer'] = ai_uploaded_file
                 
                 if st.button("Process in Assistant", type="primary"):
-                    with st.spinner("Processing against inventory..."):
-                        result, error = process_uploaded_demand(ai_uploaded_file, db)
-                        if error:
-                            st.error(error)
-                        else:
-                            st.session_state['last_result'] = result
-                            inventory_data = db.query(InventoryData).all()
-                            st.session_state['inventory_df'] = pd.DataFrame([{
-                                "Product ID": item.product_id,
-                                "Category": item.category_name,
-                                "Product Name": item.product_name,
-                                "Vendor ID": item.vendor_id,
-                                "Current Stock": item.stock
-                            } for item in inventory_data])
-                            st.session_state['grouped_preview'] = group_orders_by_vendor_product(db, result['orders_to_send'])
-                            st.success("Comparison complete. See results below.")
+                    submit_demand_job(ai_uploaded_file)
             except Exception as e:
                 st.error(f"Error reading file: {e}")
         
+        if st.session_state.get('active_job'):
+            render_job_progress(db)
+        
         # Render results if present (same as File Upload flow)
         if 'last_result' in st.session_state:
             result = st.session_state['last_result']
             
+            render_rejected_rows(result)
+            
             # Missing products
             if result['missing_products']:
                 st.subheader(f"❌ Products NOT Found in Inventory ({len(result['missing_products'])} products)")
                 missing_df = pd.DataFrame(result['missing_products'])
-                st.dataframe(missing_df, width='stretch')
+                render_missing_with_suggestions(missing_df, result.get('missing_suggestions', []))
+            
+            # Stock other warehouses can send, planned before any purchase order
+            if result.get('transfers'):
+                st.subheader(f"🚚 Suggested Transfers from Other Warehouses ({len(result['transfers'])})")
+                render_paged_table(session_frame('transfers_df', result['transfers']), 'ai_transfers_table')
             
             # Products That Need Restocking table removed; proceed with email plan if any
             if result['orders_to_send']:
                 grouped_preview = st.session_state.get('grouped_preview') or group_orders_by_vendor_product(db, result['orders_to_send'])
                 st.subheader("📧 Planned Vendor Emails (grouped by vendor and product)")
-                preview_df = pd.DataFrame(grouped_preview)
-                st.dataframe(preview_df, width='stretch')
+                to_send = render_ranked_orders(grouped_preview, "ai_orders")
                 st.subheader("Send Purchase Orders to Vendors")
-                if st.button(f"Send {len(grouped_preview)} Emails", type="primary", key="ai_send"):
+                if st.button(f"Send {len(to_send)} Emails", type="primary", key="ai_send"):
                     with st.spinner("Sending purchase orders..."):
-                        order_results = send_bulk_orders_grouped(db, grouped_preview)
+                        order_results = send_bulk_orders_grouped(
+                            db, to_send, fingerprint=st.session_state.get('submitted_fingerprint')
+                        )
                         st.session_state['order_results'] = order_results
+                        st.session_state.pop('inventory_df', None)
                 if 'order_results' in st.session_state:
                     order_results = st.session_state['order_results']
                     st.subheader("Email Attempts Summary")
@@ -0,0 +1,166 @@
+# run_batch.py - Headless demand -> purchase order pipeline
+"""Run parse -> aggregate -> match -> group without the Streamlit UI.
+
+Examples:
+    python run_batch.py demand/ --out results/
+    python run_batch.py north.csv south.csv --format parquet --store-mode proportional
+    python run_batch.py demand/ --emails outbox      # write .eml files to results/outbox
+    python run_batch.py demand/ --emails send        # send purchase orders over SMTP
+    python run_batch.py demand/ --record-history     # also append the files to the forecast history
+    python run_batch.py demand/ --forecast --workers 8   # also write forecast reorder suggestions
+"""
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Same layout as main.py: backend modules are imported by their package-relative names
+sys.path.append(str(Path(__file__).parent / "backend"))
+
+
+@contextmanager
+def timed(stage, timings):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - start
+        print(f"[{stage}] {timings[stage]:.3f}s", file=sys.stderr)
+
+
+def write_table(records, path, file_format):
+    """Write a list of dicts as CSV or Parquet and return the written path"""
+    import pandas as pd
+    frame = pd.DataFrame(records)
+    target = path.with_suffix(f".{file_format}")
+    if file_format == "parquet":
+        frame.to_parquet(target, index=False)
+    else:
+        frame.to_csv(target, index=False)
+    return target
+
+
+def record_history(db, shards):
+    """Append each shard to the demand history; files already recorded are skipped"""
+    import io
+    from pipeline.demand import read_demand_file
+    from pipeline.history import record_demand_history
+    from pipeline.jobs import payload_fingerprint
+    written = 0
+    for shard in shards:
+        file_name, payload = shard if isinstance(shard, tuple) else (Path(shard).name, Path(shard).read_bytes())
+        df_demand = read_demand_file(io.BytesIO(payload), file_name)
+        written += record_demand_history(db, df_demand, file_name, payload_fingerprint(payload))
+    return written
+
+
+def demand_fingerprint(shards):
+    """Fingerprint of the whole input for PO dedup; one file gets the same key as its UI upload"""
+    from pipeline.jobs import payload_fingerprint
+    parts = sorted(
+        payload_fingerprint(shard[1] if isinstance(shard, tuple) else Path(shard).read_bytes()) for shard in shards
+    )
+    return parts[0] if len(parts) == 1 else payload_fingerprint("".join(parts).encode())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch demand -> purchase order pipeline")
+    parser.add_argument("sources", nargs="+", help="Demand files (CSV/XLSX) or directories of them")
+    parser.add_argument("--out", default="batch_output", help="Output directory (default: batch_output)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Output file format")
+    parser.add_argument("--store-mode", choices=["proportional", "priority"],
+                        help="Allocate stock per store instead of aggregating across stores")
+    parser.add_argument("--store-priority", default="",
+                        help="Comma-separated store_ids, highest priority first (priority mode)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes used to parse shards")
+    parser.add_argument("--emails", choices=["none", "outbox", "send"], default="none",
+                        help="Queue planned POs as .eml files in <out>/outbox or send them over SMTP")
+    parser.add_argument("--on-duplicate", choices=["skip", "top_up"], default="skip",
+                        help="POs already sent in the dedup window are skipped, or topped up to a larger shortage")
+    parser.add_argument("--record-history", action="store_true",
+                        help="Append the demand files to the history used by forecasting")
+    parser.add_argument("--forecast", action="store_true",
+                        help="Write reorder suggestions and POs from the demand history forecast")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    timings = {}
+
+    # Imported here so --help stays instant; none of these pull in streamlit or langchain
+    with timed("startup", timings):
+        from database.models import SessionLocal
+        from pipeline.sharding import aggregate_shards, collect_demand_sources
+        from pipeline.demand import evaluate_demand
+        from pipeline.orders import (
+            group_orders_by_vendor_product, send_bulk_orders_grouped, queue_orders_to_outbox
+        )
+
+    priority = [s.strip() for s in args.store_priority.split(",") if s.strip()]
+    db = SessionLocal()
+    try:
+        shards = collect_demand_sources(args.sources)
+        with timed("parse+aggregate", timings):
+            aggregated, store_rows, rows, report = aggregate_shards(shards, args.workers, bool(args.store_mode))
+        with timed("match", timings):
+            result = evaluate_demand(aggregated, db, rows, args.store_mode, priority, store_rows)
+        with timed("group", timings):
+            grouped = group_orders_by_vendor_product(db, result['orders_to_send'])
+        with timed("write", timings):
+            written = [
+                write_table(result['orders_to_send'], out_dir / "shortages", args.format),
+                write_table(grouped, out_dir / "planned_pos", args.format),
+                write_table(result['missing_products'], out_dir / "missing_products", args.format),
+            ]
+            if result['transfers']:
+                written.append(write_table(result['transfers'], out_dir / "transfers", args.format))
+            if result.get('store_allocation'):
+                written.append(write_table(result['store_allocation'], out_dir / "store_allocation", args.format))
+            if report.rejected:
+                # Rejected cells hold mixed types (e.g. text in demand), so they are written as text
+                rejected = [{k: v if k == "row" or v is None else str(v) for k, v in r.items()}
+                            for r in report.to_dict()['rejected_rows']]
+                written.append(write_table(rejected, out_dir / "rejected_rows", args.format))
+
+        if args.record_history:
+            with timed("history", timings):
+                print(f"History rows recorded: {record_history(db, shards)}")
+
+        if args.forecast:
+            from pipeline.forecast import reorder_suggestions
+            with timed("forecast", timings):
+                suggestions = reorder_suggestions(db, max_workers=args.workers)
+                written.append(write_table(suggestions, out_dir / "reorder_suggestions", args.format))
+                written.append(write_table(group_orders_by_vendor_product(db, suggestions),
+                                           out_dir / "forecast_pos", args.format))
+
+        if args.emails != "none":
+            with timed(f"emails:{args.emails}", timings):
+                if args.emails == "send":
+                    email_results = send_bulk_orders_grouped(
+                        db, grouped, fingerprint=demand_fingerprint(shards), on_duplicate=args.on_duplicate
+                    )
+                else:
+                    email_results = queue_orders_to_outbox(db, grouped, out_dir / "outbox")
+                written.append(write_table(email_results, out_dir / "email_results", args.format))
+    finally:
+        db.close()
+
+    print(f"Rows processed: {rows}")
+    if report.rejected:
+        reasons = ", ".join(f"{reason}: {count}" for reason, count in report.by_reason.items() if count)
+        print(f"Rows rejected: {report.rejected} ({reasons})")
+    print(f"Shortages: {len(result['orders_to_send'])}  Planned POs: {len(grouped)}  "
+          f"Transfers: {len(result['transfers'])}  Missing products: {len(result['missing_products'])}")
+    for path in written:
+        print(f"Wrote {path}")
+    print(f"Total wall time: {sum(timings.values()):.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
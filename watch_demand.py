@@ -0,0 +1,71 @@
+# watch_demand.py - Watch-folder ingestion daemon for demand files
+"""Process demand files as stores drop them into a shared directory.
+
+Examples:
+    python watch_demand.py                              # WATCH_DIR -> WATCH_OUTPUT_DIR
+    python watch_demand.py /mnt/drops --out results/ --workers 4
+    python watch_demand.py /mnt/share --poll            # network share: poll instead of inotify
+    python watch_demand.py /mnt/drops --once            # handle what is there now and exit
+"""
+import argparse
+import signal
+import sys
+import threading
+from pathlib import Path
+
+# Same layout as main.py: backend modules are imported by their package-relative names
+sys.path.append(str(Path(__file__).parent / "backend"))
+
+
+def print_result(summary):
+    if summary["status"] == "succeeded":
+        print(f"[ok] {summary['file_name']}: {summary['rows']} rows, {summary['shortages']} shortages, "
+              f"{summary['missing']} missing in {summary['seconds']}s -> {summary['outputs'][0]}", flush=True)
+    elif summary["status"] == "duplicate":
+        print(f"[skip] {summary['file_name']}: already ingested ({summary['fingerprint'][:12]})", flush=True)
+    else:
+        print(f"[failed] {summary['file_name']}: {summary['error']}", file=sys.stderr, flush=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a directory and process demand files as they arrive")
+    parser.add_argument("directory", nargs="?", help="Drop directory (default: WATCH_DIR)")
+    parser.add_argument("--out", help="Directory for per-file results (default: WATCH_OUTPUT_DIR)")
+    parser.add_argument("--workers", type=int, help="Files processed at once (default: WATCH_WORKERS)")
+    parser.add_argument("--settle", type=float,
+                        help="Seconds a file must stay unchanged before it is read (default: WATCH_SETTLE_SECONDS)")
+    parser.add_argument("--poll", action="store_true", help="Poll the directory instead of using inotify")
+    parser.add_argument("--poll-interval", type=float, help="Seconds between scans when polling")
+    parser.add_argument("--store-mode", choices=["proportional", "priority"],
+                        help="Allocate stock per store instead of aggregating across stores")
+    parser.add_argument("--store-priority", default="",
+                        help="Comma-separated store_ids, highest priority first (priority mode)")
+    parser.add_argument("--keep", action="store_true",
+                        help="Leave handled files in place instead of moving them to processed/ or failed/")
+    parser.add_argument("--once", action="store_true", help="Process the files already there, then exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from pipeline.watcher import DemandWatcher
+
+    watcher = DemandWatcher(
+        args.directory, args.out, args.workers, args.settle, args.poll_interval,
+        use_inotify=not args.poll, store_mode=args.store_mode,
+        store_priority=[s.strip() for s in args.store_priority.split(",") if s.strip()],
+        archive=not args.keep, on_result=print_result
+    )
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    print(f"Watching {watcher.directory} -> {watcher.out_dir} ({watcher.workers} workers)", file=sys.stderr)
+    stats = watcher.run(stop, once=args.once)
+    print(f"Ingested {stats['succeeded']} files ({stats['rows']} rows, {stats['shortages']} shortages), "
+          f"{stats['duplicates']} duplicates, {stats['failed']} failed; "
+          f"{stats['files_per_minute']} files/min ({stats['mode']})", file=sys.stderr)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())